@@ -0,0 +1,300 @@
+"""
+Benchmark de carga de la API.
+
+Genera una base SQLite sintética con la escala indicada (con database/generar_datos.py, no usa personas.db),
+levanta main.main:app dentro del mismo proceso y le envía peticiones concurrentes a cada escenario: reservas,
+disponibilidad, búsqueda de personas y todos los reportes de /reportes (JSON, CSV, PDF y exportaciones).
+
+Por escenario informa peticiones por segundo y latencias p50/p95/p99 en milisegundos. Con --salida se
+guardan en JSON junto con el commit y los parámetros usados, y con --comparar se muestran las diferencias
+contra un resultado anterior (por ejemplo el de otro commit).
+
+La base generada se guarda en --directorio y se reutiliza mientras no cambie la escala; cada ejecución
+trabaja sobre una copia, así las reservas del benchmark no alteran las siguientes mediciones.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_api --turnos 10000
+    python -m benchmarks.bench_api --turnos 100000 --concurrencia 16 --salida resultados.json
+    python -m benchmarks.bench_api --escenarios reservar disponibles "pdf_*" --comparar resultados.json
+"""
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+
+def _dias_habiles(inicio: date, cantidad: int) -> list:
+    #Fechas de lunes a sabado a partir de inicio
+    dias, fecha = [], inicio
+    while len(dias) < cantidad:
+        if fecha.weekday() != 6:
+            dias.append(fecha)
+        fecha += timedelta(days=1)
+    return dias
+
+
+def generar_base(ruta: Path, personas: int, turnos: int, semilla: int):
+    """Crea la base con database.generar_datos, sin journal para que la carga sea más rápida"""
+    from sqlalchemy import create_engine, event
+
+    from database import generar_datos
+
+    motor = create_engine(f"sqlite:///{ruta}")
+
+    @event.listens_for(motor, "connect")
+    def _carga_rapida(conexion_dbapi, registro_conexion):
+        cursor = conexion_dbapi.cursor()
+        cursor.execute("PRAGMA journal_mode=OFF")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.close()
+
+    generar_datos.generar_datos(personas, turnos, semilla=semilla, motor=motor)
+    motor.dispose()
+
+
+# ============ ESCENARIOS ============
+#Cada escenario recibe el contexto de la base y un generador aleatorio, y devuelve (metodo, url, parametros, cuerpo)
+
+def _escenarios() -> dict:
+    from database import generar_datos
+
+    def dni(ctx, rng):
+        return str(generar_datos.PRIMER_DNI + rng.randrange(ctx["personas"]))
+
+    def fecha_con_turnos(ctx, rng):
+        fecha = ctx["inicio"] + timedelta(days=rng.randrange(1, (ctx["fin"] - ctx["inicio"]).days))
+        return str(fecha - timedelta(days=1) if fecha.weekday() == 6 else fecha)  #los domingos no hay turnos
+
+    def rango(ctx, rng):
+        desde = ctx["inicio"] + timedelta(days=rng.randrange(max(1, (ctx["fin"] - ctx["inicio"]).days - 30)))
+        return {"fecha_desde": str(desde), "fecha_hasta": str(desde + timedelta(days=30)), "pag": 1, "por_pag": 100}
+
+    def reservar(ctx, rng):
+        #Cada reserva usa un horario libre distinto, posterior a los turnos generados
+        numero = next(ctx["reservas"])
+        fecha = ctx["dias_reserva"][numero // len(generar_datos.HORARIOS)]
+        hora = generar_datos.HORARIOS[numero % len(generar_datos.HORARIOS)]
+        return "POST", "/turnos", None, {
+            "fecha": str(fecha), "hora": f"{hora // 60:02d}:{hora % 60:02d}", "persona_id": rng.choice(ctx["habilitadas"])
+        }
+
+    def disponibles(ctx, rng):
+        fecha = rng.choice(ctx["dias_futuros"])
+        return "GET", "/turnos/turnos-disponibles", {"fecha": str(fecha)}, None
+
+    escenarios = {
+        "reservar": reservar,
+        "disponibles": disponibles,
+        "buscar_personas": lambda ctx, rng: ("GET", "/personas/search", {"nombre": rng.choice(generar_datos.NOMBRES), "per_page": 20}, None),
+        "turno_por_id": lambda ctx, rng: ("GET", f"/turnos/{rng.randint(1, ctx['turnos'])}", None, None),
+        "listar_turnos": lambda ctx, rng: ("GET", "/turnos", {"skip": rng.randrange(max(1, ctx["turnos"] - 100)), "limit": 100}, None),
+    }
+
+    #Reportes: (nombre del escenario, ruta, parametros)
+    reportes = [
+        ("turnos_por_persona", "/reportes/turnos-por-persona", lambda ctx, rng: {"dni": dni(ctx, rng)}),
+        ("turnos_cancelados", "/reportes/turnos-cancelados", lambda ctx, rng: {"min": 5}),
+        ("turnos_por_fecha", "/reportes/turnos-por-fecha", lambda ctx, rng: {"fecha": fecha_con_turnos(ctx, rng)}),
+        ("cancelados_por_mes", "/reportes/turnos-cancelados-por-mes", lambda ctx, rng: {}),
+        ("cancelados_por_mes_reformado", "/reportes/turnos-cancelados-por-mes-reformado", lambda ctx, rng: {}),
+        ("turnos_confirmados", "/reportes/turnos-confirmados", rango),
+        ("estado_personas", "/reportes/estado-personas/false", lambda ctx, rng: {}),
+        ("csv_turnos_por_fecha", "/reportes/csv/turnos-por-fecha", lambda ctx, rng: {"fecha": fecha_con_turnos(ctx, rng)}),
+        ("csv_cancelados_por_mes", "/reportes/csv/cancelados-por-mes", lambda ctx, rng: {}),
+        ("csv_turnos_por_persona", "/reportes/csv/turnos-por-persona", lambda ctx, rng: {"dni": dni(ctx, rng)}),
+        ("csv_turnos_cancelados", "/reportes/csv/turnos-cancelados", lambda ctx, rng: {"min": 5}),
+        ("csv_turnos_confirmados", "/reportes/csv/turnos-confirmados", rango),
+        ("csv_estado_personas", "/reportes/csv/estado-personas", lambda ctx, rng: {"estado": False}),
+        ("csv_cancelados_por_mes_reformado", "/reportes/csv/turnos-cancelados-por-mes-reformado", lambda ctx, rng: {}),
+        ("pdf_turnos_por_fecha", "/reportes/pdf/turnos-por-fecha", lambda ctx, rng: {"fecha": fecha_con_turnos(ctx, rng)}),
+        ("pdf_cancelados_por_mes", "/reportes/pdf/turnos-cancelados-por-mes", lambda ctx, rng: {}),
+        ("pdf_turnos_por_persona", "/reportes/pdf/turnos-por-persona", lambda ctx, rng: {"dni": dni(ctx, rng)}),
+        ("pdf_turnos_cancelados", "/reportes/pdf/turnos-cancelados", lambda ctx, rng: {"min": 5}),
+        ("pdf_turnos_confirmados", "/reportes/pdf/turnos-confirmados", rango),
+        ("pdf_estado_personas", "/reportes/pdf/estado-personas", lambda ctx, rng: {"estado": False}),
+        ("export_turnos_por_fecha", "/reportes/export/turnos-por-fecha", lambda ctx, rng: {"fecha": fecha_con_turnos(ctx, rng)}),
+        ("export_cancelados_por_mes", "/reportes/export/turnos-cancelados-por-mes", lambda ctx, rng: {}),
+        ("export_turnos_por_persona", "/reportes/export/turnos-por-persona", lambda ctx, rng: {"dni": dni(ctx, rng)}),
+        ("export_turnos_cancelados", "/reportes/export/turnos-cancelados", lambda ctx, rng: {"min": 5}),
+        ("export_turnos_confirmados", "/reportes/export/turnos-confirmados", rango),
+        ("export_estado_personas", "/reportes/export/estado-personas", lambda ctx, rng: {"estado": False}),
+    ]
+    for nombre, ruta, parametros in reportes:
+        escenarios[nombre] = lambda ctx, rng, ruta=ruta, parametros=parametros: ("GET", ruta, parametros(ctx, rng), None)
+    return escenarios
+
+
+# ============ EJECUCION Y RESULTADOS ============
+
+def _percentil(ordenadas: list, p: float) -> float:
+    if len(ordenadas) == 1:
+        return ordenadas[0]
+    return statistics.quantiles(ordenadas, n=100, method="inclusive")[int(p) - 1]
+
+
+async def _medir(cliente, escenario, ctx: dict, peticiones: int, concurrencia: int, rng: random.Random) -> dict:
+    latencias, codigos = [], Counter()
+    pendientes = iter(range(peticiones))  #compartido por todos los clientes
+
+    async def cliente_concurrente():
+        for _ in pendientes:
+            metodo, url, parametros, cuerpo = escenario(ctx, rng)
+            inicio = time.perf_counter()
+            respuesta = await cliente.request(metodo, url, params=parametros, json=cuerpo)
+            await respuesta.aread()
+            latencias.append(time.perf_counter() - inicio)
+            codigos[respuesta.status_code] += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente_concurrente() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+
+    ordenadas = sorted(latencias)
+    return {
+        "peticiones": peticiones,
+        "errores": sum(cantidad for codigo, cantidad in codigos.items() if codigo >= 400),
+        "codigos": {str(codigo): cantidad for codigo, cantidad in sorted(codigos.items())},
+        "rps": round(peticiones / duracion, 1),
+        "p50_ms": round(_percentil(ordenadas, 50) * 1000, 2),
+        "p95_ms": round(_percentil(ordenadas, 95) * 1000, 2),
+        "p99_ms": round(_percentil(ordenadas, 99) * 1000, 2),
+        "max_ms": round(ordenadas[-1] * 1000, 2),
+    }
+
+
+async def _ejecutar(app, ctx: dict, nombres: list, args) -> dict:
+    import httpx
+
+    escenarios = _escenarios()
+    rng = random.Random(args.semilla)
+    transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    resultados = {}
+    #Encabezados fijos para que los resultados no dependan de los paquetes de compresion instalados
+    async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=None,
+                                 headers={"Accept-Encoding": "gzip"}) as cliente:
+        for nombre in nombres:
+            if args.calentamiento:
+                await _medir(cliente, escenarios[nombre], ctx, args.calentamiento, 1, rng)
+            resultados[nombre] = await _medir(cliente, escenarios[nombre], ctx, args.peticiones, args.concurrencia, rng)
+            _imprimir_fila(nombre, resultados[nombre])
+    return resultados
+
+
+def _imprimir_fila(nombre: str, r: dict):
+    print(f"{nombre:<34}{r['rps']:>9}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['errores']:>8}  {r['codigos']}", flush=True)
+
+
+def _comparar(actuales: dict, archivo: str):
+    anteriores = json.loads(Path(archivo).read_text(encoding="utf-8"))
+    print(f"\nComparación contra {archivo} (commit {anteriores.get('commit')}): variación porcentual")
+    print(f"{'escenario':<34}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for nombre, actual in actuales["escenarios"].items():
+        anterior = anteriores["escenarios"].get(nombre)
+        if anterior is None:
+            continue
+        variacion = lambda clave: f"{(actual[clave] - anterior[clave]) / anterior[clave] * 100:+.1f}%" if anterior[clave] else "-"
+        print(f"{nombre:<34}{variacion('rps'):>9}{variacion('p50_ms'):>10}{variacion('p95_ms'):>10}{variacion('p99_ms'):>10}")
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide latencia y peticiones por segundo de los endpoints de la API")
+    parser.add_argument("--turnos", type=int, default=10000, help="Cantidad de turnos de la base generada (por ejemplo 10000, 100000 o 1000000)")
+    parser.add_argument("--personas", type=int, help="Cantidad de personas (por defecto una cada 20 turnos)")
+    parser.add_argument("--peticiones", type=int, default=50, help="Peticiones medidas por escenario")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Clientes simultáneos")
+    parser.add_argument("--calentamiento", type=int, default=2, help="Peticiones previas a cada medición que no se cuentan")
+    parser.add_argument("--escenarios", nargs="*", help="Escenarios a medir, admite comodines (por defecto todos)")
+    parser.add_argument("--semilla", type=int, default=2025)
+    parser.add_argument("--directorio", default=os.path.join(tempfile.gettempdir(), "bench_api"), help="Carpeta de las bases generadas")
+    parser.add_argument("--regenerar", action="store_true", help="Vuelve a generar la base aunque exista")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="Archivo JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+    personas = args.personas or max(10, args.turnos // 20)
+
+    directorio = Path(args.directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    base = directorio / f"base_{personas}_{args.turnos}_{args.semilla}.db"
+    copia = directorio / "ejecucion.db"
+
+    #database (y con el la aplicacion) lee DATABASE_URL al importarse: la base se elige antes de importarlos
+    os.environ["DATABASE_URL"] = f"sqlite:///{copia}"
+
+    nombres_posibles = list(_escenarios())
+    nombres = nombres_posibles
+    if args.escenarios:
+        nombres = [nombre for nombre in nombres_posibles if any(fnmatch.fnmatch(nombre, patron) for patron in args.escenarios)]
+        if not nombres:
+            parser.error(f"Ningún escenario coincide. Escenarios posibles: {', '.join(nombres_posibles)}")
+
+    if args.regenerar or not base.exists():
+        base.unlink(missing_ok=True)
+        inicio = time.perf_counter()
+        generar_base(base, personas, args.turnos, args.semilla)
+        print(f"Base generada en {time.perf_counter() - inicio:.1f} s: {base}")
+    for sufijo in ("", "-wal", "-shm"):
+        Path(f"{copia}{sufijo}").unlink(missing_ok=True)
+    shutil.copyfile(base, copia)
+
+    from main.main import app
+    from database.database import SessionLocal
+    import models.models as models
+
+    #borb envia estadisticas de uso por red en cada documento: se desactivan para no medir la red
+    from borb.license.usage_statistics import UsageStatistics
+    UsageStatistics.disable()
+
+    from database import generar_datos
+    inicio, fin = generar_datos.rango_por_defecto(args.turnos)
+    with SessionLocal() as db:
+        habilitadas = [fila[0] for fila in db.query(models.Persona.id).filter(models.Persona.habilitado == True)]
+    ctx = {
+        "personas": personas,
+        "turnos": args.turnos,
+        "inicio": inicio,
+        "fin": fin,
+        "habilitadas": habilitadas,
+        "dias_futuros": _dias_habiles(date.today() + timedelta(days=1), 30),
+        "dias_reserva": _dias_habiles(fin + timedelta(days=1), (args.peticiones + args.calentamiento) // len(generar_datos.HORARIOS) + 1),
+        "reservas": iter(range(10 ** 9)),
+    }
+
+    print(f"{'escenario':<34}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>8}  códigos")
+    resultados = {
+        "commit": _commit(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parametros": {
+            "personas": personas, "turnos": args.turnos, "peticiones": args.peticiones,
+            "concurrencia": args.concurrencia, "semilla": args.semilla,
+        },
+        "escenarios": asyncio.run(_ejecutar(app, ctx, nombres, args)),
+    }
+
+    if args.salida:
+        Path(args.salida).write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Resultados guardados en {args.salida}")
+    if args.comparar:
+        _comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
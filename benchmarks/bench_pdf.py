@@ -0,0 +1,99 @@
+"""
+Benchmark de generación de reportes PDF.
+
+Arma datos sintéticos en memoria (no usa la base de datos) y mide cuánto tarda cada uno de los
+seis reportes PDF en generarse con la cantidad de filas indicada.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_pdf
+    python -m benchmarks.bench_pdf --filas 2000 --reportes personas_estado turnos_por_persona
+"""
+import argparse
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from schemas.schemasTurno import settings
+from services import pdf_service
+
+
+def _turnos(cantidad: int, estado: str = "Confirmado") -> list:
+    inicio = date(2025, 1, 1)
+    return [
+        {
+            "id": i + 1,
+            "fecha": str(inicio + timedelta(days=i // 16)),
+            "hora": f"{9 + (i % 16) // 2:02d}:{30 * (i % 2):02d}",
+            "estado": estado
+        }
+        for i in range(cantidad)
+    ]
+
+
+def _persona(i: int) -> SimpleNamespace:
+    return SimpleNamespace(nombre=f"Persona de prueba {i}", dni=f"{30000000 + i}", telefono=f"11{40000000 + i}", edad=20 + i % 60)
+
+
+def _reportes(filas: int) -> dict:
+    """Devuelve, para cada reporte, una función sin argumentos que genera el PDF"""
+    personas_por_bloque = 50
+    turnos = _turnos(filas)
+    cancelados = _turnos(filas, "Cancelado")
+    return {
+        "turnos_por_fecha": lambda: pdf_service.generar_pdf_turnos_por_fecha(
+            "2025-01-01",
+            filas,
+            [
+                {"persona": {"id": i, "nombre": f"Persona de prueba {i}", "dni": f"{30000000 + i}"},
+                 "turnos": turnos[i::personas_por_bloque]}
+                for i in range(personas_por_bloque)
+            ]
+        ),
+        "turnos_cancelados_mes": lambda: pdf_service.generar_pdf_turnos_cancelados_mes({
+            "mes": "enero",
+            "anio": 2025,
+            "total_cancelados": filas,
+            "detalle_por_persona": [
+                {"persona": {"dni": f"{30000000 + i}", "nombre": f"Persona de prueba {i}",
+                             "telefono": f"11{40000000 + i}", "cantidad_de_cancelados": 1}}
+                for i in range(filas)
+            ]
+        }),
+        "turnos_por_persona": lambda: pdf_service.generar_pdf_turnos_por_persona(
+            {"persona": _persona(1), "turnos": turnos, "total_turnos": filas}
+        ),
+        "personas_con_min_cancelados": lambda: pdf_service.generar_pdf_personas_con_min_cancelados(
+            [
+                {"persona": _persona(i), "turnos_cancelados_contador": len(cancelados[i::personas_por_bloque]),
+                 "turnos_cancelados_detalle": cancelados[i::personas_por_bloque]}
+                for i in range(personas_por_bloque)
+            ]
+        ),
+        "turnos_confirmados_desde_hasta": lambda: pdf_service.generar_pdf_turnos_confirmados_desde_hasta(
+            {"total_registros": filas, "turnos": turnos}, date(2025, 1, 1), date(2025, 12, 31), 1, filas
+        ),
+        "personas_estado": lambda: pdf_service.generar_pdf_personas_estado([_persona(i) for i in range(filas)], True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el tiempo de generación de los reportes PDF")
+    parser.add_argument("--filas", type=int, default=10000, help="Cantidad de filas por reporte")
+    parser.add_argument("--reportes", nargs="*", help="Reportes a medir (por defecto todos)")
+    args = parser.parse_args()
+
+    #El limite de filas por documento no debe recortar el benchmark
+    settings.pdf_max_filas = max(settings.pdf_max_filas, args.filas)
+
+    reportes = _reportes(args.filas)
+    nombres = args.reportes or list(reportes)
+    print(f"{'reporte':<32}{'filas':>8}{'segundos':>10}{'filas/s':>10}{'KB':>10}")
+    for nombre in nombres:
+        inicio = time.perf_counter()
+        contenido = reportes[nombre]()
+        duracion = time.perf_counter() - inicio
+        print(f"{nombre:<32}{args.filas:>8}{duracion:>10.2f}{args.filas / duracion:>10.0f}{len(contenido) / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
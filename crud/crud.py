@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy import func, desc, asc
+from sqlalchemy import func, desc, asc, select
 import models.models as models, schemas.schemas as schemas
+import crud.crudCambios as crudCambios
 import math
 from datetime import date
 import pandas as pd
@@ -51,6 +52,8 @@ def create_persona(db: Session, persona: schemas.PersonaCreate):
     try:
         db_persona = models.Persona(**persona.dict())
         db.add(db_persona)
+        db.flush()  #asigna el id para registrar el cambio en la misma transaccion
+        crudCambios.registrar_cambio_persona(db, db_persona, crudCambios.OPERACION_ALTA)
         db.commit()
         db.refresh(db_persona)
         persona_dict = db_persona.__dict__.copy()
@@ -77,6 +80,7 @@ def update_persona(db: Session, persona_id: int, persona: schemas.PersonaUpdate)
         if db_persona:
             for key, value in persona.dict().items():
                 setattr(db_persona, key, value)
+            crudCambios.registrar_cambio_persona(db, db_persona, crudCambios.OPERACION_MODIFICACION)
             db.commit()
             db.refresh(db_persona)
             persona_dict = db_persona.__dict__.copy()
@@ -104,6 +108,10 @@ def delete_persona(db: Session, persona_id: int):
         if db_persona:
             persona_dict = db_persona.__dict__.copy()
             persona_dict['edad'] = calcular_edad(db_persona.fecha_nacimiento)
+            crudCambios.registrar_cambio_persona(db, db_persona, crudCambios.OPERACION_BAJA)
+            #Filas del resumen de cancelaciones que quedaron en 0 al eliminar sus turnos: SQLite puede reutilizar
+            #el id de la persona y el resumen no debe sumarle cancelaciones a la nueva
+            db.query(models.ResumenCancelacion).filter(models.ResumenCancelacion.persona_id == persona_id).delete()
             db.delete(db_persona)
             db.commit()
             return schemas.PersonaOut(**persona_dict)
@@ -256,4 +264,20 @@ def generar_csv_estado_personas(db: Session, estado: bool):
 
         return csv_buffer
     except Exception as e:
-        raise Exception(f"Error inesperado al generar CSV de estado de personas: {e}")
\ No newline at end of file
+        raise Exception(f"Error inesperado al generar CSV de estado de personas: {e}")
+
+#Consulta para exportar personas por estado en formato columnar (services/export_service la lee por lotes)
+def consulta_export_estado_personas(estado: bool):
+    return (
+        select(
+            models.Persona.id,
+            models.Persona.nombre,
+            models.Persona.email,
+            models.Persona.dni,
+            models.Persona.telefono,
+            models.Persona.fecha_nacimiento,
+            models.Persona.habilitado,
+        )
+        .where(models.Persona.habilitado == estado)
+        .order_by(models.Persona.id)
+    )
@@ -0,0 +1,47 @@
+from datetime import date
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models.models as models, schemas.schemasTurno as schemasTurno
+import crud.crudTurno as crudTurno
+import services.calendario_service as calendario
+
+
+def get_cierres(db: Session, desde: date = None, hasta: date = None):
+    #Cierres ordenados por fecha, opcionalmente dentro de un rango
+    consulta = db.query(models.Cierre)
+    if desde:
+        consulta = consulta.filter(models.Cierre.fecha >= desde)
+    if hasta:
+        consulta = consulta.filter(models.Cierre.fecha <= hasta)
+    return consulta.order_by(models.Cierre.fecha).all()
+
+def create_cierre(db: Session, cierre: schemasTurno.CierreCreate) -> dict:
+    """
+        Cierra la agenda en la fecha indicada. Los turnos ya reservados ese día no se modifican,
+        se informa cuántos hay para reprogramarlos. Lanza ValueError si la fecha ya estaba cerrada
+    """
+    if db.get(models.Cierre, cierre.fecha) is not None:
+        raise ValueError(f"La fecha {cierre.fecha} ya está cerrada")
+    nuevo_cierre = models.Cierre(fecha=cierre.fecha, motivo=cierre.motivo)
+    db.add(nuevo_cierre)
+    db.commit()
+    db.refresh(nuevo_cierre)
+    calendario.invalidar()
+    crudTurno.notificar_disponibilidad(cierre.fecha)
+
+    turnos_activos = db.query(func.count(models.Turno.id)).filter(
+        models.Turno.fecha == cierre.fecha,
+        models.Turno.estado != crudTurno.diccionario_estados.get('ESTADO_CANCELADO')
+    ).scalar()
+    return {"fecha": nuevo_cierre.fecha, "motivo": nuevo_cierre.motivo, "creado": nuevo_cierre.creado, "turnos_activos": turnos_activos}
+
+def delete_cierre(db: Session, fecha: date):
+    #Vuelve a abrir la agenda en la fecha, retorna None si no estaba cerrada
+    cierre = db.get(models.Cierre, fecha)
+    if cierre is None:
+        return None
+    db.delete(cierre)
+    db.commit()
+    calendario.invalidar()
+    crudTurno.notificar_disponibilidad(fecha)
+    return cierre
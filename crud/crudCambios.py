@@ -0,0 +1,82 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+import models.models as models
+from schemas.schemasTurno import settings
+
+
+#Entidades y operaciones que se registran en el log de cambios
+ENTIDAD_TURNO = "turno"
+ENTIDAD_PERSONA = "persona"
+OPERACION_ALTA = "alta"
+OPERACION_MODIFICACION = "modificacion"
+OPERACION_BAJA = "baja"
+
+
+def datos_turno(turno: models.Turno):
+    return {
+        "id": turno.id,
+        "fecha": turno.fecha.isoformat(),
+        "hora": turno.hora.strftime("%H:%M:%S"),
+        "estado": turno.estado,
+        "persona_id": turno.persona_id,
+        "recurso_id": turno.recurso_id,
+    }
+
+def datos_persona(persona: models.Persona):
+    return {
+        "id": persona.id,
+        "nombre": persona.nombre,
+        "email": persona.email,
+        "dni": persona.dni,
+        "telefono": persona.telefono,
+        "fecha_nacimiento": persona.fecha_nacimiento.isoformat(),
+        "habilitado": persona.habilitado,
+    }
+
+def registrar_cambio(db: Session, entidad: str, entidad_id: int, operacion: str, datos: dict = None):
+    """
+        Agrega el cambio al log
+        No hace commit, se confirma en la misma transaccion que la escritura que lo genera
+    """
+    db.add(models.Cambio(entidad=entidad, entidad_id=entidad_id, operacion=operacion, datos=datos))
+
+def registrar_cambio_turno(db: Session, turno: models.Turno, operacion: str):
+    registrar_cambio(db, ENTIDAD_TURNO, turno.id, operacion, None if operacion == OPERACION_BAJA else datos_turno(turno))
+
+def registrar_cambio_persona(db: Session, persona: models.Persona, operacion: str):
+    registrar_cambio(db, ENTIDAD_PERSONA, persona.id, operacion, None if operacion == OPERACION_BAJA else datos_persona(persona))
+
+
+def cambio_diccionario(cambio: models.Cambio):
+    return {
+        "seq": cambio.seq,
+        "entidad": cambio.entidad,
+        "entidad_id": cambio.entidad_id,
+        "operacion": cambio.operacion,
+        "datos": cambio.datos,
+        "fecha_hora": cambio.fecha_hora,
+    }
+
+def get_ultimo_seq(db: Session):
+    return db.query(func.max(models.Cambio.seq)).scalar() or 0
+
+def get_cambios(db: Session, desde: int = 0, limite: int = None):
+    """
+        Retorna los cambios con numero de secuencia mayor a 'desde', en orden y de a un lote
+        'ultimo_seq' es el valor a enviar como 'desde' en la siguiente consulta
+    """
+    limite = min(limite or settings.cambios_lote_maximo, settings.cambios_lote_maximo)
+    cambios = (
+        db.query(models.Cambio)
+        .filter(models.Cambio.seq > desde)
+        .order_by(models.Cambio.seq)
+        .limit(limite + 1)  #se pide uno de mas para saber si quedan cambios sin leer
+        .all()
+    )
+    hay_mas = len(cambios) > limite
+    cambios = cambios[:limite]
+    return {
+        "cambios": [cambio_diccionario(cambio) for cambio in cambios],
+        "ultimo_seq": cambios[-1].seq if cambios else desde,
+        "hay_mas": hay_mas,
+    }
@@ -0,0 +1,99 @@
+from datetime import date
+from sqlalchemy import select, func, type_coerce, Integer
+from sqlalchemy.orm import Session
+import models.models as models, schemas.schemasTurno as schemasTurno
+import crud.crudTurno as crudTurno
+import services.calendario_service as calendario
+
+
+def get_recursos(db: Session, solo_activos: bool = False):
+    consulta = db.query(models.Recurso)
+    if solo_activos:
+        consulta = consulta.filter(models.Recurso.activo == True)
+    return consulta.order_by(models.Recurso.id).all()
+
+def _validar_nombre(db: Session, nombre: str, recurso_id: int = None):
+    #Lanza ValueError si otro recurso ya tiene ese nombre
+    existente = db.query(models.Recurso).filter(models.Recurso.nombre == nombre).first()
+    if existente and existente.id != recurso_id:
+        raise ValueError(f"Ya existe un recurso con el nombre {nombre}")
+
+def create_recurso(db: Session, recurso: schemasTurno.RecursoCreate):
+    _validar_nombre(db, recurso.nombre)
+    nuevo_recurso = models.Recurso(**recurso.model_dump(), activo=True)
+    db.add(nuevo_recurso)
+    db.commit()
+    db.refresh(nuevo_recurso)
+    return nuevo_recurso
+
+def update_recurso(db: Session, recurso_id: int, datos: schemasTurno.RecursoUpdate):
+    """
+        Modifica nombre, capacidad o estado activo del recurso, retorna None si no existe
+        Si la capacidad baja, los turnos ya reservados se mantienen y el horario queda sin lugares hasta que se liberen
+    """
+    recurso = db.get(models.Recurso, recurso_id)
+    if not recurso:
+        return None
+    cambios = datos.model_dump(exclude_unset=True, exclude_none=True)
+    if "nombre" in cambios:
+        _validar_nombre(db, cambios["nombre"], recurso_id)
+    for campo, valor in cambios.items():
+        setattr(recurso, campo, valor)
+    db.commit()
+    db.refresh(recurso)
+    return recurso
+
+def get_disponibilidad_recursos(db: Session, fecha_desde: date, fecha_hasta: date, recurso_id: int = None) -> list:
+    """
+        Horarios con lugares libres de cada recurso activo (o solo del indicado) en cada fecha con atencion del rango
+        Los recursos y la ocupacion de sus horarios se leen en una sola consulta: los turnos no cancelados del rango
+        agrupados por (recurso, fecha, hora), unidos a los recursos para incluir a los que no tienen reservas
+        Lanza ValueError si el rango no es valido
+    """
+    crudTurno.validar_rango_disponibilidad(fecha_desde, fecha_hasta)
+
+    ocupacion = (
+        select(
+            models.Turno.recurso_id, models.Turno.fecha,
+            type_coerce(models.Turno.hora, Integer).label("minuto"), func.count().label("ocupados")
+        )
+        .where(
+            models.Turno.fecha.between(fecha_desde, fecha_hasta),
+            crudTurno.turno_ocupa_lugar
+        )
+        .group_by(models.Turno.recurso_id, models.Turno.fecha, models.Turno.hora)
+        .subquery()
+    )
+    consulta = (
+        select(models.Recurso.id, models.Recurso.nombre, models.Recurso.capacidad,
+               ocupacion.c.fecha, ocupacion.c.minuto, ocupacion.c.ocupados)
+        .outerjoin(ocupacion, ocupacion.c.recurso_id == models.Recurso.id)
+        .where(models.Recurso.activo == True)
+        .order_by(models.Recurso.id)
+    )
+    if recurso_id is not None:
+        consulta = consulta.where(models.Recurso.id == recurso_id)
+
+    recursos = {}  #id -> (nombre, capacidad, {fecha: {minuto: turnos que ocupan lugar}})
+    for fila in db.execute(consulta):
+        _, _, ocupacion_recurso = recursos.setdefault(fila.id, (fila.nombre, fila.capacidad, {}))
+        if fila.fecha is not None:
+            ocupacion_recurso.setdefault(fila.fecha, {})[fila.minuto] = fila.ocupados
+    if recurso_id is not None and not recursos:
+        raise crudTurno.DatabaseResourceNotFound("Recurso no encontrado o inactivo")
+
+    dias = [(fecha, dia_agenda.grilla) for fecha, dia_agenda in calendario.dias(db, fecha_desde, fecha_hasta) if dia_agenda.grilla is not None]
+    disponibilidad = []
+    for id_recurso, (nombre, capacidad, ocupacion_recurso) in recursos.items():
+        for fecha, grilla in dias:
+            ocupados = ocupacion_recurso.get(fecha, {})
+            disponibilidad.append({
+                "recurso_id": id_recurso,
+                "nombre": nombre,
+                "fecha": fecha,
+                "horarios": [
+                    {"hora": texto, "libres": capacidad - ocupados.get(minuto, 0)}
+                    for minuto, texto in zip(grilla.minutos, grilla.textos) if ocupados.get(minuto, 0) < capacidad
+                ],
+            })
+    return disponibilidad
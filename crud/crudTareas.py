@@ -0,0 +1,18 @@
+from datetime import datetime
+from sqlalchemy.orm import Session
+import models.models as models
+
+
+def registrar_ejecucion(db: Session, tarea: str, inicio: datetime, fin: datetime, filas_afectadas: int, error: str = None):
+    ejecucion = models.Ejecucion(tarea=tarea, inicio=inicio, fin=fin, filas_afectadas=filas_afectadas, error=error)
+    db.add(ejecucion)
+    db.commit()
+    db.refresh(ejecucion)
+    return ejecucion
+
+def get_ejecuciones(db: Session, tarea: str = None, limite: int = 50):
+    #Ultimas ejecuciones primero, opcionalmente de una sola tarea
+    consulta = db.query(models.Ejecucion)
+    if tarea:
+        consulta = consulta.filter(models.Ejecucion.tarea == tarea)
+    return consulta.order_by(models.Ejecucion.id.desc()).limit(limite).all()
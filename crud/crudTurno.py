@@ -1,26 +1,20 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, or_
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func, and_, or_, select, insert, update, cast, type_coerce, literal_column, Integer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 import models.models as models, schemas.schemasTurno as schemasTurno, schemas.schemas as schemas
 from datetime import date, time, timedelta, datetime
 from crud.crud import calcular_edad
-from copy import copy
+import crud.crudCambios as crudCambios
+import services.eventos_service as eventos
+import services.metricas_service as metricas
+import services.calendario_service as calendario
 from schemas.schemasTurno import settings
 import math
-from decimal import Decimal
 
 #Imports para generar archivosde reportes
 import pandas as pd
-from io import StringIO, BytesIO
-
-#Imports para borb version=2.1.22
-from borb.pdf import Document, Page, PDF
-from borb.pdf.canvas.layout.page_layout.multi_column_layout import SingleColumnLayout
-from borb.pdf.canvas.layout.text.paragraph import Paragraph, Alignment
-from borb.pdf.canvas.layout.horizontal_rule import HorizontalRule
-from borb.pdf.canvas.layout.table.fixed_column_width_table import FixedColumnWidthTable
-from borb.pdf.canvas.color.color import HexColor
-from borb.pdf.canvas.layout.table.table_util import TableCell
+from io import StringIO
 
 
 """
@@ -28,6 +22,8 @@ USO DEL ARCHIVO DE VARIABLES DE ENTORNO .ENV
 
 - Está definido en schemasTurnos en 'settings'
 - Para acceder a la lista del rango horario -> schemasTurnos.settings.horarios_turnos
+- Para validar o numerar un horario (en minutos desde la medianoche) -> schemasTurnos.grilla_horarios (franja general)
+- Para los horarios de una fecha segun el dia de la semana y los cierres -> calendario.dia(db, fecha).grilla
 - Para acceder a la lista de estados posibles de un turno -> schemasTurnos.settings.estados_turnos
 
 USO DE VARIABLE DE ESTADOS
@@ -49,19 +45,24 @@ meses_nombres= [
     ]
 
 #Funciones para validad los atributos del cuerpo de entrada de datos
-def validar_fecha_hora(turno: schemasTurno.TurnoCreate):
+def validar_fecha_hora(turno: schemasTurno.TurnoCreate, db: Session):
 
-    if turno.hora.hour < 9 or turno.hora.hour >= 17:
-        return "La hora debe ser entre las 9:00 y 16:30"
-    
-    if not (turno.hora.minute == 30 or turno.hora.minute == 0):
-        return "La hora debe tener el siguiente formato: HH:00/HH:30"
-    
     if turno.fecha < date.today():
         return "La fecha no puede ser menor a la de hoy"
     
-    if turno.fecha.weekday() == 6: 
-       return "No se pueden reservar turnos los domingos"
+    #Horarios de la fecha segun su dia de la semana, o el motivo si no se atiende (domingos, feriados)
+    dia_agenda = calendario.dia(db, turno.fecha)
+    if dia_agenda.grilla is None:
+        return dia_agenda.motivo
+    grilla = dia_agenda.grilla
+
+    minuto = turno.hora.hour * 60 + turno.hora.minute
+    if minuto < grilla.minutos[0] or minuto > grilla.minutos[-1]:
+        return f"La hora debe ser entre las {grilla.textos[0]} y {grilla.textos[-1]}"
+    
+    if minuto not in grilla.conjunto:
+        intervalo = grilla.minutos[1] - grilla.minutos[0] if len(grilla.minutos) > 1 else settings.intervalo
+        return f"La hora debe coincidir con un horario de turno (cada {intervalo} minutos desde las {grilla.textos[0]})"
     
     return None
 
@@ -83,32 +84,330 @@ def turno_diccionario(nuevo_turno: models.Turno, persona: models.Persona):
         "fecha": nuevo_turno.fecha,
         "hora": nuevo_turno.hora,
         "estado": nuevo_turno.estado,
+        "recurso_id": nuevo_turno.recurso_id,
         "persona": persona_dict
    }
     return turno_dict
 
-#Regla de negocio, habilita a las personas si ya paso el tiempo de deshabilitacion y deshabilita segun regla de turnos cancelados
-def habilitar_persona(db: Session, turno: schemasTurno.TurnoCreate, persona: models.Persona):
+#Regla de negocio: una persona con MAXIMO_CANCELADOS turnos cancelados en los ultimos DIAS_VENTANA_CANCELADOS dias
+#queda deshabilitada, y se vuelve a habilitar cuando esos turnos salen de la ventana
+MAXIMO_CANCELADOS = 5
+DIAS_VENTANA_CANCELADOS = 180
 
-    seis_meses_atras = date.today() - timedelta(days=180)
-    cant_cancelados = db.query(models.Turno).filter(models.Turno.persona_id == turno.persona_id, 
-                                                   func.lower(models.Turno.estado) == diccionario_estados.get('ESTADO_CANCELADO').lower(),
-                                                   models.Turno.fecha >= seis_meses_atras).count()
-    if (cant_cancelados >= 5):
-        persona.habilitado = False
+def actualizar_habilitados(db: Session, persona_id: int = None):
+    """
+        Recalcula el campo habilitado con un unico UPDATE sobre las personas cuyo estado no coincide con la regla
+        (todas, o solo persona_id). No hace commit, se confirma junto con la escritura que lo genera
+        Retorna las personas modificadas
+    """
+    db.flush()  #la sesion no hace autoflush: el conteo tiene que ver los cambios pendientes de la transaccion
+    desde = date.today() - timedelta(days=DIAS_VENTANA_CANCELADOS)
+    con_exceso_cancelados = (
+        select(models.Turno.persona_id)
+        .where(
+            models.Turno.estado == diccionario_estados.get('ESTADO_CANCELADO'),
+            models.Turno.fecha >= desde
+        )
+        .group_by(models.Turno.persona_id)
+        .having(func.count() >= MAXIMO_CANCELADOS)
+    )
+    filtro = []
+    if persona_id is not None:
+        con_exceso_cancelados = con_exceso_cancelados.where(models.Turno.persona_id == persona_id)
+        filtro.append(models.Persona.id == persona_id)
+
+    debe_deshabilitarse = models.Persona.id.in_(con_exceso_cancelados)
+    personas = db.execute(
+        update(models.Persona)
+        .where(models.Persona.habilitado == debe_deshabilitarse, *filtro)  #solo las que tienen que cambiar
+        .values(habilitado=~debe_deshabilitarse)
+        .returning(models.Persona)
+    ).scalars().all()
+    for persona in personas:
+        crudCambios.registrar_cambio_persona(db, persona, crudCambios.OPERACION_MODIFICACION)
+    return personas
+
+#Tarea programada: reevalua la habilitacion de todas las personas, retorna la cantidad de personas modificadas
+def reevaluar_habilitados(db: Session) -> int:
+    try:
+        personas = actualizar_habilitados(db)
         db.commit()
-        db.refresh(persona)
-        return False
-    else:
-        if (persona.habilitado == False):
-            persona.habilitado = True
+        return len(personas)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise Exception(f"Error al reevaluar la habilitacion de las personas: {e}")
+
+#Avisa a los streams de disponibilidad que cambiaron los turnos de esas fechas (se llama luego del commit)
+def notificar_disponibilidad(*fechas: date):
+    for fecha in set(fechas):
+        eventos.publicar(eventos.tema_disponibilidad(fecha))
+
+#=============== EXPIRACION DE TURNOS PASADOS ===================
+def expirar_turnos_pasados(db: Session, lote: int = None) -> int:
+    """
+        Pasa a Asistido los turnos confirmados cuya fecha y hora ya pasaron
+        Actualiza de a 'lote' turnos por transaccion (un UPDATE por lote) para no bloquear la base
+        Retorna la cantidad de turnos actualizados
+    """
+    lote = lote or settings.expiracion_lote
+    ahora = datetime.now()
+    estado_asistido = diccionario_estados.get('ESTADO_ASISTIDO')
+    vencidos = (
+        select(models.Turno.id)
+        .where(
+            models.Turno.estado == diccionario_estados.get('ESTADO_CONFIRMADO'),
+            or_(models.Turno.fecha < ahora.date(), and_(models.Turno.fecha == ahora.date(), models.Turno.hora <= ahora.time()))
+        )
+        .order_by(models.Turno.id)
+        .limit(lote)
+    )
+    total = 0
+    while True:
+        try:
+            actualizados = db.execute(
+                update(models.Turno)
+                .where(models.Turno.id.in_(vencidos.scalar_subquery()))
+                .values(estado=estado_asistido)
+                .returning(models.Turno.id, models.Turno.fecha, models.Turno.hora, models.Turno.persona_id, models.Turno.recurso_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if actualizados:
+                #Un cambio por turno en el log, en la misma transaccion que el lote
+                db.execute(insert(models.Cambio), [
+                    {
+                        "entidad": crudCambios.ENTIDAD_TURNO,
+                        "entidad_id": turno.id,
+                        "operacion": crudCambios.OPERACION_MODIFICACION,
+                        "datos": {
+                            "id": turno.id,
+                            "fecha": turno.fecha.isoformat(),
+                            "hora": turno.hora.strftime("%H:%M:%S"),
+                            "estado": estado_asistido,
+                            "persona_id": turno.persona_id,
+                            "recurso_id": turno.recurso_id,
+                        },
+                    }
+                    for turno in actualizados
+                ])
             db.commit()
-            db.refresh(persona)
-    return True
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise Exception(f"Error al expirar los turnos pasados: {e}")
+        total += len(actualizados)
+        if len(actualizados) < lote:
+            return total
+
+#=============== RESUMEN MATERIALIZADO DE CANCELACIONES ===================
+
+#Retorna el rango [inicio, fin) de un mes, para filtrar por fecha sin usar strftime sobre la columna
+def rango_mes(anio: int, mes: int):
+    inicio = date(anio, mes, 1)
+    fin = date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+    return inicio, fin
+
+def es_estado_cancelado(estado: str):
+    return estado is not None and estado.lower() == diccionario_estados.get('ESTADO_CANCELADO').lower()
+
+def actualizar_resumen_cancelacion(db: Session, persona_id: int, fecha: date, delta: int):
+    """
+        Suma (delta=1) o resta (delta=-1) una cancelacion en el resumen del mes de la fecha
+        No hace commit, se confirma en la misma transaccion que el cambio del turno
+    """
+    insercion = sqlite_insert(models.ResumenCancelacion).values(
+        anio=fecha.year, mes=fecha.month, persona_id=persona_id, cantidad=max(delta, 0)
+    )
+    db.execute(insercion.on_conflict_do_update(
+        index_elements=["anio", "mes", "persona_id"],
+        set_={"cantidad": models.ResumenCancelacion.cantidad + delta}
+    ))
+
+def registrar_transicion_cancelacion(db: Session, persona_id: int, fecha_anterior: date, estado_anterior: str, fecha_nueva: date, estado_nuevo: str):
+    """
+        Mantiene el resumen al día cuando un turno entra o sale del estado cancelado (o cambia de mes estando cancelado)
+    """
+    era_cancelado = es_estado_cancelado(estado_anterior)
+    es_cancelado = es_estado_cancelado(estado_nuevo)
+    if era_cancelado and es_cancelado and (fecha_anterior.year, fecha_anterior.month) == (fecha_nueva.year, fecha_nueva.month):
+        return
+    if era_cancelado:
+        actualizar_resumen_cancelacion(db, persona_id, fecha_anterior, -1)
+    if es_cancelado:
+        actualizar_resumen_cancelacion(db, persona_id, fecha_nueva, 1)
+
+def reconstruir_resumen_cancelaciones(db: Session):
+    """
+        Recalcula el resumen completo desde la tabla de turnos con una unica sentencia INSERT ... SELECT
+        Se usa para inicializar bases existentes o luego de cargas masivas de datos
+    """
+    try:
+        db.query(models.ResumenCancelacion).delete()
+        anio = cast(func.strftime("%Y", models.Turno.fecha), Integer)
+        mes = cast(func.strftime("%m", models.Turno.fecha), Integer)
+        seleccion = (
+            select(anio, mes, models.Turno.persona_id, func.count(models.Turno.id))
+            .where(models.Turno.estado == diccionario_estados.get('ESTADO_CANCELADO'))
+            .group_by(anio, mes, models.Turno.persona_id)
+        )
+        db.execute(insert(models.ResumenCancelacion).from_select(["anio", "mes", "persona_id", "cantidad"], seleccion))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise Exception(f"Error al reconstruir el resumen de cancelaciones: {e}")
+
+def asegurar_resumen_cancelaciones(db: Session):
+    """
+        Si el resumen esta vacio pero existen turnos cancelados (bases previas al resumen), lo reconstruye una unica vez
+    """
+    if db.query(models.ResumenCancelacion).first() is not None:
+        return
+    hay_cancelados = db.query(models.Turno.id).filter(
+        models.Turno.estado == diccionario_estados.get('ESTADO_CANCELADO')
+    ).first()
+    if hay_cancelados:
+        reconstruir_resumen_cancelaciones(db)
+
+#=============== MOTOR UNICO DEL REPORTE DE TURNOS CANCELADOS POR MES ===================
+
+#Valida mes y año del reporte, si no se proporcionan usa el mes/año actual
+def obtener_anio_mes(mes: int = None, anio: int = None):
+    if mes is None or anio is None:
+        fecha_actual = datetime.now()
+        anio = anio or fecha_actual.year
+        mes = mes or fecha_actual.month
+
+    if mes < 1 or mes > 12:
+        raise ValueError("El mes debe estar entre 1 y 12")
+    if anio < 1900 or anio > 2100:
+        raise ValueError("El año debe estar entre 1900 y 2100")
+    return anio, mes
+
+def reporte_cancelados_mes(db: Session, anio: int, mes: int, incluir_detalle: bool = True):
+    """
+        Motor unico del reporte de turnos cancelados de un mes, compartido por los endpoints JSON, CSV y PDF
+        - Con detalle: una sola consulta (turnos cancelados del mes con las columnas de la persona) y de ese
+          resultado se arman las vistas por dia, por persona y el total
+        - Sin detalle: lee los totales por persona del resumen precalculado, sin recorrer la tabla de turnos
+    """
+    personas_dict = {}
+    detalle_por_dia = []
+
+    if not incluir_detalle:
+        filas_resumen = (
+            db.query(models.ResumenCancelacion.cantidad, models.Persona.id, models.Persona.nombre, models.Persona.dni, models.Persona.telefono)
+            .join(models.Persona, models.Persona.id == models.ResumenCancelacion.persona_id)
+            .filter(
+                models.ResumenCancelacion.anio == anio,
+                models.ResumenCancelacion.mes == mes,
+                models.ResumenCancelacion.cantidad > 0
+            )
+            .order_by(models.ResumenCancelacion.persona_id)
+            .all()
+        )
+        for fila in filas_resumen:
+            personas_dict[fila.id] = {
+                "persona": {
+                    "id": fila.id,
+                    "nombre": fila.nombre,
+                    "dni": fila.dni,
+                    "telefono": fila.telefono,
+                    "cantidad_de_cancelados": fila.cantidad
+                },
+                "turnos_cancelados": []
+            }
+        total = sum(fila.cantidad for fila in filas_resumen)
+    else:
+        inicio, fin = rango_mes(anio, mes)
+        filas = (
+            db.query(
+                models.Turno.id, models.Turno.persona_id, models.Turno.fecha, models.Turno.hora, models.Turno.estado,
+                models.Persona.nombre, models.Persona.dni, models.Persona.telefono
+            )
+            .join(models.Persona, models.Persona.id == models.Turno.persona_id)
+            .filter(
+                models.Turno.fecha >= inicio,
+                models.Turno.fecha < fin,
+                models.Turno.estado == diccionario_estados.get('ESTADO_CANCELADO')
+            )
+            .order_by(models.Turno.fecha, models.Turno.hora)
+            .all()
+        )
+
+        #Una sola pasada sobre el resultado arma las dos vistas (las filas llegan ordenadas por fecha)
+        dias_dict = {}
+        for fila in filas:
+            fecha_texto = fila.fecha.strftime("%Y-%m-%d")
+            hora_texto = fila.hora.strftime("%H:%M")
+
+            if fecha_texto not in dias_dict:
+                dias_dict[fecha_texto] = {"fecha": fecha_texto, "cantidad_cancelados": 0, "turnos": []}
+            dias_dict[fecha_texto]["cantidad_cancelados"] += 1
+            dias_dict[fecha_texto]["turnos"].append({
+                "id": fila.id,
+                "persona_id": fila.persona_id,
+                "hora": hora_texto,
+                "estado": fila.estado
+            })
+
+            if fila.persona_id not in personas_dict:
+                personas_dict[fila.persona_id] = {
+                    "persona": {
+                        "id": fila.persona_id,
+                        "nombre": fila.nombre,
+                        "dni": fila.dni,
+                        "telefono": fila.telefono,
+                        "cantidad_de_cancelados": 0
+                    },
+                    "turnos_cancelados": []
+                }
+            personas_dict[fila.persona_id]["persona"]["cantidad_de_cancelados"] += 1
+            personas_dict[fila.persona_id]["turnos_cancelados"].append({
+                "id": fila.id,
+                "fecha": fecha_texto,
+                "hora": hora_texto,
+                "estado": fila.estado
+            })
+
+        detalle_por_dia = list(dias_dict.values())
+        total = len(filas)
+
+    return {
+        "anio": anio,
+        "mes": meses_nombres[mes - 1],
+        "mes_numero": mes,
+        "total": total,
+        "detalle_por_persona": sorted(personas_dict.values(), key=lambda item: item["persona"]["id"]),
+        "detalle_por_dia": detalle_por_dia
+    }
 
 ##Error para indicar que no se encontro la persona en la base de datos
 class DatabaseResourceNotFound(Exception):
     pass
+
+#Recurso activo en el que se reserva un turno
+def get_recurso_activo(db: Session, recurso_id: int) -> models.Recurso:
+    recurso = db.get(models.Recurso, recurso_id)
+    if not recurso:
+        raise DatabaseResourceNotFound("Recurso no encontrado")
+    if not recurso.activo:
+        raise ValueError(f"El recurso {recurso.nombre} no está activo")
+    return recurso
+
+#Turnos que ocupan un lugar de su horario (los no cancelados). Se escribe igual que el WHERE del indice unico
+#parcial ux_turnos_recurso_fecha_hora_lugar, con el codigo literal, para que SQLite pueda usar ese indice
+turno_ocupa_lugar = models.Turno.estado != literal_column(str(int(models.EstadoTurno.ESTADO_CANCELADO)))
+
+#Primer lugar libre del horario en el recurso (None si ya tiene todos sus lugares ocupados)
+def lugar_libre(db: Session, recurso: models.Recurso, fecha: date, hora: time, excluir_turno_id: int = None):
+    consulta = select(models.Turno.lugar).where(
+        models.Turno.recurso_id == recurso.id,
+        models.Turno.fecha == fecha,
+        models.Turno.hora == hora, #la hora se guarda en minutos, se compara como entero
+        turno_ocupa_lugar
+    )
+    if excluir_turno_id is not None:
+        consulta = consulta.where(models.Turno.id != excluir_turno_id)
+    ocupados = set(db.scalars(consulta))
+    return next((lugar for lugar in range(1, recurso.capacidad + 1) if lugar not in ocupados), None)
     
 #Funcion para el endpoint POST/turnos
 def create_turnos(db: Session, turno: schemasTurno.TurnoCreate):
@@ -119,30 +418,41 @@ def create_turnos(db: Session, turno: schemasTurno.TurnoCreate):
         if not persona: 
             raise DatabaseResourceNotFound("Persona no encontrada")
     
-        if(not habilitar_persona(db, turno, persona)):
-            raise PermissionError ("La persona no esta habilitada")
+        #El campo habilitado lo mantienen al dia las cancelaciones y la tarea programada, solo se recalcula
+        #al reservar si la persona figura deshabilitada (por si sus cancelaciones ya salieron de la ventana)
+        if not persona.habilitado:
+            actualizar_habilitados(db, persona.id)
+            db.commit()
+            if not persona.habilitado:
+                raise PermissionError ("La persona no esta habilitada")
     
-        error = validar_fecha_hora(turno)
+        error = validar_fecha_hora(turno, db)
         if error:
             raise ValueError(error)
-        #Corrijo la funcion para validar si el turno existe, teniendo en cuenta los cancelados que puedan estar en ese mismo horario
-        #Me permite reservar un horario aunque exista un turno en la base de datos con misma fecha y hora pero que este CANCELADO
-        existente_no_cancelado = (
-            db.query(models.Turno).filter(models.Turno.fecha == turno.fecha, 
-                                          func.strftime('%H:%M', models.Turno.hora) == turno.hora.strftime('%H:%M'),
-                                          func.lower(models.Turno.estado) != diccionario_estados.get('ESTADO_CANCELADO').lower()).first())#Si el estado es cancelado no lo tiene en cuenta
-        if existente_no_cancelado:
+        recurso = get_recurso_activo(db, turno.recurso_id)
+        #Los turnos cancelados no ocupan lugar: se puede reservar un horario aunque tenga turnos cancelados
+        lugar = lugar_libre(db, recurso, turno.fecha, turno.hora)
+        if lugar is None:
+            metricas.contar("turnos_conflictos", operacion="alta")
             raise ValueError("El horario solicitado ya está reservado por otro paciente.")
 
         # Corrección: Cambio de .dict() (deprecado en Pydantic v2) a .model_dump()
         # Esto previene warnings y asegura compatibilidad con futuras versiones de Pydantic
-        nuevo_turno = models.Turno(**turno.model_dump())
+        nuevo_turno = models.Turno(**turno.model_dump(), lugar=lugar)
         nuevo_turno.estado = diccionario_estados.get('ESTADO_PENDIENTE')
         db.add(nuevo_turno)
+        db.flush()  #asigna el id para registrar el cambio en la misma transaccion
+        crudCambios.registrar_cambio_turno(db, nuevo_turno, crudCambios.OPERACION_ALTA)
         db.commit()
         db.refresh(nuevo_turno)
+        notificar_disponibilidad(nuevo_turno.fecha)
 
         return turno_diccionario(nuevo_turno, persona)
+    except IntegrityError:
+        #Otra reserva ocupo el mismo lugar entre la consulta y el alta
+        db.rollback()
+        metricas.contar("turnos_conflictos", operacion="alta")
+        raise ValueError("El horario solicitado ya está reservado por otro paciente.")
     except SQLAlchemyError as e:
         db.rollback()
         raise Exception(f"Error al crear el turno: {e}")
@@ -194,8 +504,15 @@ def delete_turno(turno_id: int, db: Session):
             if turno_eliminar.estado.lower() == diccionario_estados.get('ESTADO_ASISTIDO').lower():
                 raise ValueError("No se puede eliminar un turno que ya fue asistido")
 
+            #Si el turno estaba cancelado se descuenta del resumen mensual
+            registrar_transicion_cancelacion(db, turno_eliminar.persona_id, turno_eliminar.fecha, turno_eliminar.estado, turno_eliminar.fecha, None)
+            crudCambios.registrar_cambio_turno(db, turno_eliminar, crudCambios.OPERACION_BAJA)
+            fecha_eliminada = turno_eliminar.fecha
             db.delete(turno_eliminar)
+            if es_estado_cancelado(turno_eliminar.estado):
+                actualizar_habilitados(db, turno_eliminar.persona_id)
             db.commit()
+            notificar_disponibilidad(fecha_eliminada)
             return True #exito
         return False
     except ValueError:
@@ -206,55 +523,75 @@ def delete_turno(turno_id: int, db: Session):
         raise e
 
 
-def siguiente_hora(hora_actual:time):
+def _reservas_por_horario(db: Session, recurso_id: int, fecha_desde: date, fecha_hasta: date) -> dict:
+    #fecha -> {minutos desde la medianoche: turnos que ocupan lugar}, en una sola consulta agrupada
+    #Cuenta los mismos turnos que la reserva (lugar_libre): todos los no cancelados
+    reservas = {}
+    for fecha, minuto, cantidad in db.execute(
+        select(models.Turno.fecha, type_coerce(models.Turno.hora, Integer), func.count())
+        .where(
+            models.Turno.recurso_id == recurso_id,
+            models.Turno.fecha.between(fecha_desde, fecha_hasta),
+            turno_ocupa_lugar
+        )
+        .group_by(models.Turno.fecha, models.Turno.hora)
+    ):
+        reservas.setdefault(fecha, {})[minuto] = cantidad
+    return reservas
 
+def get_turnos_disponibles(fecha: date, db: Session, recurso_id: int = models.RECURSO_GENERAL):
     """
-        Solicita una hora(time)
-        Retorna una hora(time) posterior agregando 30 minutos
+        Solicita una fecha(date) y opcionalmente el recurso (por defecto el general)
+        Retorna una lista de turnos disponibles en esa fecha(date), vacia si ese dia no se atiende
     """
 
-    #Para usar timedelta es necesario trabajar con un dato datetime
-    fecha = datetime.today()
-    objeto_hora = datetime.combine(fecha, hora_actual)
+    #Validacion por fecha (No se pueden ver los turnos de dias anteriores a hoy)
+    hoy = datetime.today()
+    if fecha < hoy.date():
+        raise Exception("La fecha no puede ser anterior al día de hoy")
+
+    grilla = calendario.dia(db, fecha).grilla
+    if grilla is None:
+        return []
+    recurso = get_recurso_activo(db, recurso_id)
 
-    #Extrae unicamente el dato time
-    nueva_hora_datetime = objeto_hora + timedelta(minutes=30)
-    return nueva_hora_datetime.time()
+    #Horarios de la grilla del dia que todavia tienen lugar en el recurso
+    reservas = _reservas_por_horario(db, recurso.id, fecha, fecha).get(fecha, {})
+    return [texto for minuto, texto in zip(grilla.minutos, grilla.textos) if reservas.get(minuto, 0) < recurso.capacidad]
 
+#Maxima cantidad de dias que se pueden consultar juntos en la disponibilidad por rango
+MAXIMO_DIAS_DISPONIBILIDAD = 92
 
-def get_turnos_disponibles(fecha: date, db: Session):
+def validar_rango_disponibilidad(fecha_desde: date, fecha_hasta: date):
+    #Lanza ValueError si el rango de la disponibilidad no es valido
+    if fecha_desde < date.today():
+        raise ValueError("La fecha desde no puede ser anterior al día de hoy")
+    if fecha_hasta < fecha_desde:
+        raise ValueError("La fecha desde no puede ser posterior a la fecha hasta")
+    if (fecha_hasta - fecha_desde).days >= MAXIMO_DIAS_DISPONIBILIDAD:
+        raise ValueError(f"El rango no puede superar los {MAXIMO_DIAS_DISPONIBILIDAD} días")
+
+def get_disponibilidad_rango(db: Session, fecha_desde: date, fecha_hasta: date, recurso_id: int = models.RECURSO_GENERAL) -> list:
     """
-        Solicita una fecha(date)
-        Retorna una lista de turnos disponibles en esa fecha(date)
+        Horarios disponibles del recurso en cada fecha con atencion entre fecha_desde y fecha_hasta (inclusive)
+        Lee los horarios reservados de todo el rango en una sola consulta y los cruza con la agenda
+        Lanza ValueError si el rango no es valido
     """
+    validar_rango_disponibilidad(fecha_desde, fecha_hasta)
+    recurso = get_recurso_activo(db, recurso_id)
+    reservas = _reservas_por_horario(db, recurso.id, fecha_desde, fecha_hasta)
+
+    disponibilidad = []
+    for fecha, dia_agenda in calendario.dias(db, fecha_desde, fecha_hasta):
+        if dia_agenda.grilla is None:
+            continue
+        reservas_dia = reservas.get(fecha, {})
+        disponibilidad.append({
+            "fecha": fecha,
+            "horarios_disponibles": [texto for minuto, texto in zip(dia_agenda.grilla.minutos, dia_agenda.grilla.textos) if reservas_dia.get(minuto, 0) < recurso.capacidad],
+        })
+    return disponibilidad
 
-    #Validacion por fecha (No se pueden ver los turnos de dias anteriores a hoy)
-    hoy = datetime.today()
-    if fecha < hoy.date():
-        raise Exception("La fecha no puede ser anterior al día de hoy")
-    
-    #Variables para validacion de estado y fecha
-    franja_horaria = copy(schemasTurno.settings.horarios_turnos) #Acceder a lista de horarios de atencion del .env #Acceder al diccionario de estados del .env    
-    
-    #Se filtran los turnos comparando con el .env cargado previamente
-    turnos_reservados = [turno.hora for turno in db.query(models.Turno.hora).filter(and_(models.Turno.fecha == fecha, or_(models.Turno.estado == diccionario_estados.get('ESTADO_ASISTIDO'), models.Turno.estado == diccionario_estados.get('ESTADO_CONFIRMADO')))).all()]
-    for reservado in turnos_reservados:
-        if reservado in franja_horaria:
-            franja_horaria.remove(reservado)
-
-    #Define el rango horario
-    hora_inicio = time(hour=9, minute=0)
-    hora_fin =  time(hour=16,minute=30)
-    posibles_turnos = [] #lista de horarios disponibles
-    
-    #Bucle para buscar turnos disponibles
-    hora = hora_inicio
-    while hora <= hora_fin:
-        if hora not in turnos_reservados: 
-            posibles_turnos.append(hora.strftime("%H:%M")) #Ajusta el formato de fecha
-        hora = siguiente_hora(hora)
-
-    return posibles_turnos
 #Funcion para tener el turno por ID
 def get_turno(db: Session, turno_id: int):
     try:
@@ -278,9 +615,14 @@ def cancelar_turno(db: Session, turno_id: int):
 
     try:
         # Cambiar estado a cancelado
+        estado_anterior = turno_db.estado
         turno_db.estado = diccionario_estados.get('ESTADO_CANCELADO')
+        registrar_transicion_cancelacion(db, turno_db.persona_id, turno_db.fecha, estado_anterior, turno_db.fecha, turno_db.estado)
+        crudCambios.registrar_cambio_turno(db, turno_db, crudCambios.OPERACION_MODIFICACION)
+        actualizar_habilitados(db, turno_db.persona_id)
         db.commit()
         db.refresh(turno_db)
+        notificar_disponibilidad(turno_db.fecha)
 
         return turno_diccionario(turno_db, turno_db.persona)
     except Exception as e:
@@ -301,8 +643,10 @@ def confirmar_turno(db: Session, turno_id: int):
     try:
         # Cambiar estado a confirmado
         turno_db.estado = diccionario_estados.get('ESTADO_CONFIRMADO')
+        crudCambios.registrar_cambio_turno(db, turno_db, crudCambios.OPERACION_MODIFICACION)
         db.commit()
         db.refresh(turno_db)
+        notificar_disponibilidad(turno_db.fecha)
 
         return turno_diccionario(turno_db, turno_db.persona)
     except Exception as e:
@@ -324,23 +668,24 @@ def update_turno(db: Session, turno_id: int, turno_update: schemasTurno.TurnoUpd
    nueva_fecha = turno_update.fecha if turno_update.fecha is not None else turno_db.fecha
    nueva_hora = turno_update.hora if turno_update.hora is not None else turno_db.hora
    nuevo_estado = turno_update.estado if turno_update.estado is not None else turno_db.estado
+   nuevo_recurso_id = turno_update.recurso_id if turno_update.recurso_id is not None else turno_db.recurso_id
 
 
     #creamos turno_provisional para que contenga los datos nuevos y llamamos a validar_fechaYhora para ver si cumple con las condiciones
    turno_provisional = schemasTurno.TurnoCreate(fecha= nueva_fecha, hora= nueva_hora, persona_id=turno_db.persona_id)
-   error = validar_fecha_hora(turno_provisional)
+   error = validar_fecha_hora(turno_provisional, db)
    if error:
        raise ValueError(error)
    
-    #existente compara si hay dos fechas iguales pero con distinto id, quiere decir que hay dos turnos que se estan por superponer
-   existente = db.query(models.Turno).filter(
-       models.Turno.fecha == nueva_fecha,
-       func.strftime('%H:%M', models.Turno.hora) == nueva_hora.strftime('%H:%M'), #pasa el dato a str con horas y minutos para poder compararlo
-       models.Turno.id != turno_db.id
-   ).first()
-
-    #si es existente, error
-   if existente:
+    #Si el turno cambia de horario o de recurso necesita un lugar libre en el nuevo (sin contar al propio turno)
+   nuevo_lugar = turno_db.lugar
+   if (nueva_fecha, nueva_hora, nuevo_recurso_id) != (turno_db.fecha, turno_db.hora, turno_db.recurso_id):
+       recurso = get_recurso_activo(db, nuevo_recurso_id)
+       nuevo_lugar = lugar_libre(db, recurso, nueva_fecha, nueva_hora, excluir_turno_id=turno_db.id)
+
+    #si no hay lugar, error
+   if nuevo_lugar is None:
+       metricas.contar("turnos_conflictos", operacion="modificacion")
        raise ValueError("Ya existe un turno reservado en esa fecha y hora")
    
    if turno_update.estado is not None: #Verifica si el usuario quiere modificar el turno
@@ -369,15 +714,31 @@ def update_turno(db: Session, turno_id: int, turno_update: schemasTurno.TurnoUpd
                     break
    
    try:
+       #Se actualiza el resumen de cancelaciones si el turno entra o sale del estado cancelado
+       registrar_transicion_cancelacion(db, turno_db.persona_id, turno_db.fecha, turno_db.estado, nueva_fecha, nuevo_estado)
+
        #Asignacion de los nuevos valores
+       cambia_cancelacion = es_estado_cancelado(turno_db.estado) or es_estado_cancelado(nuevo_estado)
+       fecha_anterior = turno_db.fecha
        turno_db.fecha = nueva_fecha
        turno_db.hora = nueva_hora
        turno_db.estado =nuevo_estado
+       turno_db.recurso_id = nuevo_recurso_id
+       turno_db.lugar = nuevo_lugar
+       crudCambios.registrar_cambio_turno(db, turno_db, crudCambios.OPERACION_MODIFICACION)
+       if cambia_cancelacion:
+           actualizar_habilitados(db, turno_db.persona_id)
 
        db.commit()
        db.refresh(turno_db)
+       notificar_disponibilidad(fecha_anterior, nueva_fecha)
 
        return turno_diccionario(turno_db,turno_db.persona)
+   except IntegrityError:
+       #Otra reserva ocupo el mismo lugar entre la consulta y la modificacion
+       db.rollback()
+       metricas.contar("turnos_conflictos", operacion="modificacion")
+       raise ValueError("Ya existe un turno reservado en esa fecha y hora")
    except Exception as e:
        db.rollback() #creamos un rollback por si hay un error que no modifique los datos que ya estaban
        raise e
@@ -421,39 +782,43 @@ def get_turnos_por_dni(db: Session, dni: str):
 
 def get_personas_turnos_cancelados(db: Session, min_cancelados: int):
 
-    personas_estado_cancelado =(
-    db.query(models.Persona, func.count(models.Turno.id).label("contador_de_turnos")) #Trae a la persona, y un contador de sus turnos
-    .join(models.Turno, models.Persona.id == models.Turno.persona_id).filter(func.lower(models.Turno.estado) == diccionario_estados.get('ESTADO_CANCELADO').lower())
-    #Uso join para unir a la persona con sus turnos mediante el persona_id y filtro los del estado "cancelado"
-    .group_by(models.Persona.id) #Agrupamos por persona
-    .having(func.count(models.Turno.id) >= min_cancelados).all()
-     #filtrar por las personas que cumplen el minimo de turnos cancelados y mostrar los resultados
+    cancelado = diccionario_estados.get('ESTADO_CANCELADO')
+    #Personas con al menos min_cancelados turnos cancelados y su contador (subconsulta agrupada por persona)
+    contadores = (
+        select(models.Turno.persona_id, func.count(models.Turno.id).label("contador_de_turnos"))
+        .where(models.Turno.estado == cancelado)
+        .group_by(models.Turno.persona_id)
+        .having(func.count(models.Turno.id) >= min_cancelados)
+        .subquery()
     )
 
-    lista_cancelados = []
-
-    #Para cada persona encontrada, sacamos el detalle de sus turnos cancelados
-    for persona, count in personas_estado_cancelado:
-        turnos_cancelados_detalle = (
-            db.query(models.Turno).options(joinedload(models.Turno.persona))
-            .filter(
-                models.Turno.persona_id == persona.id, #filtramos los turnos de la persona
-                func.lower(models.Turno.estado) == diccionario_estados.get('ESTADO_CANCELADO').lower() #filtramos por estado cancelado
-            )
-            .all() #devolvemos el detalle de los turnos
-        )
+    personas_estado_cancelado = (
+        db.query(models.Persona, contadores.c.contador_de_turnos)
+        .join(contadores, contadores.c.persona_id == models.Persona.id)
+        .order_by(models.Persona.id)
+        .all()
+    )
 
+    #El detalle de los turnos cancelados de todas esas personas se trae en una sola consulta
+    #(antes era una consulta por persona) y se agrupa por persona
+    turnos_por_persona = {}
+    turnos_cancelados_detalle = (
+        db.query(models.Turno.persona_id, models.Turno.id, models.Turno.fecha, models.Turno.hora, models.Turno.estado)
+        .join(contadores, contadores.c.persona_id == models.Turno.persona_id)
+        .filter(models.Turno.estado == cancelado)
+        .order_by(models.Turno.persona_id, models.Turno.id)
+    )
+    for turno in turnos_cancelados_detalle:
         #Estructura optimizada: turnos sin datos redundantes de persona
-        turnos_limpios = [
-            {
-                "id": turno.id,
-                "fecha": turno.fecha,
-                "hora": turno.hora,
-                "estado": turno.estado
-            }
-            for turno in turnos_cancelados_detalle
-        ]
+        turnos_por_persona.setdefault(turno.persona_id, []).append({
+            "id": turno.id,
+            "fecha": turno.fecha,
+            "hora": turno.hora,
+            "estado": turno.estado
+        })
 
+    lista_cancelados = []
+    for persona, count in personas_estado_cancelado:
         #Lo mismo para la persona
         persona_estructurada = schemas.PersonaOut(
             **persona.__dict__, #obtiene los datos de la persona y ** esto hace que los separe para que schemas de personasOut tome lo que necesita
@@ -464,11 +829,9 @@ def get_personas_turnos_cancelados(db: Session, min_cancelados: int):
         lista_cancelados.append({
             "persona": persona_estructurada, #tomamos los datos limpios de personas
             "turnos_cancelados_contador": count, #sumamos el contador con el nombre que tiene en el schema
-            "turnos_cancelados_detalle": turnos_limpios, #sumamos los detalles de los turnos cancelados (sin redundancia)
-
+            "turnos_cancelados_detalle": turnos_por_persona.get(persona.id, []), #sumamos los detalles de los turnos cancelados (sin redundancia)
         })
 
-
     return lista_cancelados #retornamos
 
 def get_turnos_por_fecha(db: Session, fecha: date):
@@ -511,61 +874,16 @@ def get_turnos_por_fecha(db: Session, fecha: date):
 def get_turnos_cancelados_mes_actual(db: Session):
 
     try:
+        anio_actual, mes_actual = obtener_anio_mes()#obtiene el mes y año actual para filtrar los resultados
 
-        fecha_actual = datetime.now()#obtiene la fecha actual para obtener el mes actual y el año, de esa manera filtra los resultados
-        anio_actual = fecha_actual.year
-        mes_actual = fecha_actual.month
-    
-        resultados = (
-            db.query(
-                func.date(models.Turno.fecha).label("dia"),
-                func.count(models.Turno.id).label("cantidad")#Cuando se realiza la agrupacion de los resultados se generan estos dos atributos
-            )                                                #que van a indicar el dia por el que se agrupo y la cantidad de turnos cancelados que hubo   
-            .filter(
-                func.strftime("%Y", models.Turno.fecha) == str(anio_actual),
-                func.strftime("%m", models.Turno.fecha) == f"{mes_actual:02d}",#filtra los turnos transformando el formato de datetime a string para poder compararlos
-                func.lower(models.Turno.estado) == diccionario_estados.get('ESTADO_CANCELADO').lower()
-            )
-            .group_by(func.date(models.Turno.fecha))#agrupa por dia, donde haya turnos cancelados, los resultados me van a devolver la cantidad y la fecha
-            .order_by(func.date(models.Turno.fecha))#ordena los resultados segun la fecha
-            .all()
-        )
-        
-        turnos_mes = (
-                db.query(models.Turno)
-                .filter(
-                    func.strftime("%Y", models.Turno.fecha) == str(anio_actual),
-                    func.strftime("%m", models.Turno.fecha) == f"{mes_actual:02d}",
-                    func.lower(models.Turno.estado) == diccionario_estados.get('ESTADO_CANCELADO').lower()
-                ).all() #obtengo el detalle de los turnos de ese mes
-            )
-        
-        turnos_por_dia = []#creo una lista que tendra todos los turnos cancelados. Contiene sublistas con turnos de un mismo dia
-        for fila in resultados:
-            dia = fila.dia
-            cantidad = fila.cantidad #es la informacion que tendra cada sub lista de turnos en un mismo dia, la fecha y la cantidad 
-            turnos_detalle = [
-                {
-                    "id": turno.id,
-                    "persona_id": turno.persona_id,
-                    "hora": turno.hora.strftime("%H:%M"),
-                    "estado": turno.estado
-                }
-                for turno in turnos_mes if turno.fecha.strftime("%Y-%m-%d") == str(fila.dia) #una vez que tengo los turnos que corresponden a esa fila del resultado, reformo los datos para que se muestren facilmente
-            ]
-            turnos_por_dia.append({
-                "fecha": dia,
-                "cantidad_cancelados": cantidad,
-                "turnos": turnos_detalle
-            }) #por cada dia muestro sus datos (fecha y cantidad de turnos cancelados) y devuelvo la sublista formada con los datos del turno
-        
-        total_turnos_cancelados = sum(fila.cantidad for fila in resultados)
+        #El motor del reporte devuelve la lista de dias con turnos cancelados, cada dia con su fecha, cantidad y el detalle de sus turnos
+        reporte = reporte_cancelados_mes(db, anio_actual, mes_actual)
 
         return {
-            "anio": anio_actual,
-            "mes": meses_nombres[mes_actual-1],
-            "cantidad": total_turnos_cancelados,
-            "detalle_por_dia": turnos_por_dia
+            "anio": reporte["anio"],
+            "mes": reporte["mes"],
+            "cantidad": reporte["total"],
+            "detalle_por_dia": reporte["detalle_por_dia"]
         } #genero el cuerpo de respuesta final, con una lista de turnos por dia que contiene la sublista con los detalles de cada turno
     except SQLAlchemyError as e:
         raise Exception(f"Error en la base de datos al generar el reporte de turnos cancelados: {e}")
@@ -617,61 +935,17 @@ def get_turnos_confirmados_desde_hasta(fecha_desde, fecha_hasta, db, pag=1, por_
             
     }
 
-#Funcion de turnos cancelados en el mes actual, reformado para que solo realice una consulta, sin usar group_by, por recomendacion en la devolucion de la presentacion 
+#Funcion de turnos cancelados en el mes actual agrupados por persona (misma consulta que el resto de los reportes mensuales)
 def get_turnos_cancelados_mes_actual_reformado(db: Session):
     try:
-        # Fecha actual
-        fecha_actual = datetime.now()
-        anio_actual = fecha_actual.year
-        mes_actual = fecha_actual.month
-
-        # Obtener todos los turnos cancelados del mes actual en una sola consulta
-        turnos_cancelados = (
-            db.query(models.Turno)
-            .options(joinedload(models.Turno.persona))
-            .filter(
-                func.strftime("%Y", models.Turno.fecha) == str(anio_actual),
-                func.strftime("%m", models.Turno.fecha) == f"{mes_actual:02d}",
-                func.lower(models.Turno.estado) == diccionario_estados.get("ESTADO_CANCELADO").lower()
-            )
-            .order_by(models.Turno.persona_id, models.Turno.fecha)
-            .all()
-        )
-        # Agrupar turnos por persona, se diferencia del otro endpoint en que no realiza la reforma de los datos por fecha, sino por persona.
-        personas_dict = {}
-        for turno in turnos_cancelados:
-            persona = turno.persona
-            if persona.id not in personas_dict:
-                personas_dict[persona.id] = {
-                    "persona": {
-                        "id": persona.id,
-                        "nombre": persona.nombre,
-                        "dni": persona.dni,
-                        "telefono":persona.telefono,
-                        "cantidad_de_cancelados": 0
-                    },
-                    "turnos_cancelados": []
-                }
-
-            personas_dict[persona.id]["turnos_cancelados"].append({
-                "id": turno.id,
-                "fecha": turno.fecha.strftime("%Y-%m-%d"),
-                "hora": turno.hora.strftime("%H:%M"),
-                "estado": turno.estado
-            })
-            personas_dict[persona.id]["persona"]["cantidad_de_cancelados"] += 1
-
-        # Convertir el diccionari a lista, para respuesta
-        detalle_por_persona = list(personas_dict.values())
-
-        # Calcular cantidad total de turnos cancelados
-        cantidad_total = len(turnos_cancelados)
+        anio_actual, mes_actual = obtener_anio_mes()
+        reporte = reporte_cancelados_mes(db, anio_actual, mes_actual)
 
         return {
-            "anio": anio_actual,
-            "mes": meses_nombres[mes_actual - 1],
-            "cantidad_total": cantidad_total,
-            "detalle_por_persona": detalle_por_persona
+            "anio": reporte["anio"],
+            "mes": reporte["mes"],
+            "cantidad_total": reporte["total"],
+            "detalle_por_persona": reporte["detalle_por_persona"]
         }
 
     except SQLAlchemyError as e:
@@ -680,75 +954,22 @@ def get_turnos_cancelados_mes_actual_reformado(db: Session):
         raise Exception(f"Error inesperado al generar el reporte de turnos cancelados: {e}")
 
 
-def get_turnos_cancelados_por_mes(db: Session, mes: int = None, anio: int = None):
+def get_turnos_cancelados_por_mes(db: Session, mes: int = None, anio: int = None, incluir_detalle: bool = True):
     """
     Obtiene turnos cancelados para un mes y año específicos.
     Si no se proporcionan mes/año, usa el mes/año actual.
+    Con incluir_detalle=False solo lee el resumen precalculado (sin listar los turnos).
     """
     try:
-        # Si no se proporcionan mes/año, usar actual
-        if mes is None or anio is None:
-            fecha_actual = datetime.now()
-            anio = anio or fecha_actual.year
-            mes = mes or fecha_actual.month
-
-        # Validar mes
-        if mes < 1 or mes > 12:
-            raise ValueError("El mes debe estar entre 1 y 12")
-
-        # Validar año
-        if anio < 1900 or anio > 2100:
-            raise ValueError("El año debe estar entre 1900 y 2100")
-
-        # Obtener todos los turnos cancelados del mes especificado
-        turnos_cancelados = (
-            db.query(models.Turno)
-            .options(joinedload(models.Turno.persona))
-            .filter(
-                func.strftime("%Y", models.Turno.fecha) == str(anio),
-                func.strftime("%m", models.Turno.fecha) == f"{mes:02d}",
-                func.lower(models.Turno.estado) == diccionario_estados.get("ESTADO_CANCELADO").lower()
-            )
-            .order_by(models.Turno.persona_id, models.Turno.fecha)
-            .all()
-        )
-
-        # Agrupar turnos por persona
-        personas_dict = {}
-        for turno in turnos_cancelados:
-            persona = turno.persona
-            if persona.id not in personas_dict:
-                personas_dict[persona.id] = {
-                    "persona": {
-                        "id": persona.id,
-                        "nombre": persona.nombre,
-                        "dni": persona.dni,
-                        "telefono": persona.telefono,
-                        "cantidad_de_cancelados": 0
-                    },
-                    "turnos_cancelados": []
-                }
-
-            personas_dict[persona.id]["turnos_cancelados"].append({
-                "id": turno.id,
-                "fecha": turno.fecha.strftime("%Y-%m-%d"),
-                "hora": turno.hora.strftime("%H:%M"),
-                "estado": turno.estado
-            })
-            personas_dict[persona.id]["persona"]["cantidad_de_cancelados"] += 1
-
-        # Convertir el diccionario a lista
-        detalle_por_persona = list(personas_dict.values())
-
-        # Calcular cantidad total de turnos cancelados
-        cantidad_total = len(turnos_cancelados)
+        anio, mes = obtener_anio_mes(mes, anio)
+        reporte = reporte_cancelados_mes(db, anio, mes, incluir_detalle)
 
         return {
-            "anio": anio,
-            "mes": meses_nombres[mes - 1],
-            "mes_numero": mes,
-            "total_cancelados": cantidad_total,
-            "detalle_por_persona": detalle_por_persona
+            "anio": reporte["anio"],
+            "mes": reporte["mes"],
+            "mes_numero": reporte["mes_numero"],
+            "total_cancelados": reporte["total"],
+            "detalle_por_persona": reporte["detalle_por_persona"]
         }
 
     except ValueError as e:
@@ -1034,71 +1255,91 @@ def generar_csv_turnos_cancelados_reformado(db: Session):
     except Exception as e:
         raise Exception(f"Error inesperado al generar CSV de turnos cancelados: {e}")
 
-    
 
-#=============== FUNCIONES PARA GENERAR ARCHIVOS PDF DE REPORTE ===================
+#=============== CONSULTAS PARA EXPORTAR REPORTES EN FORMATO COLUMNAR ===================
+#Devuelven la consulta (select) sin ejecutarla: services/export_service la lee por lotes y escribe cada lote en el archivo
+#Las columnas conservan su tipo (fecha, hora, enteros, booleanos) en lugar de textos formateados
+
+def _columnas_turno_persona():
+    return (
+        models.Turno.id.label("turno_id"),
+        models.Turno.fecha.label("fecha"),
+        models.Turno.hora.label("hora"),
+        models.Turno.estado.label("estado"),
+        models.Persona.id.label("persona_id"),
+        models.Persona.nombre.label("nombre"),
+        models.Persona.dni.label("dni"),
+        models.Persona.telefono.label("telefono"),
+    )
 
-def generar_pdf_turnos_cancelados_mes_actual_reformado(datos: dict):
-    try:
-        if not datos or not datos.get("detalle_por_persona"):
-            return None
-        # Crear documento
-        pdf = Document()
-        page = Page()#crea una pagina
-        pdf.add_page(page)
-        layout = SingleColumnLayout(page)#Permite agregar contenido y tiene ajustes automaticos sobre donde ubicar cada cosa que se agregue a la pagina, es un controlador de la misma.
-        # Se le agrega un titulo al documento
-        layout.add(
-            Paragraph(
-                f"Reporte de Turnos Cancelados — {datos['mes'].capitalize()} {datos['anio']}",
-                font="Helvetica-Bold", #El tipo de etra
-                font_size=16, #Tamanio de las letras
-                margin_bottom=0, #Minima separacion con el siguiente contenido
-                horizontal_alignment=Alignment.CENTERED #Se indica que se centre
-            )
+def consulta_export_turnos_por_fecha(fecha: date):
+    return (
+        select(*_columnas_turno_persona())
+        .join(models.Persona, models.Persona.id == models.Turno.persona_id)
+        .where(models.Turno.fecha == fecha)
+        .order_by(models.Turno.hora, models.Persona.id)
+    )
+
+def consulta_export_cancelados_por_mes(mes: int = None, anio: int = None):
+    anio, mes = obtener_anio_mes(mes, anio)
+    inicio, fin = rango_mes(anio, mes)
+    return (
+        select(*_columnas_turno_persona())
+        .join(models.Persona, models.Persona.id == models.Turno.persona_id)
+        .where(
+            models.Turno.fecha >= inicio,
+            models.Turno.fecha < fin,
+            models.Turno.estado == diccionario_estados.get('ESTADO_CANCELADO')
         )
-        layout.add(Paragraph(f"Total de turnos cancelados: {datos['cantidad_total']}", margin_top=0, margin_bottom=0, font="Helvetica-Bold", font_size=12))
-        layout.add(Paragraph(f"Cantidad de personas con turnos cancelados: {len(datos['detalle_por_persona'])}", margin_top=0, font="Helvetica-Bold", font_size=12))
-        layout.add(HorizontalRule()) #Agrega una linea horizontal
-
-        # Recorrer personas
-        for fila in datos["detalle_por_persona"]:
-            persona = fila["persona"]
-            turnos = fila["turnos_cancelados"]
-            
-            layout.add(
-                Paragraph(
-                    f"Persona: {persona['nombre']} (DNI {persona['dni']}), ID: {persona['id']}, contacto: {persona['telefono']}", #Agrego los datos de cada persona mientras se recorre
-                    font="Helvetica-Bold",
-                    margin_bottom=0
-                )
-            )
-            layout.add(Paragraph(f"Cantidad de turnos cancelados: {persona['cantidad_de_cancelados']}", margin_top=0, margin_bottom=0))
-
-            #Creo una tabla con los turnos cancelados de cada persona. Una tabla por turnos correspondientes a cada persona.
-            total_filas = 1 + len(turnos) #La cantidad de turnos cancelados de cada persona mas la fila de los encabezados.
-            encabezados = ["ID Turno", "Fecha", "Hora", "Estado", "Persona_id"] #Los encaezados que quiero mostrar de los turnos de cada persona.
-            tamanio_columnas = [Decimal(50),Decimal(80), Decimal(40), Decimal(80), Decimal(50)] #Indico el tamaño de las celdas para cada atributo.
-            table = FixedColumnWidthTable(number_of_rows=total_filas, number_of_columns=5, column_widths=tamanio_columnas)#Genero la tabla, indicando sus atributos.
-
-            for encabezado in encabezados:
-                table.add(TableCell(Paragraph(encabezado, font="Helvetica-Bold", font_size=11, horizontal_alignment=Alignment.CENTERED), 
-                                    background_color= HexColor("#3465A4"))) #Agrego contenido a cada celda de la primera fila. Los datos y su formato y un color de fondo.
-                
-            for t in turnos:
-                table.add(TableCell (Paragraph(str(t["id"]), horizontal_alignment=Alignment.CENTERED), background_color= HexColor("#E6F0FF")))
-                table.add(TableCell (Paragraph(t["fecha"], horizontal_alignment=Alignment.CENTERED), background_color= HexColor("#E6F0FF")))
-                table.add(TableCell (Paragraph(t["hora"], horizontal_alignment=Alignment.CENTERED), background_color= HexColor("#E6F0FF")))
-                table.add(TableCell (Paragraph(t["estado"], horizontal_alignment=Alignment.CENTERED), background_color= HexColor("#D9534F")))#Agrego los datos de cada turno cancelado, con un color de fondo en cada celda.
-                table.add(TableCell (Paragraph(str(persona["id"]), horizontal_alignment=Alignment.CENTERED), background_color= HexColor("#E6F0FF")))
-            table.set_padding_on_all_cells(Decimal(3), Decimal(3), Decimal(2), Decimal(3)) #Agrego separacion entre el contenido y todos los bordes.
-            layout.add(table) #Agrego la tabla a la pagina.
-            layout.add(Paragraph(" ", margin_top=0, margin_bottom=0))
-            layout.add(HorizontalRule())
-
-        buffer = BytesIO() #Genero un archivo en memoria, donde se va a guardar el pdf temporal que se enviara con fastapi en formato de bytes.
-        PDF.dumps(buffer, pdf) #Genero el pdf y lo guardo en el buffer.
-        buffer.seek(0) #Indico que se vuelva al principio del archivo para leerlo correctamente.
-        return buffer
-    except Exception as e:
-        raise Exception(f"Error inesperado al generar PDF de turnos cancelados: {e}")
+        .order_by(models.Turno.fecha, models.Turno.hora)
+    )
+
+def consulta_export_turnos_por_persona(dni: str):
+    return (
+        select(*_columnas_turno_persona())
+        .join(models.Persona, models.Persona.id == models.Turno.persona_id)
+        .where(models.Persona.dni == dni)
+        .order_by(models.Turno.fecha, models.Turno.hora)
+    )
+
+def consulta_export_turnos_cancelados(min_cancelados: int):
+    es_cancelado = models.Turno.estado == diccionario_estados.get('ESTADO_CANCELADO')
+    #Personas que alcanzan el minimo de cancelados, con su contador (una sola consulta, sin recorrer persona por persona)
+    contadores = (
+        select(models.Turno.persona_id, func.count(models.Turno.id).label("cantidad_cancelados"))
+        .where(es_cancelado)
+        .group_by(models.Turno.persona_id)
+        .having(func.count(models.Turno.id) >= min_cancelados)
+        .subquery()
+    )
+    return (
+        select(
+            models.Persona.id.label("persona_id"),
+            models.Persona.nombre.label("nombre"),
+            models.Persona.dni.label("dni"),
+            models.Persona.telefono.label("telefono"),
+            models.Persona.habilitado.label("habilitado"),
+            contadores.c.cantidad_cancelados,
+            models.Turno.id.label("turno_id"),
+            models.Turno.fecha.label("fecha"),
+            models.Turno.hora.label("hora"),
+        )
+        .join(contadores, contadores.c.persona_id == models.Persona.id)
+        .join(models.Turno, models.Turno.persona_id == models.Persona.id)
+        .where(es_cancelado)
+        .order_by(models.Persona.nombre, models.Turno.fecha, models.Turno.hora)
+    )
+
+def consulta_export_turnos_confirmados(fecha_desde: date, fecha_hasta: date):
+    if fecha_hasta < fecha_desde:
+        raise ValueError("La fecha inicial a consultar no puede ser posterior a la fecha final a consultar")
+    return (
+        select(*_columnas_turno_persona())
+        .join(models.Persona, models.Persona.id == models.Turno.persona_id)
+        .where(
+            models.Turno.fecha >= fecha_desde,
+            models.Turno.fecha <= fecha_hasta,
+            models.Turno.estado == diccionario_estados.get('ESTADO_CONFIRMADO')
+        )
+        .order_by(models.Turno.fecha, models.Turno.hora)
+    )
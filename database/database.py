@@ -1,15 +1,25 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# URL de la base de datos SQLite
-SQLALCHEMY_DATABASE_URL = "sqlite:///./personas.db"
+from schemas.schemasTurno import settings
+
+# URL de la base de datos SQLite (DATABASE_URL en el .env, por defecto personas.db en la carpeta actual)
+SQLALCHEMY_DATABASE_URL = settings.database_url
 
 # Crea el engine de SQLAlchemy
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
+# Modo WAL: las lecturas trabajan sobre una foto de la base y no bloquean a las escrituras
+# (lo necesitan las exportaciones largas que leen todo dentro de una misma transacción)
+@event.listens_for(engine, "connect")
+def configurar_sqlite(conexion_dbapi, registro_conexion):
+    cursor = conexion_dbapi.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
 # Crea una fábrica de sesiones
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
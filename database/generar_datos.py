@@ -0,0 +1,189 @@
+"""
+Generador de datos sintéticos para pruebas de carga y de capacidad.
+
+Crea N personas y M turnos con distribuciones de estado realistas: los turnos pasados son en su mayoría
+asistidos y los futuros pendientes o confirmados, con una parte de cancelados en ambos. Algunas personas
+reservan mucho más que otras. Dentro de cada día los turnos que no están cancelados ocupan horarios distintos
+(nunca hay dos turnos activos en el mismo horario); los cancelados pueden repetir horario, como en la
+aplicación.
+
+Los turnos usan los horarios de cada día de la semana configurados en el .env (services/calendario_service.py),
+sin tener en cuenta los cierres por fecha.
+
+Las filas se insertan por lotes con executemany sobre la conexión, con los valores ya convertidos al formato
+de la base, así un millón de turnos se carga en segundos. Al final se reconstruye el resumen de cancelaciones
+y se recalcula el estado habilitado de las personas.
+
+Uso (desde la raíz del proyecto, usa la base de DATABASE_URL):
+    python -m database.generar_datos --personas 50000 --turnos 1000000
+    python -m database.generar_datos --personas 2000 --turnos 15000 --desde 2024-01-01 --hasta 2026-12-31 --vaciar
+
+Con los 16 horarios por día del .env, sin --desde/--hasta el rango de fechas se extiende hacia atrás lo necesario para
+ubicar todos los turnos (con un millón de turnos llega a fechas de hace más de un siglo).
+"""
+import argparse
+import itertools
+import random
+import time
+import unicodedata
+from datetime import date, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import crud.crudTurno as crudTurno
+import models.models as models
+from database import migraciones
+from database.database import engine
+from schemas.schemasTurno import grilla_horarios
+from services.calendario_service import PLANTILLAS
+
+
+HORARIOS = list(grilla_horarios.minutos)  #horarios del .env, en minutos desde la medianoche
+PRIMER_DNI = 10000000  #la persona numero i tiene el DNI PRIMER_DNI + i
+FILAS_POR_LOTE = 50000
+
+NOMBRES = ["Juan", "María", "Carlos", "Ana", "Luis", "Laura", "Pedro", "Sofía", "Diego", "Lucía", "Martín",
+           "Valentina", "Jorge", "Camila", "Pablo", "Julieta", "Ricardo", "Florencia", "Tomás", "Agustina"]
+APELLIDOS = ["Pérez", "García", "Rodríguez", "López", "Martínez", "González", "Fernández", "Gómez", "Díaz",
+             "Romero", "Sosa", "Álvarez", "Torres", "Ruiz", "Ramírez", "Benítez", "Acosta", "Medina"]
+DOMINIOS = ["gmail.com", "hotmail.com", "yahoo.com", "outlook.com"]
+
+E = models.EstadoTurno
+#Distribucion de estados (estado, peso) segun si el turno ya paso o no
+DISTRIBUCION_PASADOS = [(E.ESTADO_ASISTIDO, 65), (E.ESTADO_CANCELADO, 15), (E.ESTADO_CONFIRMADO, 10), (E.ESTADO_PENDIENTE, 10)]
+DISTRIBUCION_FUTUROS = [(E.ESTADO_PENDIENTE, 55), (E.ESTADO_CONFIRMADO, 35), (E.ESTADO_CANCELADO, 10)]
+PROPORCION_MINIMA_CANCELADOS = 0.10
+
+
+def dias_habiles(desde: date, hasta: date) -> list:
+    #Fechas entre desde y hasta (inclusive) cuyo dia de la semana tiene atencion
+    return [desde + timedelta(days=i) for i in range((hasta - desde).days + 1) if PLANTILLAS[(desde + timedelta(days=i)).weekday()] is not None]
+
+
+def rango_por_defecto(turnos: int):
+    """Rango de fechas que usa el generador si no se indica: termina 30 días después de hoy, con un turno por horario"""
+    hasta = date.today() + timedelta(days=30)
+    cantidad_dias = max(1, -(-turnos // len(HORARIOS)))
+    return hasta - timedelta(days=cantidad_dias * 7 // 6 + 1), hasta
+
+
+def _email(nombre: str, apellido: str, numero: int, dominio: str) -> str:
+    #Los emails no admiten acentos
+    base = unicodedata.normalize("NFKD", f"{nombre}.{apellido}").encode("ascii", "ignore").decode().lower()
+    return f"{base}{numero}@{dominio}"
+
+
+def _filas_personas(rng: random.Random, cantidad: int):
+    for i in range(cantidad):
+        nombre, apellido = rng.choice(NOMBRES), rng.choice(APELLIDOS)
+        nacimiento = date(1940, 1, 1) + timedelta(days=rng.randrange(365 * 67))
+        yield (f"{nombre} {apellido}", _email(nombre, apellido, i, rng.choice(DOMINIOS)), str(PRIMER_DNI + i),
+               f"11{rng.randrange(10 ** 8):08d}", nacimiento.isoformat(), 1)
+
+
+def _filas_turnos(rng: random.Random, personas: int, turnos: int, dias: list, resumen: dict):
+    hoy = date.today()
+    #Peso de cada persona: unas pocas reservan mucho y la mayoria pocas veces
+    acumulados = list(itertools.accumulate(1 / (posicion + 1) ** 0.6 for posicion in range(personas)))
+    ids_personas = list(range(1, personas + 1))
+    rng.shuffle(ids_personas)
+
+    base, resto = divmod(turnos, len(dias))
+    for numero_dia, fecha in enumerate(dias):
+        cantidad = base + (1 if numero_dia < resto else 0)
+        if not cantidad:
+            continue
+        estados, pesos = zip(*(DISTRIBUCION_PASADOS if fecha < hoy else DISTRIBUCION_FUTUROS))
+        horarios = PLANTILLAS[fecha.weekday()].minutos
+        libres = list(horarios)
+        rng.shuffle(libres)
+        fecha_texto = fecha.isoformat()
+        for estado, persona_id in zip(rng.choices(estados, pesos, k=cantidad), rng.choices(ids_personas, cum_weights=acumulados, k=cantidad)):
+            if estado != E.ESTADO_CANCELADO:
+                if libres:
+                    yield (fecha_texto, libres.pop(), int(estado), persona_id)
+                    continue
+                #Dia completo: el turno queda cancelado para no repetir un horario activo
+                resumen["convertidos_a_cancelado"] += 1
+            yield (fecha_texto, rng.choice(horarios), int(E.ESTADO_CANCELADO), persona_id)
+
+
+def _insertar(conexion, sentencia: str, filas) -> int:
+    total = 0
+    while True:
+        lote = list(itertools.islice(filas, FILAS_POR_LOTE))
+        if not lote:
+            return total
+        conexion.exec_driver_sql(sentencia, lote)
+        total += len(lote)
+
+
+def generar_datos(personas: int, turnos: int, desde: date = None, hasta: date = None, semilla: int = 2025,
+                  vaciar: bool = False, motor=engine) -> dict:
+    """
+    Carga las personas y turnos en la base y retorna un resumen de lo generado.
+    Lanza ValueError si la base ya tiene datos (y no se pidió vaciarla) o si el rango de fechas no alcanza
+    para ubicar los turnos sin repetir horarios.
+    """
+    if personas < 1:
+        raise ValueError("Se necesita al menos una persona")
+    if (desde is None) != (hasta is None):
+        raise ValueError("Se deben indicar ambas fechas del rango (desde y hasta) o ninguna")
+    if desde is None:
+        desde, hasta = rango_por_defecto(turnos)
+    dias = dias_habiles(desde, hasta)
+    capacidad = int(sum(len(PLANTILLAS[dia.weekday()].minutos) for dia in dias) / (1 - PROPORCION_MINIMA_CANCELADOS))
+    if not dias or turnos > capacidad:
+        raise ValueError(f"El rango {desde} a {hasta} admite como máximo {capacidad} turnos sin repetir horarios")
+
+    migraciones.migrar(motor)
+    rng = random.Random(semilla)
+    resumen = {"personas": personas, "turnos": turnos, "desde": desde, "hasta": hasta, "convertidos_a_cancelado": 0}
+    inicio = time.perf_counter()
+
+    with motor.begin() as conexion:
+        if conexion.execute(text("SELECT 1 FROM personas LIMIT 1")).first() is not None:
+            if not vaciar:
+                raise ValueError("La base ya tiene personas cargadas, use vaciar=True (--vaciar) para reemplazarlas")
+            for tabla in ("turnos", "resumen_cancelaciones", "cambios", "personas"):
+                conexion.execute(text(f"DELETE FROM {tabla}"))
+
+        _insertar(conexion,
+                  "INSERT INTO personas (nombre, email, dni, telefono, fecha_nacimiento, habilitado) VALUES (?, ?, ?, ?, ?, ?)",
+                  _filas_personas(rng, personas))
+        _insertar(conexion,
+                  "INSERT INTO turnos (fecha, hora, estado, persona_id) VALUES (?, ?, ?, ?)",
+                  _filas_turnos(rng, personas, turnos, dias, resumen))
+
+    with Session(motor) as db:
+        crudTurno.reconstruir_resumen_cancelaciones(db)
+        resumen["deshabilitados"] = crudTurno.reevaluar_habilitados(db)
+
+    resumen["segundos"] = round(time.perf_counter() - inicio, 2)
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera personas y turnos sintéticos en la base de DATABASE_URL")
+    parser.add_argument("--personas", type=int, default=1000)
+    parser.add_argument("--turnos", type=int, default=20000)
+    parser.add_argument("--desde", type=date.fromisoformat, help="Primer día con turnos (YYYY-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Último día con turnos (YYYY-MM-DD)")
+    parser.add_argument("--semilla", type=int, default=2025)
+    parser.add_argument("--vaciar", action="store_true", help="Elimina las personas y turnos existentes antes de cargar")
+    args = parser.parse_args()
+
+    try:
+        resumen = generar_datos(args.personas, args.turnos, args.desde, args.hasta, args.semilla, args.vaciar)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"[OK] {resumen['personas']} personas y {resumen['turnos']} turnos generados en {resumen['segundos']} s")
+    print(f"   - Fechas: {resumen['desde']} a {resumen['hasta']}")
+    print(f"   - Personas deshabilitadas por cancelaciones: {resumen['deshabilitados']}")
+    if resumen["convertidos_a_cancelado"]:
+        print(f"   - Turnos cancelados por falta de horarios libres en el día: {resumen['convertidos_a_cancelado']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Migraciones del esquema de la base de datos.
+
+La versión del esquema se guarda en la tabla schema_version. Al iniciar la aplicación (si MIGRAR_AL_INICIAR
+está activo) o con el comando de abajo se aplican, en orden, las migraciones con número mayor a la versión
+actual, cada una en su propia transacción junto con el registro de su versión (si una falla, la base queda
+en la versión anterior).
+
+- Base nueva (sin tablas): se crean las tablas de los modelos y se marca la última versión.
+- Base creada antes de existir las migraciones (tablas sin schema_version): se marca la versión 1 y se
+  aplican las siguientes.
+
+Para un cambio de esquema se agrega una función al final de MIGRACIONES y se actualiza el modelo para que
+las bases nuevas lo tengan directamente. Las migraciones usan SQL escrito sobre la base y no los modelos,
+que siempre reflejan la última versión: así lo que crea cada versión no cambia cuando cambian los modelos.
+
+Uso manual (desde la raíz del proyecto), por ejemplo una sola vez antes de levantar varios workers:
+    python -m database.migraciones
+    python -m database.migraciones --datos-prueba
+"""
+import argparse
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+import models.models as models
+from database.database import engine
+
+
+#Tablas e indices tal como los creaba create_all antes de las migraciones
+ESQUEMA_INICIAL = (
+    "CREATE TABLE IF NOT EXISTS personas ("
+    "id INTEGER NOT NULL, nombre VARCHAR NOT NULL, email VARCHAR NOT NULL, dni VARCHAR NOT NULL, "
+    "telefono VARCHAR NOT NULL, fecha_nacimiento DATE NOT NULL, habilitado BOOLEAN NOT NULL, PRIMARY KEY (id))",
+    "CREATE INDEX IF NOT EXISTS ix_personas_id ON personas (id)",
+    "CREATE INDEX IF NOT EXISTS ix_personas_nombre ON personas (nombre)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_personas_email ON personas (email)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_personas_dni ON personas (dni)",
+    "CREATE INDEX IF NOT EXISTS ix_personas_telefono ON personas (telefono)",
+    "CREATE TABLE IF NOT EXISTS turnos ("
+    "id INTEGER NOT NULL, fecha DATE NOT NULL, hora TIME NOT NULL, estado VARCHAR NOT NULL, "
+    "persona_id INTEGER NOT NULL, PRIMARY KEY (id), FOREIGN KEY(persona_id) REFERENCES personas (id))",
+    "CREATE INDEX IF NOT EXISTS ix_turnos_id ON turnos (id)",
+    "CREATE TABLE IF NOT EXISTS resumen_cancelaciones ("
+    "anio INTEGER NOT NULL, mes INTEGER NOT NULL, persona_id INTEGER NOT NULL, cantidad INTEGER NOT NULL, "
+    "PRIMARY KEY (anio, mes, persona_id), FOREIGN KEY(persona_id) REFERENCES personas (id))",
+    "CREATE TABLE IF NOT EXISTS cambios ("
+    "seq INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, entidad VARCHAR NOT NULL, entidad_id INTEGER NOT NULL, "
+    "operacion VARCHAR NOT NULL, datos JSON, fecha_hora DATETIME NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS ejecuciones ("
+    "id INTEGER NOT NULL, tarea VARCHAR NOT NULL, inicio DATETIME NOT NULL, fin DATETIME NOT NULL, "
+    "filas_afectadas INTEGER NOT NULL, error VARCHAR, PRIMARY KEY (id))",
+    "CREATE INDEX IF NOT EXISTS ix_ejecuciones_id ON ejecuciones (id)",
+    "CREATE INDEX IF NOT EXISTS ix_ejecuciones_tarea ON ejecuciones (tarea)",
+)
+
+def _esquema_inicial(conexion):
+    #Solo se crean las tablas que falten (las bases anteriores pueden no tener las agregadas despues)
+    for sentencia in ESQUEMA_INICIAL:
+        conexion.execute(text(sentencia))
+
+def _indices_turnos(conexion):
+    #Busquedas de turnos por persona (historial, cancelaciones, habilitacion) y por fecha (disponibilidad, reportes)
+    conexion.execute(text("CREATE INDEX IF NOT EXISTS ix_turnos_persona_estado_fecha ON turnos (persona_id, estado, fecha)"))
+    conexion.execute(text("CREATE INDEX IF NOT EXISTS ix_turnos_fecha_hora ON turnos (fecha, hora)"))
+
+def _reconstruir_turnos(conexion, tipo_hora: str, tipo_estado: str, expresion_hora: str, expresion_estado: str, parametros: dict = None):
+    #SQLite no permite cambiar el tipo de una columna: se copia la tabla con los nuevos tipos y se reemplaza
+    #Los valores que usan las expresiones van en parametros, no dentro del SQL
+    conexion.execute(text(
+        "CREATE TABLE turnos_nueva ("
+        f"id INTEGER NOT NULL, fecha DATE NOT NULL, hora {tipo_hora} NOT NULL, estado {tipo_estado} NOT NULL, "
+        "persona_id INTEGER NOT NULL, PRIMARY KEY (id), FOREIGN KEY(persona_id) REFERENCES personas (id))"
+    ))
+    conexion.execute(text(
+        "INSERT INTO turnos_nueva (id, fecha, hora, estado, persona_id) "
+        f"SELECT id, fecha, {expresion_hora}, {expresion_estado}, persona_id FROM turnos"
+    ), parametros or {})
+    conexion.execute(text("DROP TABLE turnos"))
+    conexion.execute(text("ALTER TABLE turnos_nueva RENAME TO turnos"))
+    conexion.execute(text("CREATE INDEX ix_turnos_id ON turnos (id)"))
+    _indices_turnos(conexion)
+
+def _estado_turno_entero(conexion):
+    #El estado pasa de guardarse como texto a un codigo entero (models.EstadoTurno), segun los textos del .env
+    codigos = {texto: codigo.value for texto, codigo in models.CODIGOS_ESTADO.items()}
+    desconocidos = [
+        fila[0] for fila in conexion.execute(text("SELECT DISTINCT estado FROM turnos"))
+        if fila[0] is None or str(fila[0]).lower() not in codigos
+    ]
+    if desconocidos:
+        raise ValueError(f"Hay turnos con estados que no figuran en ESTADOS_POSIBLES: {desconocidos}")
+
+    #Los textos vienen del .env: se pasan como parametros para que una comilla no rompa la sentencia
+    parametros = {}
+    casos = []
+    for numero, (texto, codigo) in enumerate(codigos.items()):
+        parametros[f"texto{numero}"], parametros[f"codigo{numero}"] = texto, codigo
+        casos.append(f"WHEN :texto{numero} THEN :codigo{numero}")
+    _reconstruir_turnos(conexion, "TIME", "SMALLINT", "hora", f"CASE lower(estado) {' '.join(casos)} END", parametros)
+
+def _hora_en_minutos(conexion):
+    #La hora pasa de texto 'HH:MM:SS' a minutos desde la medianoche (models.MinutosDelDia)
+    minutos = "CAST(substr(hora, 1, 2) AS INTEGER) * 60 + CAST(substr(hora, 4, 2) AS INTEGER)"
+    _reconstruir_turnos(conexion, "INTEGER", "SMALLINT", minutos, "estado")
+
+def _tabla_cierres(conexion):
+    #Fechas sin atencion de la agenda (services/calendario_service.py)
+    conexion.execute(text(
+        "CREATE TABLE IF NOT EXISTS cierres ("
+        "fecha DATE NOT NULL, motivo VARCHAR NOT NULL, creado DATETIME NOT NULL, PRIMARY KEY (fecha))"
+    ))
+
+def _insertar_recurso_general(conexion):
+    conexion.execute(text(
+        "INSERT INTO recursos (id, nombre, tipo, capacidad, activo) VALUES (:id, 'Agenda general', 'consultorio', 1, 1)"
+    ), {"id": models.RECURSO_GENERAL})
+
+def _recursos(conexion):
+    #Cada turno pasa a pertenecer a un recurso (los existentes al recurso general) y ocupa un lugar de su horario
+    conexion.execute(text(
+        "CREATE TABLE IF NOT EXISTS recursos ("
+        "id INTEGER NOT NULL, nombre VARCHAR NOT NULL, tipo VARCHAR NOT NULL, capacidad INTEGER NOT NULL, "
+        "activo BOOLEAN NOT NULL, PRIMARY KEY (id), UNIQUE (nombre))"
+    ))
+    conexion.execute(text("CREATE INDEX IF NOT EXISTS ix_recursos_id ON recursos (id)"))
+    _insertar_recurso_general(conexion)
+    conexion.execute(text(f"ALTER TABLE turnos ADD COLUMN recurso_id INTEGER NOT NULL DEFAULT {models.RECURSO_GENERAL} REFERENCES recursos (id)"))
+    conexion.execute(text("ALTER TABLE turnos ADD COLUMN lugar SMALLINT NOT NULL DEFAULT 1"))
+    #Si ya habia turnos activos repetidos en un mismo horario, cada uno ocupa un lugar distinto
+    cancelado = int(models.EstadoTurno.ESTADO_CANCELADO)
+    conexion.execute(text(
+        "UPDATE turnos SET lugar = numerados.lugar FROM ("
+        "SELECT id, ROW_NUMBER() OVER (PARTITION BY fecha, hora ORDER BY id) AS lugar "
+        f"FROM turnos WHERE estado != {cancelado}) AS numerados "
+        "WHERE turnos.id = numerados.id AND numerados.lugar > 1"
+    ))
+    conexion.execute(text(
+        "CREATE UNIQUE INDEX ux_turnos_recurso_fecha_hora_lugar ON turnos (recurso_id, fecha, hora, lugar) "
+        f"WHERE estado != {cancelado}"
+    ))
+
+
+#Lista ordenada de migraciones: la version de cada una es su posicion (empezando en 1)
+MIGRACIONES = [
+    ("Esquema inicial", _esquema_inicial),
+    ("Indices de turnos por persona y por fecha", _indices_turnos),
+    ("Estado de turno guardado como codigo entero", _estado_turno_entero),
+    ("Hora de turno guardada en minutos desde la medianoche", _hora_en_minutos),
+    ("Tabla de cierres de la agenda por fecha", _tabla_cierres),
+    ("Recursos (profesionales o consultorios) con lugares por horario", _recursos),
+]
+
+VERSION_ACTUAL = len(MIGRACIONES)
+
+
+def _crear_tabla_version(conexion):
+    conexion.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, descripcion VARCHAR NOT NULL, aplicada DATETIME NOT NULL)"
+    ))
+
+def _registrar_version(conexion, version: int, descripcion: str):
+    conexion.execute(
+        text("INSERT INTO schema_version (version, descripcion, aplicada) VALUES (:version, :descripcion, :aplicada)"),
+        {"version": version, "descripcion": descripcion, "aplicada": datetime.now()}
+    )
+
+def version_actual(conexion) -> int:
+    if not inspect(conexion).has_table("schema_version"):
+        return 0
+    return conexion.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def migrar(motor=engine) -> list:
+    """Lleva la base a la última versión del esquema, retorna las versiones aplicadas"""
+    with motor.begin() as conexion:
+        version = version_actual(conexion)
+        if version == 0:
+            _crear_tabla_version(conexion)
+            if not inspect(conexion).has_table("personas"):
+                #Base nueva: los modelos ya tienen el esquema de la ultima version
+                models.Base.metadata.create_all(conexion)
+                _insertar_recurso_general(conexion)
+                _registrar_version(conexion, VERSION_ACTUAL, "Base nueva creada en la ultima version")
+                return [VERSION_ACTUAL]
+
+    aplicadas = []
+    for numero, (descripcion, migracion) in enumerate(MIGRACIONES, start=1):
+        if numero <= version:
+            continue
+        with motor.begin() as conexion:
+            migracion(conexion)
+            _registrar_version(conexion, numero, descripcion)
+        aplicadas.append(numero)
+    return aplicadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crea o actualiza el esquema de la base de DATABASE_URL")
+    parser.add_argument("--datos-prueba", action="store_true", help="Carga los datos de prueba si la base no tiene personas")
+    args = parser.parse_args()
+
+    #Se importan aca: la aplicacion no los necesita para migrar
+    import crud.crudTurno as crudTurno
+    from database.database import SessionLocal
+    from database.seed_data import create_sample_data
+
+    aplicadas = migrar()
+    if args.datos_prueba:
+        create_sample_data()
+    with SessionLocal() as db:
+        crudTurno.asegurar_resumen_cancelaciones(db)
+    with engine.connect() as conexion:
+        print(f"Versión del esquema: {version_actual(conexion)} (aplicadas ahora: {aplicadas or 'ninguna'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -161,7 +161,7 @@ def create_sample_data():
             {"persona_id": 6, "fecha": "2025-10-20", "hora": "15:00:00", "estado": diccionario_estados.get('ESTADO_CANCELADO')},
 
             # ===== DIEGO SANCHEZ (persona_id 7) - Variedad de estados =====
-            {"persona_id": 7, "fecha": "2025-09-20", "hora": "09:30:00", "estado": diccionario_estados.get('ESTADO_ASISTIDO')},
+            {"persona_id": 7, "fecha": "2025-09-20", "hora": "10:00:00", "estado": diccionario_estados.get('ESTADO_ASISTIDO')},
             {"persona_id": 7, "fecha": "2025-10-18", "hora": "14:00:00", "estado": diccionario_estados.get('ESTADO_CONFIRMADO')},
             {"persona_id": 7, "fecha": "2025-11-25", "hora": "10:30:00", "estado": diccionario_estados.get('ESTADO_PENDIENTE')},
             {"persona_id": 7, "fecha": "2025-12-28", "hora": "16:00:00", "estado": diccionario_estados.get('ESTADO_PENDIENTE')},
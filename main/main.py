@@ -1,8 +1,11 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status
-from fastapi.responses import StreamingResponse, Response
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import date, datetime
+from pathlib import Path
+from contextlib import asynccontextmanager
+import secrets
 
 
 # Imports
@@ -11,18 +14,62 @@ import schemas.schemas as schemas
 import schemas.schemasTurno as schemasTurno
 import crud.crud as crud
 import crud.crudTurno as crudTurno
+import crud.crudCambios as crudCambios
+import crud.crudTareas as crudTareas
+import crud.crudCalendario as crudCalendario
+import crud.crudRecursos as crudRecursos
 from database.database import SessionLocal, engine
+from database import migraciones
 from database.seed_data import create_sample_data
 from crud.crudTurno import DatabaseResourceNotFound
 import services.pdf_service as pdf_generator  # PDF generation service
-
-# Crear tablas
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
-
-# Crear datos de prueba al iniciar la aplicación
-create_sample_data()
+import services.trabajos_service as trabajos  # Reportes en segundo plano
+import services.export_service as exportador  # Exportación en Parquet, Arrow o CSV
+import services.compresion_service as compresion  # Compresión de descargas
+import services.cambios_service as cambios_stream  # Stream SSE del log de cambios
+import services.disponibilidad_service as disponibilidad_stream  # Stream SSE de horarios disponibles
+import services.tareas_service as tareas  # Tareas programadas (expiración de turnos y habilitación de personas)
+import services.metricas_service as metricas  # Tiempos y consultas SQL por petición
+import services.consultas_service as consultas  # Detector de consultas N+1 (desarrollo y tests)
+from services.consultas_service import presupuesto_consultas
+import services.perfilador_service as perfilador  # Perfilado de peticiones con cProfile (administración)
+import services.calendario_service as calendario  # Agenda de atención por día de la semana y cierres
+
+# Preparación de la base al iniciar la aplicación (no al importar el módulo).
+# En producción se puede desactivar (MIGRAR_AL_INICIAR, CARGAR_DATOS_PRUEBA) y ejecutar una sola vez
+# "python -m database.migraciones" antes de levantar los workers.
+def preparar_base():
+    if schemasTurno.settings.migrar_al_iniciar:
+        # Crear o actualizar el esquema de la base (database/migraciones.py)
+        migraciones.migrar()
+    if schemasTurno.settings.cargar_datos_prueba:
+        create_sample_data()
+    if schemasTurno.settings.migrar_al_iniciar:
+        # Inicializar el resumen materializado de cancelaciones (bases existentes o recién cargadas)
+        with SessionLocal() as db_inicial:
+            crudTurno.asegurar_resumen_cancelaciones(db_inicial)
+
+# Las tareas programadas corren mientras la aplicación está activa
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    preparar_base()
+    tareas_programadas = tareas.iniciar()
+    yield
+    await tareas.detener(tareas_programadas)
+
+app = FastAPI(lifespan=lifespan)
+
+# Compresión gzip de las respuestas JSON grandes (0 la desactiva), las descargas se comprimen por separado
+if schemasTurno.settings.compresion_json_minimo_bytes > 0:
+    app.add_middleware(compresion.GZipJSONMiddleware, minimum_size=schemasTurno.settings.compresion_json_minimo_bytes)
+
+# Métricas por petición (encabezado Server-Timing y /admin/metricas), sin costo si están desactivadas
+if schemasTurno.settings.metricas_activas:
+    metricas.instrumentar(app, engine)
+
+# Presupuesto de consultas SQL por petición (desarrollo y tests), ver @presupuesto_consultas en cada ruta
+if schemasTurno.settings.consultas_modo:
+    consultas.instrumentar(app, engine)
 
 # Dependencia para obtener la sesión de base de datos
 def get_db():
@@ -31,6 +78,35 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependencia para elegir la compresión de las descargas de reportes
+def get_codificacion(
+    request: Request,
+    compress: Optional[str] = Query(None, description="Compresión de la descarga: gzip, zstd o none. Si no se indica se usa Accept-Encoding")
+):
+    try:
+        return compresion.elegir_codificacion(request.headers.get("accept-encoding"), compress)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+# Dependencia de los endpoints de administración: exige el token configurado en ADMIN_TOKEN
+def verificar_admin(x_admin_token: Optional[str] = Header(None)):
+    token = schemasTurno.settings.admin_token
+    if not token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Los endpoints de administración están desactivados (configure ADMIN_TOKEN)")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de administración inválido")
+
+# Respuesta de descarga de un reporte, comprimida a medida que se envía si corresponde
+def respuesta_descarga(contenido, media_type: str, nombre_archivo: str, codificacion: Optional[str]):
+    headers = {"Content-Disposition": f"attachment; filename={nombre_archivo}", "Vary": "Accept-Encoding"}
+    if codificacion:
+        headers["Content-Encoding"] = codificacion
+    return StreamingResponse(
+        compresion.comprimir(compresion.fragmentos(contenido), codificacion),
+        media_type=media_type,
+        headers=headers
+    )
         
 # ============ ENDPOINTS DE PERSONAS ============
 @app.post("/personas", response_model=schemas.PersonaOut)
@@ -47,6 +123,7 @@ def create_persona(persona: schemas.PersonaCreate, db: Session = Depends(get_db)
             raise HTTPException(status_code=500, detail=f"Error interno del servidor: {error_message}")
 
 @app.get("/personas", response_model=list[schemas.PersonaOut])
+@presupuesto_consultas(1)
 def read_personas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     try:
         if skip < 0 or limit < 0:
@@ -58,6 +135,7 @@ def read_personas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 @app.get("/personas/search", response_model=schemas.PaginatedPersonaResponse)
+@presupuesto_consultas(2)
 def search_personas(
     nombre: Optional[str] = Query(None, description="Buscar por nombre (búsqueda parcial)"),
     email: Optional[str] = Query(None, description="Buscar por email (búsqueda parcial)"),
@@ -92,6 +170,7 @@ def search_personas(
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 @app.get("/personas/{persona_id}", response_model=schemas.PersonaOut)
+@presupuesto_consultas(1)
 def read_persona(persona_id: int, db: Session = Depends(get_db)):
     try:
         if persona_id <= 0:
@@ -141,6 +220,7 @@ def delete_persona(persona_id: int, db: Session = Depends(get_db)):
 
 # ============ ENDPOINTS DE TURNOS ============
 @app.get("/turnos", response_model=list[schemasTurno.PersonaConTurnosLista])
+@presupuesto_consultas(1)
 def get_turnos(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
     try:
         turnos_db = crudTurno.get_turnos(db, skip, limit)
@@ -156,6 +236,7 @@ def get_turnos(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
         )
 
 @app.post("/turnos", response_model=schemasTurno.TurnoOut, status_code=status.HTTP_201_CREATED)
+@presupuesto_consultas(10)
 def crear_turno(turno: schemasTurno.TurnoCreate, db: Session = Depends(get_db)):
     try:
         return crudTurno.create_turnos(db, turno)
@@ -190,22 +271,72 @@ def delete_turno(turno_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error inesperado: {str(e)}")
 
+@app.get("/turnos/turnos-disponibles/stream")
+@presupuesto_consultas(None)
+def stream_turnos_disponibles(fecha: date, request: Request, recurso_id: int = Query(models.RECURSO_GENERAL, description="Recurso (por defecto el general)"), db: Session = Depends(get_db)):
+    """
+    Envía por Server-Sent Events los horarios disponibles de la fecha y luego las diferencias
+    (horarios liberados y ocupados) cada vez que una reserva, cancelación o reprogramación la modifica.
+    """
+    dia_agenda = calendario.dia(db, fecha)
+    if dia_agenda.grilla is None:
+        raise HTTPException(status_code=404, detail=f"{dia_agenda.motivo}, por favor ingresar otra fecha")
+    if fecha < date.today():
+        raise HTTPException(status_code=400, detail="La fecha no puede ser anterior al día de hoy")
+    try:
+        crudTurno.get_recurso_activo(db, recurso_id)
+    except DatabaseResourceNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return StreamingResponse(
+        disponibilidad_stream.stream_disponibilidad(request, fecha, recurso_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/turnos/turnos-disponibles", response_model=schemasTurno.HorariosResponse)
-def get_turnos_disponibles(fecha: date, db: Session = Depends(get_db)):
+@presupuesto_consultas(3)
+def get_turnos_disponibles(fecha: date, recurso_id: int = Query(models.RECURSO_GENERAL, description="Recurso (por defecto el general)"), db: Session = Depends(get_db)):
 
-    if fecha.weekday() == 6: 
-            raise HTTPException(status_code=404, detail="No se atiende los días domingos, por favor ingresar una fecha de lunes a sábado")
+    dia_agenda = calendario.dia(db, fecha)
+    if dia_agenda.grilla is None: 
+            raise HTTPException(status_code=404, detail=f"{dia_agenda.motivo}, por favor ingresar otra fecha")
     try: 
-        lista_disponibles = crudTurno.get_turnos_disponibles(fecha, db)
+        lista_disponibles = crudTurno.get_turnos_disponibles(fecha, db, recurso_id)
         if not lista_disponibles:
             raise HTTPException(status_code=404, detail=f"No hay horarios disponibles para la fecha {fecha}")
         
         return schemasTurno.HorariosResponse(fecha=fecha, horarios_disponibles=lista_disponibles)
+    except HTTPException:
+        raise
+    except DatabaseResourceNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener los turnos disponibles: {e}")
 
 
+@app.get("/turnos/disponibilidad", response_model=list[schemasTurno.HorariosResponse])
+@presupuesto_consultas(3)
+def get_disponibilidad_rango(
+    fecha_desde: date = Query(..., description="Primera fecha (YYYY-MM-DD)"),
+    fecha_hasta: date = Query(..., description="Última fecha (YYYY-MM-DD)"),
+    recurso_id: int = Query(models.RECURSO_GENERAL, description="Recurso (por defecto el general)"),
+    db: Session = Depends(get_db)
+):
+    """Horarios disponibles de cada fecha con atención del rango (se omiten los días sin atención y los cierres)"""
+    try:
+        return crudTurno.get_disponibilidad_rango(db, fecha_desde, fecha_hasta, recurso_id)
+    except DatabaseResourceNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @app.get("/turnos/{turno_id}", response_model=schemasTurno.TurnoOut)
+@presupuesto_consultas(1)
 def get_turno_id(turno_id: int, db: Session = Depends(get_db)):
     try:
         turno = crudTurno.get_turno(db, turno_id)
@@ -230,6 +361,8 @@ def put_turno_id(turno_id: int, turno_update: schemasTurno.TurnoUpdate, db: Sess
         raise
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except DatabaseResourceNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except TypeError as e:
@@ -273,9 +406,36 @@ def confirmar_turno(turno_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error inesperado: {str(e)}")
 
+# ============ ENDPOINTS DE RECURSOS (PROFESIONALES Y CONSULTORIOS) ============
+
+@app.get("/recursos", response_model=list[schemasTurno.RecursoOut])
+@presupuesto_consultas(1)
+def get_recursos(solo_activos: bool = Query(False), db: Session = Depends(get_db)):
+    """Profesionales y consultorios con agenda propia"""
+    return crudRecursos.get_recursos(db, solo_activos)
+
+
+@app.get("/recursos/disponibilidad", response_model=list[schemasTurno.DisponibilidadRecurso])
+@presupuesto_consultas(2)
+def get_disponibilidad_recursos(
+    fecha_desde: date = Query(..., description="Primera fecha (YYYY-MM-DD)"),
+    fecha_hasta: date = Query(..., description="Última fecha (YYYY-MM-DD)"),
+    recurso_id: Optional[int] = Query(None, description="Un solo recurso (vacío: todos los activos)"),
+    db: Session = Depends(get_db)
+):
+    """Horarios con lugares libres de cada recurso activo en cada fecha con atención del rango"""
+    try:
+        return crudRecursos.get_disponibilidad_recursos(db, fecha_desde, fecha_hasta, recurso_id)
+    except DatabaseResourceNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 # ============ ENDPOINTS DE REPORTES ============
 
 @app.get("/reportes/turnos-por-persona", response_model=schemasTurno.PersonaConTurnos)
+@presupuesto_consultas(2)
 def get_turnos_por_persona(dni: str = Query(
         description="DNI de la persona(8 digitos)",
         min_length=8,
@@ -305,6 +465,7 @@ def get_turnos_por_persona(dni: str = Query(
     
 
 @app.get("/reportes/turnos-cancelados", response_model=list[schemasTurno.PersonaConTurnosCancelados])
+@presupuesto_consultas(2)
 def get_reporte_turnos_cancelados(
     #Parametro de entrada, por defecto esta en 5
     min: int = Query(5, description="Número mínimo de turnos cancelados para incluir a una persona", ge=5), #ge: greater than or equal to, mayor o igual que 5
@@ -324,6 +485,7 @@ def get_reporte_turnos_cancelados(
 
 
 @app.get("/reportes/turnos-por-fecha", status_code=status.HTTP_200_OK)
+@presupuesto_consultas(1)
 def get_turnos_por_fecha(
     fecha: str = Query(...,
         description="Fecha del día en formato YYYY-MM-DD",
@@ -352,6 +514,7 @@ def get_turnos_por_fecha(
         )
 
 @app.get("/reportes/turnos-cancelados-por-mes", status_code=status.HTTP_200_OK)
+@presupuesto_consultas(1)
 def get_turnos_cancelados_mes_actual(db: Session = Depends(get_db)):
     try:
         turnos = crudTurno.get_turnos_cancelados_mes_actual(db)
@@ -364,6 +527,7 @@ def get_turnos_cancelados_mes_actual(db: Session = Depends(get_db)):
             detail=f"Error al generar el reporte: {str(e)}"
         )
 @app.get("/reportes/turnos-confirmados", response_model=schemasTurno.RespuestaTurnosPaginados)
+@presupuesto_consultas(2)
 def get_reporte_turnos_confirmados_por_fecha(fecha_desde: date, fecha_hasta: date,
                                               pag:int = Query(1, ge=1, description="Número de página"),
                                               por_pag:int = Query(5, ge=1, le=100, description="Registros por página"),
@@ -378,6 +542,7 @@ def get_reporte_turnos_confirmados_por_fecha(fecha_desde: date, fecha_hasta: dat
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al generar el reporte: {excepcion}")
 
 @app.get("/reportes/estado-personas/{estado}", response_model=list[schemas.PersonaOut])
+@presupuesto_consultas(1)
 def get_reporte_personas_por_estado(estado: bool, db: Session = Depends(get_db)):
     try:
         reporte_estado_personas = crud.get_personas_habilitadas_o_deshabilitadas(estado, db)
@@ -389,6 +554,7 @@ def get_reporte_personas_por_estado(estado: bool, db: Session = Depends(get_db))
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error inesperado: {excepcion}")
     
 @app.get("/reportes/turnos-cancelados-por-mes-reformado", status_code=status.HTTP_200_OK)
+@presupuesto_consultas(1)
 def get_turnos_cancelados_mes_actual_reformado(db: Session = Depends(get_db)):
     try:
         turnos = crudTurno.get_turnos_cancelados_mes_actual_reformado(db)
@@ -404,8 +570,10 @@ def get_turnos_cancelados_mes_actual_reformado(db: Session = Depends(get_db)):
 # ============ ENDPOINTS DE REPORTES GENERANDO CSV ============
 
 @app.get("/reportes/csv/turnos-por-fecha")
+@presupuesto_consultas(1)
 def descargar_csv_turnos_fecha(
     fecha: str = Query(..., description="Formato YYYY-MM-DD"),
+    codificacion: Optional[str] = Depends(get_codificacion),
     db: Session = Depends(get_db)
 ):
     try:
@@ -418,11 +586,9 @@ def descargar_csv_turnos_fecha(
 
 
         # StreamingResponse agarra el archivo en memoria para que pueda ser descargado
-        return StreamingResponse(
-            csv_buffer, #Que tiene que descargar
-            media_type="text/csv", #Tipo de archivo que es
-            headers={"Content-Disposition": f"attachment; filename=turnos_{fecha}.csv"} #Permitimos que se descargue el archivo y le indicamos el nombre
-        )
+        return respuesta_descarga(csv_buffer, "text/csv", f"turnos_{fecha}.csv", codificacion)
+    except HTTPException:
+        raise
     except ValueError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Formato de fecha inválido")
     except Exception as e:
@@ -432,7 +598,8 @@ def descargar_csv_turnos_fecha(
 
 
 @app.get("/reportes/csv/cancelados-por-mes")
-def descargar_csv_cancelados_mes(db: Session = Depends(get_db)):
+@presupuesto_consultas(1)
+def descargar_csv_cancelados_mes(codificacion: Optional[str] = Depends(get_codificacion), db: Session = Depends(get_db)):
     try:
         csv_buffer = crudTurno.generar_csv_turnos_cancelados_mes(db) #Generamos el archivo
        
@@ -440,12 +607,7 @@ def descargar_csv_cancelados_mes(db: Session = Depends(get_db)):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No hay turnos cancelados este mes")
 
 
-        return StreamingResponse(
-            csv_buffer, #Que tiene que descargar
-            media_type="text/csv", #Tipo de archivo que es
-            #Permitimos que se descargue el archivo y le indicamos el nombre
-            headers={"Content-Disposition": "attachment; filename=cancelados_mes_actual.csv"}
-        )
+        return respuesta_descarga(csv_buffer, "text/csv", "cancelados_mes_actual.csv", codificacion)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -453,8 +615,10 @@ def descargar_csv_cancelados_mes(db: Session = Depends(get_db)):
 
 
 @app.get("/reportes/csv/turnos-por-persona")
+@presupuesto_consultas(2)
 def descargar_csv_turnos_persona(
     dni: str = Query(..., min_length=8, max_length=8, regex=r"^\d{8}$"), #especificamos como tiene que ser el dni en longitud y que tiene que ser decimal
+    codificacion: Optional[str] = Depends(get_codificacion),
     db: Session = Depends(get_db)
 ):
     try:
@@ -464,30 +628,21 @@ def descargar_csv_turnos_persona(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No se encontraron turnos para este DNI")
 
 
-        return StreamingResponse(
-            csv_buffer,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=historial_turnos_{dni}.csv"}
-        )
+        return respuesta_descarga(csv_buffer, "text/csv", f"historial_turnos_{dni}.csv", codificacion)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 @app.get("/reportes/csv/turnos-cancelados")
-def generar_csv_turnos_cancelados(min: int = 5, db: Session = Depends(get_db)):
+@presupuesto_consultas(2)
+def generar_csv_turnos_cancelados(min: int = 5, codificacion: Optional[str] = Depends(get_codificacion), db: Session = Depends(get_db)):
     try:
         csv_buffer = crudTurno.generar_csv_turnos_cancelados(db, min)#Obtengo el archivo en memoria para enviarlo y poder descargarlo
         if csv_buffer is None:
             raise HTTPException(status_code=204)
 
         #Respuesta como archivo CSV, este tipo de respuesta permite enviar archivos guardados en memoria para que sean descargados
-        return StreamingResponse(
-            csv_buffer,#indica el archivo a descaragar
-            media_type="text/csv",#indica al navegador que tipo de archivo va a recibir
-            headers={
-                "Content-Disposition": "attachment; filename=turnos_cancelados.csv"
-            }#Le indica que se tiene que descargar y no mostrar, y a la vez con que nombre
-        )
+        return respuesta_descarga(csv_buffer, "text/csv", "turnos_cancelados.csv", codificacion)
 
     except HTTPException:
         raise
@@ -498,11 +653,13 @@ def generar_csv_turnos_cancelados(min: int = 5, db: Session = Depends(get_db)):
         )
 
 @app.get("/reportes/csv/turnos-confirmados")
+@presupuesto_consultas(2)
 def generar_csv_turnos_confirmados(
     fecha_desde: str = Query(..., description="Fecha inicio YYYY-MM-DD"),
     fecha_hasta: str = Query(..., description="Fecha fin YYYY-MM-DD"),
     pag:int = Query(1, ge=1, description="Número de página"),
     por_pag:int = Query(5, ge=1, le=100, description="Registros por página"),
+    codificacion: Optional[str] = Depends(get_codificacion),
     db: Session = Depends(get_db)
 ):
     try:
@@ -521,13 +678,7 @@ def generar_csv_turnos_confirmados(
             raise HTTPException(status_code=204)
 
         #Respuesta como archivo CSV, este tipo de respuesta permite enviar archivos guardados en memoria para que sean descargados
-        return StreamingResponse(
-            csv_buffer,#indica el archivo a descaragar
-            media_type="text/csv",#indica al navegador que tipo de archivo va a recibir
-            headers={
-                "Content-Disposition": "attachment; filename=turnos_confirmados.csv"
-            }#Le indica que se tiene que descargar y no mostrar, y a la vez con que nombre
-        )
+        return respuesta_descarga(csv_buffer, "text/csv", "turnos_confirmados.csv", codificacion)
 
     except HTTPException:
         raise
@@ -538,8 +689,10 @@ def generar_csv_turnos_confirmados(
         )
 
 @app.get("/reportes/csv/estado-personas")
+@presupuesto_consultas(1)
 def generar_csv_estado_personas(
     estado: bool = Query(...,description="Indica si listar personas habilitadas (true) o no habilitadas (false)"),
+    codificacion: Optional[str] = Depends(get_codificacion),
     db: Session = Depends(get_db)
 ):
     try:
@@ -550,13 +703,7 @@ def generar_csv_estado_personas(
             raise HTTPException(status_code=204)
 
         #Respuesta como archivo CSV, este tipo de respuesta permite enviar archivos guardados en memoria para que sean descargados
-        return StreamingResponse(
-            csv_buffer,#indica el archivo a descaragar
-            media_type="text/csv",#indica al navegador que tipo de archivo va a recibir
-            headers={
-                "Content-Disposition": "attachment; filename=estado_personas.csv"
-            }#Le indica al navegador que se tiene que descargar y no mostrar, y a la vez con que nombre.
-        )
+        return respuesta_descarga(csv_buffer, "text/csv", "estado_personas.csv", codificacion)
 
     except HTTPException:
         raise
@@ -567,19 +714,14 @@ def generar_csv_estado_personas(
         )
 
 @app.get("/reportes/csv/turnos-cancelados-por-mes-reformado", response_class=StreamingResponse)
-def generar_csv_turnos_cancelados_reformado(db: Session = Depends(get_db)):
+@presupuesto_consultas(1)
+def generar_csv_turnos_cancelados_reformado(codificacion: Optional[str] = Depends(get_codificacion), db: Session = Depends(get_db)):
     try:
         csv_buffer = crudTurno.generar_csv_turnos_cancelados_reformado(db)
         if csv_buffer is None:
             raise HTTPException(status_code=status.HTTP_204_NO_CONTENT,
                                 detail="No hay turnos cancelados este mes para generar el CSV.")
-        return StreamingResponse(
-            csv_buffer,
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": "attachment; filename=reporte_cancelados_mes.csv"
-            }
-        )
+        return respuesta_descarga(csv_buffer, "text/csv", "reporte_cancelados_mes.csv", codificacion)
     except HTTPException:
         raise
     except Exception as e:
@@ -592,11 +734,13 @@ def generar_csv_turnos_cancelados_reformado(db: Session = Depends(get_db)):
 # ========== ENDPOINTS DE REPORTES EN PDF ==========
 
 @app.get("/reportes/pdf/turnos-por-fecha")
+@presupuesto_consultas(1)
 def get_pdf_turnos_por_fecha(
     fecha: str = Query(...,
         description="Fecha del día en formato YYYY-MM-DD",
         example="2025-10-05"
-    ), db: Session = Depends(get_db)):
+    ), codificacion: Optional[str] = Depends(get_codificacion),
+    db: Session = Depends(get_db)):
     """
     Genera un PDF con el reporte de turnos para una fecha específica.
     """
@@ -618,11 +762,7 @@ def get_pdf_turnos_por_fecha(
         pdf_bytes = pdf_generator.generar_pdf_turnos_por_fecha(fecha, cantidad_total_turnos, turnos)
 
         # Retornar PDF
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=turnos_fecha_{fecha}.pdf"}
-        )
+        return respuesta_descarga(pdf_bytes, "application/pdf", f"turnos_fecha_{fecha}.pdf", codificacion)
 
     except ValueError:
         raise HTTPException(
@@ -639,9 +779,11 @@ def get_pdf_turnos_por_fecha(
 
 
 @app.get("/reportes/pdf/turnos-cancelados-por-mes")
+@presupuesto_consultas(1)
 def get_pdf_turnos_cancelados_mes(
     mes: int = Query(None, description="Mes (1-12). Si no se proporciona, usa el mes actual"),
     anio: int = Query(None, description="Año (YYYY). Si no se proporciona, usa el año actual"),
+    codificacion: Optional[str] = Depends(get_codificacion),
     db: Session = Depends(get_db)
 ):
     """
@@ -650,8 +792,8 @@ def get_pdf_turnos_cancelados_mes(
     Si no hay turnos cancelados, genera un PDF con un mensaje informativo.
     """
     try:
-        # Obtener datos del reporte
-        reporte_data = crudTurno.get_turnos_cancelados_por_mes(db, mes, anio)
+        # Obtener datos del reporte (el PDF solo usa los totales por persona del resumen precalculado)
+        reporte_data = crudTurno.get_turnos_cancelados_por_mes(db, mes, anio, incluir_detalle=False)
 
         # Generar PDF (incluso si no hay datos)
         pdf_bytes = pdf_generator.generar_pdf_turnos_cancelados_mes(reporte_data)
@@ -662,11 +804,7 @@ def get_pdf_turnos_cancelados_mes(
         filename = f"turnos_cancelados_{anio_num}_{mes_num:02d}.pdf"
 
         # Retornar PDF
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return respuesta_descarga(pdf_bytes, "application/pdf", filename, codificacion)
 
     except HTTPException:
         raise
@@ -683,6 +821,7 @@ def get_pdf_turnos_cancelados_mes(
 
 
 @app.get("/reportes/pdf/turnos-por-persona")
+@presupuesto_consultas(2)
 def get_pdf_turnos_por_persona(
     dni: str = Query(
         description="DNI de la persona (8 dígitos)",
@@ -690,6 +829,7 @@ def get_pdf_turnos_por_persona(
         max_length=8,
         regex=r"\d{8}"
     ),
+    codificacion: Optional[str] = Depends(get_codificacion),
     db: Session = Depends(get_db)):
     """
     Genera un PDF con el reporte de turnos de una persona específica.
@@ -715,11 +855,7 @@ def get_pdf_turnos_por_persona(
         pdf_bytes = pdf_generator.generar_pdf_turnos_por_persona(resultado)
 
         # Retornar PDF
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=turnos_persona_{dni}.pdf"}
-        )
+        return respuesta_descarga(pdf_bytes, "application/pdf", f"turnos_persona_{dni}.pdf", codificacion)
 
     except HTTPException:
         raise
@@ -731,9 +867,11 @@ def get_pdf_turnos_por_persona(
             detail=f"Error al generar el PDF: {str(e)}"
         )
 @app.get("/reportes/pdf/turnos-cancelados")
+@presupuesto_consultas(2)
 def get_pdf_personas_min_5_cancelados(
     #Parametro de entrada, por defecto esta en 5
     min: int = Query(5, description="Número mínimo de turnos cancelados para incluir a una persona", ge=1), #ge: greater than or equal to, mayor o igual que 5
+    codificacion: Optional[str] = Depends(get_codificacion),
     db:Session = Depends(get_db)
 ):
     """
@@ -749,11 +887,7 @@ def get_pdf_personas_min_5_cancelados(
         pdf_reporte = pdf_generator.generar_pdf_personas_con_min_cancelados(datos_reporte, min)
 
         #Retornar el pdf
-        return Response(
-            content=pdf_reporte,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=personas_con_{min}_turnos_cancelados.pdf"}
-        )
+        return respuesta_descarga(pdf_reporte, "application/pdf", f"personas_con_{min}_turnos_cancelados.pdf", codificacion)
         
     
     except HTTPException:
@@ -764,11 +898,13 @@ def get_pdf_personas_min_5_cancelados(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error inesperado al generar el PDF: {str(error)}")
     
 @app.get("/reportes/pdf/turnos-confirmados")
+@presupuesto_consultas(2)
 def get_pdf_turnos_confirmado_entre_fechas(
     fecha_desde: str = Query(..., description="Fecha inicio YYYY-MM-DD"),
     fecha_hasta: str = Query(..., description="Fecha fin YYYY-MM-DD"),
     pag:int = Query(1, ge=1, description="Número de página"),
     por_pag:int = Query(100, ge=1, le=100, description="Registros por página"),
+    codificacion: Optional[str] = Depends(get_codificacion),
     db: Session = Depends(get_db)
 ):
     """
@@ -793,11 +929,7 @@ def get_pdf_turnos_confirmado_entre_fechas(
         pdf_reporte = pdf_generator.generar_pdf_turnos_confirmados_desde_hasta(datos_reporte, fecha_desde, fecha_hasta, pag, por_pag)
 
         #Retornar el pdf
-        return Response(
-            content=pdf_reporte,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=turnos_confirmado_entre_fechas.pdf"}
-        )
+        return respuesta_descarga(pdf_reporte, "application/pdf", "turnos_confirmado_entre_fechas.pdf", codificacion)
 
 
     except HTTPException:
@@ -805,8 +937,10 @@ def get_pdf_turnos_confirmado_entre_fechas(
     except Exception as error:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error inesperado al generar el PDF: {str(error)}")
 @app.get("/reportes/pdf/estado-personas")
+@presupuesto_consultas(1)
 def get_pdf_personas_por_estado(
     estado: bool = Query(...,description="Indica si listar personas habilitadas (true) o no habilitadas (false)"),
+    codificacion: Optional[str] = Depends(get_codificacion),
     db: Session = Depends(get_db)
 ):
     """
@@ -822,13 +956,303 @@ def get_pdf_personas_por_estado(
         pdf_reporte = pdf_generator.generar_pdf_personas_estado(datos_reporte, estado)
 
         #Retornar PDF
-        return Response(
-            content=pdf_reporte,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=personas_con_estado_{estado}.pdf"}
-        )
+        return respuesta_descarga(pdf_reporte, "application/pdf", f"personas_con_estado_{estado}.pdf", codificacion)
 
     except HTTPException:
         raise
     except Exception as error:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error inesperado al generar el PDF: {str(error)}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error inesperado al generar el PDF: {str(error)}")
+
+
+# ========== ENDPOINTS DE EXPORTACION (PARQUET, ARROW O CSV) ==========
+#Las columnas se exportan tipadas (fechas, horas, enteros, booleanos) y sin paginación
+
+FORMATO_EXPORT = Query("parquet", pattern="^(parquet|arrow|csv)$", description="Formato del archivo: parquet, arrow o csv")
+
+def respuesta_export(db: Session, consulta, formato: str, nombre: str, codificacion: Optional[str]):
+    try:
+        contenido = exportador.exportar(db, consulta, formato)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    except Exception as error:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al exportar el reporte: {str(error)}")
+    return respuesta_descarga(contenido, exportador.tipo_contenido(formato), exportador.nombre_archivo(nombre, formato), codificacion)
+
+@app.get("/reportes/export/turnos-por-fecha")
+@presupuesto_consultas(1)
+def exportar_turnos_por_fecha(fecha: date, formato: str = FORMATO_EXPORT, codificacion: Optional[str] = Depends(get_codificacion), db: Session = Depends(get_db)):
+    return respuesta_export(db, crudTurno.consulta_export_turnos_por_fecha(fecha), formato, f"turnos_{fecha}", codificacion)
+
+@app.get("/reportes/export/turnos-cancelados-por-mes")
+@presupuesto_consultas(1)
+def exportar_turnos_cancelados_mes(
+    mes: int = Query(None, description="Mes (1-12). Si no se proporciona, usa el mes actual"),
+    anio: int = Query(None, description="Año (YYYY). Si no se proporciona, usa el año actual"),
+    formato: str = FORMATO_EXPORT,
+    codificacion: Optional[str] = Depends(get_codificacion),
+    db: Session = Depends(get_db)
+):
+    try:
+        consulta = crudTurno.consulta_export_cancelados_por_mes(mes, anio)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    return respuesta_export(db, consulta, formato, "turnos_cancelados_mes", codificacion)
+
+@app.get("/reportes/export/turnos-por-persona")
+@presupuesto_consultas(1)
+def exportar_turnos_por_persona(
+    dni: str = Query(..., min_length=8, max_length=8, pattern=r"^\d{8}$"),
+    formato: str = FORMATO_EXPORT,
+    codificacion: Optional[str] = Depends(get_codificacion),
+    db: Session = Depends(get_db)
+):
+    return respuesta_export(db, crudTurno.consulta_export_turnos_por_persona(dni), formato, f"historial_turnos_{dni}", codificacion)
+
+@app.get("/reportes/export/turnos-cancelados")
+@presupuesto_consultas(1)
+def exportar_turnos_cancelados(
+    min: int = Query(5, ge=1, description="Número mínimo de turnos cancelados para incluir a una persona"),
+    formato: str = FORMATO_EXPORT,
+    codificacion: Optional[str] = Depends(get_codificacion),
+    db: Session = Depends(get_db)
+):
+    return respuesta_export(db, crudTurno.consulta_export_turnos_cancelados(min), formato, "turnos_cancelados", codificacion)
+
+@app.get("/reportes/export/turnos-confirmados")
+@presupuesto_consultas(1)
+def exportar_turnos_confirmados(fecha_desde: date, fecha_hasta: date, formato: str = FORMATO_EXPORT, codificacion: Optional[str] = Depends(get_codificacion), db: Session = Depends(get_db)):
+    try:
+        consulta = crudTurno.consulta_export_turnos_confirmados(fecha_desde, fecha_hasta)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    return respuesta_export(db, consulta, formato, "turnos_confirmados", codificacion)
+
+@app.get("/reportes/export/estado-personas")
+@presupuesto_consultas(1)
+def exportar_estado_personas(
+    estado: bool = Query(..., description="Indica si listar personas habilitadas (true) o no habilitadas (false)"),
+    formato: str = FORMATO_EXPORT,
+    codificacion: Optional[str] = Depends(get_codificacion),
+    db: Session = Depends(get_db)
+):
+    return respuesta_export(db, crud.consulta_export_estado_personas(estado), formato, "estado_personas", codificacion)
+
+
+# ========== ENDPOINTS DE REPORTES EN SEGUNDO PLANO ==========
+
+@app.post("/reportes/jobs", response_model=schemasTurno.TrabajoReporteOut, status_code=status.HTTP_202_ACCEPTED)
+def crear_trabajo_reporte(solicitud: schemasTurno.TrabajoReporteCreate):
+    """
+    Encola la generación de un reporte CSV o PDF y devuelve el id del trabajo para consultar su estado.
+    """
+    try:
+        return trabajos.crear_trabajo(solicitud.tipo, solicitud.parametros)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    except Exception as error:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al encolar el reporte: {str(error)}")
+
+@app.get("/reportes/jobs/{trabajo_id}", response_model=schemasTurno.TrabajoReporteOut)
+def get_trabajo_reporte(trabajo_id: str):
+    """
+    Devuelve el estado y el progreso de un reporte en segundo plano.
+    """
+    try:
+        return trabajos.obtener_trabajo(trabajo_id)
+    except trabajos.TrabajoNoEncontrado as error:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(error))
+
+@app.get("/reportes/jobs/{trabajo_id}/download")
+def descargar_trabajo_reporte(trabajo_id: str, codificacion: Optional[str] = Depends(get_codificacion)):
+    """
+    Descarga el archivo generado por un reporte en segundo plano ya completado.
+    """
+    try:
+        ruta, nombre_archivo, media_type = trabajos.obtener_archivo(trabajo_id)
+        return respuesta_descarga(Path(ruta), media_type, nombre_archivo, codificacion)
+    except trabajos.TrabajoNoEncontrado as error:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(error))
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error))
+
+
+# ========== ENDPOINTS DEL LOG DE CAMBIOS ==========
+
+@app.get("/cambios", response_model=schemasTurno.RespuestaCambios)
+def get_cambios(
+    desde: int = Query(0, ge=0, description="Número de secuencia del último cambio ya procesado"),
+    limite: int = Query(None, ge=1, description="Cantidad máxima de cambios a devolver (hasta CAMBIOS_LOTE_MAXIMO)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Devuelve en orden los cambios de turnos y personas posteriores a 'desde'.
+    Para sincronizar se vuelve a consultar con desde=ultimo_seq mientras hay_mas sea verdadero.
+    """
+    try:
+        return crudCambios.get_cambios(db, desde, limite)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error al consultar los cambios: {str(e)}")
+
+@app.get("/cambios/stream")
+@presupuesto_consultas(None)
+def stream_cambios(
+    request: Request,
+    desde: Optional[int] = Query(None, ge=0, description="Número de secuencia desde el que enviar cambios (por defecto, solo los nuevos)"),
+    last_event_id: Optional[int] = Header(None, description="Último id recibido, lo envía el navegador al reconectarse")
+):
+    """
+    Envía los cambios como Server-Sent Events a medida que se registran.
+    """
+    if last_event_id is not None:
+        desde = last_event_id
+    elif desde is None:
+        with SessionLocal() as db:
+            desde = crudCambios.get_ultimo_seq(db)
+    return StreamingResponse(
+        cambios_stream.stream_cambios(request, desde),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ========== ENDPOINTS DE ADMINISTRACION ==========
+
+@app.get("/admin/export", dependencies=[Depends(verificar_admin)])
+def exportar_base_completa(
+    formato: str = Query("ndjson", description="Formato del archivo: ndjson (todas las tablas) o csv (una tabla)"),
+    tablas: str = Query("personas,recursos,turnos,cierres", description="Tablas a exportar separadas por coma: personas, recursos, turnos, cierres"),
+    codificacion: Optional[str] = Depends(get_codificacion)
+):
+    """
+    Exporta todas las personas, recursos, turnos y cierres de agenda desde una única transacción de lectura (una foto consistente de la base),
+    enviando el archivo por lotes a medida que se lee.
+    """
+    lista_tablas = [tabla.strip() for tabla in tablas.split(",") if tabla.strip()]
+    try:
+        exportador.validar_historial(formato, lista_tablas)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+    nombre_archivo = f"exportacion_{'_'.join(lista_tablas)}_{datetime.now():%Y%m%d_%H%M%S}.{formato}"
+    return respuesta_descarga(
+        exportador.exportar_historial(formato, lista_tablas),
+        exportador.FORMATOS_HISTORIAL[formato],
+        nombre_archivo,
+        codificacion
+    )
+
+
+@app.get("/admin/tareas", response_model=list[schemasTurno.EjecucionOut], dependencies=[Depends(verificar_admin)])
+def get_ejecuciones_tareas(
+    tarea: Optional[str] = Query(None, description="Nombre de la tarea, por ejemplo expirar_turnos"),
+    limite: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Últimas ejecuciones de las tareas programadas con su duración y cantidad de filas afectadas"""
+    return crudTareas.get_ejecuciones(db, tarea, limite)
+
+
+@app.post("/admin/recursos", response_model=schemasTurno.RecursoOut, status_code=status.HTTP_201_CREATED, dependencies=[Depends(verificar_admin)])
+def create_recurso(recurso: schemasTurno.RecursoCreate, db: Session = Depends(get_db)):
+    """Agrega un profesional o consultorio con su capacidad por horario"""
+    try:
+        return crudRecursos.create_recurso(db, recurso)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@app.put("/admin/recursos/{recurso_id}", response_model=schemasTurno.RecursoOut, dependencies=[Depends(verificar_admin)])
+def update_recurso(recurso_id: int, datos: schemasTurno.RecursoUpdate, db: Session = Depends(get_db)):
+    """Modifica nombre, capacidad o estado activo de un recurso (los inactivos no reciben reservas)"""
+    try:
+        recurso = crudRecursos.update_recurso(db, recurso_id, datos)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if recurso is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recurso no encontrado")
+    return recurso
+
+
+@app.get("/admin/cierres", response_model=list[schemasTurno.CierreOut], dependencies=[Depends(verificar_admin)])
+def get_cierres(
+    fecha_desde: Optional[date] = Query(None, description="Primera fecha (YYYY-MM-DD)"),
+    fecha_hasta: Optional[date] = Query(None, description="Última fecha (YYYY-MM-DD)"),
+    db: Session = Depends(get_db)
+):
+    """Fechas en las que la agenda está cerrada (feriados), ordenadas por fecha"""
+    return crudCalendario.get_cierres(db, fecha_desde, fecha_hasta)
+
+
+@app.post("/admin/cierres", response_model=schemasTurno.CierreCreadoOut, status_code=status.HTTP_201_CREATED, dependencies=[Depends(verificar_admin)])
+def create_cierre(cierre: schemasTurno.CierreCreate, db: Session = Depends(get_db)):
+    """Cierra la agenda en una fecha: no se pueden reservar ni mover turnos a ese día. Informa los turnos activos que ya tenía"""
+    try:
+        return crudCalendario.create_cierre(db, cierre)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@app.delete("/admin/cierres/{fecha}", response_model=schemasTurno.CierreOut, dependencies=[Depends(verificar_admin)])
+def delete_cierre(fecha: date, db: Session = Depends(get_db)):
+    """Vuelve a abrir la agenda en la fecha"""
+    cierre = crudCalendario.delete_cierre(db, fecha)
+    if cierre is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"La fecha {fecha} no está cerrada")
+    return cierre
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics_prometheus():
+    """Métricas en formato Prometheus: peticiones y latencias por ruta, pool de conexiones, reportes, conflictos de reserva y caches"""
+    if not schemasTurno.settings.metricas_activas:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Las métricas están desactivadas (configure METRICAS_ACTIVAS)")
+    return PlainTextResponse(metricas.prometheus(engine), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/admin/metricas", dependencies=[Depends(verificar_admin)])
+def get_metricas():
+    """Histogramas por ruta de tiempo total, tiempo en SQL, consultas y filas leídas desde que inició la aplicación"""
+    if not schemasTurno.settings.metricas_activas:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Las métricas están desactivadas (configure METRICAS_ACTIVAS)")
+    return metricas.resumen()
+
+
+# Dependencia de los endpoints del perfilador: solo existen con PERFILADOR_ACTIVO
+def verificar_perfilador():
+    if not schemasTurno.settings.perfilador_activo:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="El perfilador está desactivado (configure PERFILADOR_ACTIVO)")
+
+
+@app.get("/admin/perfilador", response_model=schemasTurno.EstadoPerfiladorOut, dependencies=[Depends(verificar_admin), Depends(verificar_perfilador)])
+def get_perfilador():
+    """Muestreo activo y perfiles capturados (del más nuevo al más viejo)"""
+    return perfilador.estado()
+
+
+@app.put("/admin/perfilador", response_model=schemasTurno.EstadoPerfiladorOut, dependencies=[Depends(verificar_admin), Depends(verificar_perfilador)])
+def configurar_perfilador(configuracion: schemasTurno.ConfiguracionPerfilador):
+    """Activa el muestreo: perfila la proporción indicada de peticiones (opcionalmente de una ruta) hasta capturar la cantidad pedida"""
+    return perfilador.configurar(configuracion.proporcion, configuracion.ruta, configuracion.cantidad)
+
+
+@app.delete("/admin/perfilador", response_model=schemasTurno.EstadoPerfiladorOut, dependencies=[Depends(verificar_admin), Depends(verificar_perfilador)])
+def desactivar_perfilador():
+    """Desactiva el muestreo, los perfiles capturados se conservan"""
+    return perfilador.desactivar()
+
+
+@app.get("/admin/perfilador/{perfil_id}", dependencies=[Depends(verificar_admin), Depends(verificar_perfilador)])
+def descargar_perfil(perfil_id: str, formato: str = Query("pstats", description="pstats (binario de cProfile) o texto")):
+    """Descarga un perfil capturado"""
+    try:
+        contenido, nombre_archivo, media_type = perfilador.obtener_perfil(perfil_id, formato)
+    except perfilador.PerfilNoEncontrado as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return Response(content=contenido, media_type=media_type, headers={"Content-Disposition": f"attachment; filename={nombre_archivo}"})
+
+
+# Perfilado bajo demanda: se registra al final para envolver todos los endpoints ya declarados
+if schemasTurno.settings.perfilador_activo:
+    perfilador.instrumentar(app)
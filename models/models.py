@@ -1,7 +1,65 @@
 
-from sqlalchemy import Column, Integer, String, Date, Boolean, Time, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, Boolean, DateTime, JSON, ForeignKey, Index, text
+from sqlalchemy.types import TypeDecorator
+from datetime import datetime, time
+from enum import IntEnum
 from sqlalchemy.orm import relationship
 from database.database import Base
+from schemas.schemasTurno import settings, RECURSO_GENERAL
+
+
+#Codigo con el que se guarda cada estado de turno, asociado a las claves estaticas de ESTADOS_POSIBLES
+#(los textos de cada estado se configuran en el .env y pueden cambiar sin tocar los datos guardados)
+class EstadoTurno(IntEnum):
+    ESTADO_PENDIENTE = 1
+    ESTADO_CANCELADO = 2
+    ESTADO_CONFIRMADO = 3
+    ESTADO_ASISTIDO = 4
+
+#Texto configurado (en minuscula) -> codigo, y codigo -> texto configurado
+CODIGOS_ESTADO = {settings.estados_posibles[estado.name].lower(): estado for estado in EstadoTurno}
+TEXTOS_ESTADO = {estado: settings.estados_posibles[estado.name] for estado in EstadoTurno}
+
+
+class CodigoEstadoTurno(TypeDecorator):
+    """
+        Guarda el estado del turno como un entero chico (EstadoTurno) y lo devuelve con el texto configurado
+        Las consultas comparan por igualdad contra el texto (models.Turno.estado == "Cancelado")
+        y el filtro se resuelve como una comparacion de enteros que puede usar los indices
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, valor, dialect):
+        if valor is None or isinstance(valor, EstadoTurno):
+            return valor
+        if isinstance(valor, int):
+            return EstadoTurno(valor)
+        codigo = CODIGOS_ESTADO.get(valor.lower())
+        if codigo is None:
+            raise ValueError(f"Estado de turno inválido: {valor}")
+        return codigo
+
+    def process_result_value(self, valor, dialect):
+        return None if valor is None else TEXTOS_ESTADO[valor]
+
+
+class MinutosDelDia(TypeDecorator):
+    """
+        Guarda la hora del turno como minutos desde la medianoche (09:30 -> 570) y la devuelve como time
+        Los conflictos de horario, los rangos y el orden se resuelven comparando enteros
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, valor, dialect):
+        if valor is None or isinstance(valor, int):
+            return valor
+        return valor.hour * 60 + valor.minute
+
+    def process_result_value(self, valor, dialect):
+        return None if valor is None else time(valor // 60, valor % 60)
+
 
 class Persona(Base):
     __tablename__ = "personas"
@@ -15,14 +73,79 @@ class Persona(Base):
     
     turnos = relationship("Turno", back_populates="persona")
 
+#Profesional o consultorio con su propia agenda: cada horario admite hasta 'capacidad' turnos activos
+class Recurso(Base):
+    __tablename__ = "recursos"
+    id = Column(Integer, primary_key=True, index=True)
+    nombre = Column(String, unique=True, nullable=False)
+    tipo = Column(String, nullable=False)  #profesional o consultorio
+    capacidad = Column(Integer, nullable=False, default=1)
+    activo = Column(Boolean, nullable=False, default=True)
+
+    turnos = relationship("Turno", back_populates="recurso")
+
 class Turno(Base):
     __tablename__ = "turnos"
+    #Los mismos indices que crean las migraciones 2 a 6 (database/migraciones.py) en las bases existentes
+    __table_args__ = (
+        Index("ix_turnos_persona_estado_fecha", "persona_id", "estado", "fecha"),
+        Index("ix_turnos_fecha_hora", "fecha", "hora"),
+        #Cada lugar de un horario de un recurso lo ocupa un solo turno no cancelado
+        Index("ux_turnos_recurso_fecha_hora_lugar", "recurso_id", "fecha", "hora", "lugar", unique=True,
+              sqlite_where=text(f"estado != {int(EstadoTurno.ESTADO_CANCELADO)}")),
+    )
     id = Column(Integer, primary_key=True, index=True)
     fecha = Column(Date, nullable=False)
-    hora = Column(Time, nullable=False)
-    estado = Column(String, nullable=False)
+    hora = Column(MinutosDelDia, nullable=False)  #se lee y se escribe como time
+    estado = Column(CodigoEstadoTurno, nullable=False)  #se lee y se escribe con el texto del estado
 
     persona_id = Column(Integer, ForeignKey("personas.id"), nullable=False)
+    recurso_id = Column(Integer, ForeignKey("recursos.id"), nullable=False, default=RECURSO_GENERAL, server_default=text(str(RECURSO_GENERAL)))
+    lugar = Column(SmallInteger, nullable=False, default=1, server_default=text("1"))  #de 1 a la capacidad del recurso
 
     persona = relationship("Persona", back_populates="turnos")
+    recurso = relationship("Recurso", back_populates="turnos")
+
+
+#Resumen materializado de cancelaciones por (año, mes, persona)
+#Se actualiza de forma incremental cuando un turno entra o sale del estado cancelado
+class ResumenCancelacion(Base):
+    __tablename__ = "resumen_cancelaciones"
+    anio = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    persona_id = Column(Integer, ForeignKey("personas.id"), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+
+    persona = relationship("Persona")
+
+
+#Registro de cambios (solo se agregan filas): cada alta, modificacion o baja de turnos y personas
+#se escribe en la misma transaccion que el cambio, y los consumidores leen a partir de un numero de secuencia
+class Cambio(Base):
+    __tablename__ = "cambios"
+    __table_args__ = {"sqlite_autoincrement": True}  #la secuencia nunca reutiliza numeros
+    seq = Column(Integer, primary_key=True)
+    entidad = Column(String, nullable=False)
+    entidad_id = Column(Integer, nullable=False)
+    operacion = Column(String, nullable=False)
+    datos = Column(JSON, nullable=True)  #estado de la entidad luego del cambio (None en las bajas)
+    fecha_hora = Column(DateTime, nullable=False, default=datetime.now)
+
+
+#Historial de ejecuciones de las tareas programadas (por ejemplo la expiracion de turnos pasados)
+class Ejecucion(Base):
+    __tablename__ = "ejecuciones"
+    id = Column(Integer, primary_key=True, index=True)
+    tarea = Column(String, nullable=False, index=True)
+    inicio = Column(DateTime, nullable=False)
+    fin = Column(DateTime, nullable=False)
+    filas_afectadas = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)  #mensaje del error si la ejecucion fallo
+
 
+#Fechas en las que no se atiende (feriados, capacitaciones, etc.), ademas de los dias sin atencion del .env
+class Cierre(Base):
+    __tablename__ = "cierres"
+    fecha = Column(Date, primary_key=True)
+    motivo = Column(String, nullable=False)
+    creado = Column(DateTime, nullable=False, default=datetime.now)
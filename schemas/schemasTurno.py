@@ -1,29 +1,35 @@
 from pydantic import BaseModel, model_validator, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from datetime import date, time, timedelta, datetime
+from datetime import date, time, datetime
 from schemas.schemas import PersonaOut
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, NamedTuple, Literal
+from types import MappingProxyType
 from dotenv import load_dotenv
 from pathlib import Path
 
+#Recurso general que crea la migracion 6: los turnos que no indican recurso se reservan en este
+RECURSO_GENERAL = 1
+
 class TurnoBase(BaseModel):
     fecha: date
     hora: time
     persona_id: int
 
 class TurnoCreate(TurnoBase):
-    pass
+    recurso_id: int = RECURSO_GENERAL
 
 class TurnoUpdate(BaseModel):
     fecha: Optional[date] = None
     hora: Optional[time] = None
     estado: Optional[str] = None
+    recurso_id: Optional[int] = None
 
 class TurnoOut(BaseModel):
     id: int
     fecha: date
     hora: time
     estado: str
+    recurso_id: int
     persona: PersonaOut
 
     class Config:
@@ -38,6 +44,38 @@ class HorariosResponse(BaseModel):
     fecha: date
     horarios_disponibles: list[str]
 
+#Recursos (profesionales o consultorios) con agenda propia
+class RecursoCreate(BaseModel):
+    nombre: str = Field(..., min_length=1, max_length=100)
+    tipo: Literal["profesional", "consultorio"]
+    capacidad: int = Field(1, ge=1, le=50, description="Turnos que admite cada horario")
+
+class RecursoUpdate(BaseModel):
+    nombre: Optional[str] = Field(None, min_length=1, max_length=100)
+    capacidad: Optional[int] = Field(None, ge=1, le=50)
+    activo: Optional[bool] = None
+
+class RecursoOut(BaseModel):
+    id: int
+    nombre: str
+    tipo: str
+    capacidad: int
+    activo: bool
+
+    class Config:
+        from_attributes = True
+
+#Horarios con lugares libres de un recurso en una fecha
+class HorarioRecurso(BaseModel):
+    hora: str
+    libres: int
+
+class DisponibilidadRecurso(BaseModel):
+    recurso_id: int
+    nombre: str
+    fecha: date
+    horarios: List[HorarioRecurso]
+
 #Retorna un mensaje
 class MensajeResponse(BaseModel):
     mensaje: str
@@ -93,6 +131,94 @@ class RespuestaTurnosPaginados(BaseModel):
     total_registros: int
     metadata: MetadataPaginacion
 
+#Solicitud de un reporte en segundo plano
+class TrabajoReporteCreate(BaseModel):
+    tipo: str = Field(..., description="Reporte a generar, por ejemplo 'pdf/turnos-por-fecha' o 'csv/estado-personas'")
+    parametros: Dict[str, Any] = Field(default_factory=dict, description="Parámetros del reporte (los mismos que su endpoint)")
+
+#Estado de un reporte en segundo plano
+class TrabajoReporteOut(BaseModel):
+    id: str
+    tipo: str
+    parametros: Dict[str, Any]
+    estado: str
+    progreso: int
+    mensaje: Optional[str] = None
+    nombre_archivo: Optional[str] = None
+    tamanio_bytes: Optional[int] = None
+    creado: datetime
+    finalizado: Optional[datetime] = None
+    vence: Optional[datetime] = None
+
+#Cambio registrado en el log de cambios
+class CambioOut(BaseModel):
+    seq: int
+    entidad: str
+    entidad_id: int
+    operacion: str
+    datos: Optional[Dict[str, Any]] = None
+    fecha_hora: datetime
+
+#Lote de cambios posteriores a un numero de secuencia
+class RespuestaCambios(BaseModel):
+    cambios: List[CambioOut]
+    ultimo_seq: int
+    hay_mas: bool
+
+#Ejecucion de una tarea programada
+class EjecucionOut(BaseModel):
+    id: int
+    tarea: str
+    inicio: datetime
+    fin: datetime
+    filas_afectadas: int
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+#Muestreo del perfilador de peticiones
+class ConfiguracionPerfilador(BaseModel):
+    proporcion: float = Field(1.0, gt=0, le=1, description="Proporción de peticiones a perfilar (1 perfila todas)")
+    ruta: Optional[str] = Field(None, description="Prefijo de la ruta a perfilar, por ejemplo /reportes/pdf (vacío: todas)")
+    cantidad: int = Field(1, ge=1, le=100, description="Cantidad de perfiles a capturar, luego el muestreo se desactiva")
+
+#Perfil capturado de una peticion
+class PerfilOut(BaseModel):
+    id: str
+    metodo: str
+    url: str
+    endpoint: Optional[str] = None
+    codigo: int
+    duracion_ms: float
+    creado: datetime
+
+class EstadoPerfiladorOut(BaseModel):
+    muestreo: Optional[Dict[str, Any]] = None
+    perfiles: List[PerfilOut]
+
+#Cierre de la agenda en una fecha (feriados, capacitaciones, etc.)
+class CierreCreate(BaseModel):
+    fecha: date
+    motivo: str = Field(..., min_length=1, max_length=200)
+
+class CierreOut(BaseModel):
+    fecha: date
+    motivo: str
+    creado: datetime
+
+    class Config:
+        from_attributes = True
+
+class CierreCreadoOut(CierreOut):
+    turnos_activos: int  #turnos no cancelados que ya estaban reservados en esa fecha (no se modifican)
+
+#Franja de atencion de un dia de la semana que no usa la franja general del .env
+class FranjaHoraria(BaseModel):
+    inicio: str
+    fin: str
+    intervalo: Optional[int] = None  #por defecto INTERVALO
+
 #Carga las variables del archivo .env
 load_dotenv()
 
@@ -103,6 +229,43 @@ RUTA_ARCHIVO_ENV = Path(__file__).resolve().parent.parent/'.env'
 #'resolve()' convierte la ruta en absoluta para ubicar el archivo en la terminal donde se ejecuta
 #'.parent.parent' sube dos carpetas hasta la raíz del proyecto
 
+#Grilla de horarios de turnos: se arma una unica vez a partir de la franja horaria del .env y no se modifica
+#Los horarios se representan en minutos desde la medianoche, igual que se guardan en la base (models.MinutosDelDia)
+class GrillaHorarios(NamedTuple):
+    minutos: tuple  #minutos de cada horario, en orden (09:00 -> 540)
+    textos: tuple  #cada horario como "HH:MM"
+    indices: MappingProxyType  #minutos -> numero de horario
+    conjunto: frozenset  #minutos de todos los horarios, para verificar pertenencia
+
+    @classmethod
+    def desde_franja(cls, inicio: str, fin: str, intervalo: int) -> "GrillaHorarios":
+        """Horarios desde inicio hasta fin (inclusive) cada intervalo minutos. Lanza ValueError si la franja no es válida"""
+        try:
+            hora_inicio = datetime.strptime(inicio, "%H:%M")
+            hora_fin = datetime.strptime(fin, "%H:%M")
+        except ValueError as error:
+            raise ValueError(f"Error en el formato de hora: {error}")
+        if intervalo <= 0:
+            raise ValueError("El intervalo entre turnos debe ser mayor a 0 minutos")
+        if hora_fin < hora_inicio:
+            raise ValueError(f"El horario de fin ({fin}) no puede ser anterior al de inicio ({inicio})")
+
+        minutos = tuple(range(hora_inicio.hour * 60 + hora_inicio.minute, hora_fin.hour * 60 + hora_fin.minute + 1, intervalo))
+        return cls(
+            minutos=minutos,
+            textos=tuple(f"{minuto // 60:02d}:{minuto % 60:02d}" for minuto in minutos),
+            indices=MappingProxyType({minuto: indice for indice, minuto in enumerate(minutos)}),
+            conjunto=frozenset(minutos),
+        )
+
+    def indice(self, hora: time) -> Optional[int]:
+        """Numero de horario de la hora (None si no es un horario de turno)"""
+        return self.indices.get(hora.hour * 60 + hora.minute)
+
+    def contiene(self, hora: time) -> bool:
+        return hora.hour * 60 + hora.minute in self.conjunto
+
+
 # Clase de variables de entorno
 class ConfiguracionInicial(BaseSettings):
     #Variables de control de franja horaria
@@ -113,33 +276,82 @@ class ConfiguracionInicial(BaseSettings):
     #Variable de franja horaria, no se leerá directamente desde el archivo .env 
     horarios_turnos: List[str] = Field(default=[], init=False)
     
+    #Variables de la agenda por dia de la semana (0=lunes ... 6=domingo): franjas propias y dias sin atencion
+    horarios_por_dia: Dict[int, FranjaHoraria] = {}
+    dias_sin_atencion: List[int] = [6]
+
+    #Segundos que se conservan en memoria los cierres leidos de la base
+    calendario_cache_segundos: float = 60
+
     #Variable de turnos posibles
     estados_posibles: Dict[str, str]
 
+    #Base de datos SQLite que usa la aplicacion (los benchmarks la cambian para no tocar personas.db)
+    database_url: str = "sqlite:///./personas.db"
+
+    #Preparacion de la base al iniciar la aplicacion (migraciones y datos de prueba), en produccion se pueden desactivar
+    migrar_al_iniciar: bool = True
+    cargar_datos_prueba: bool = True
+
+    #Variables de control de reportes PDF (filas por tabla antes de cortar y limite de filas por documento)
+    pdf_filas_por_tabla: int = 25
+    pdf_max_filas: int = 5000
+
+    #Variables de control de reportes en segundo plano (carpeta de resultados, hilos de trabajo y vencimiento)
+    reportes_directorio: str = "reportes_generados"
+    reportes_workers: int = 2
+    reportes_ttl_minutos: int = 60
+
+    #Cantidad de filas que se leen y escriben por lote al exportar reportes en Parquet, Arrow o CSV
+    export_filas_por_lote: int = 10000
+
+    #Tamaño mínimo en bytes de una respuesta JSON para comprimirla con gzip (0 desactiva la compresión de JSON)
+    compresion_json_minimo_bytes: int = 1000
+
+    #Token de los endpoints de administración (encabezado X-Admin-Token), vacío los desactiva
+    admin_token: str = ""
+
+    #Variables del log de cambios (cambios por consulta y segundos entre lecturas del stream SSE)
+    cambios_lote_maximo: int = 500
+    cambios_intervalo_segundos: float = 1.0
+
+    #Variables de la expiracion automatica de turnos (minutos entre ejecuciones, 0 la desactiva, y turnos por transaccion)
+    expiracion_intervalo_minutos: float = 15
+    expiracion_lote: int = 500
+
+    #Minutos entre reevaluaciones de las personas habilitadas segun sus cancelaciones (0 la desactiva)
+    habilitacion_intervalo_minutos: float = 60
+
+    #Metricas por peticion (Server-Timing y /admin/metricas) y milisegundos desde los que una peticion se registra como lenta (0 no registra)
+    metricas_activas: bool = False
+    metricas_lenta_ms: float = 0
+
+    #Detector de consultas N+1 (vacio lo desactiva, "advertir" o "fallar"), consultas maximas por peticion y repeticiones de una misma sentencia
+    consultas_modo: str = ""
+    consultas_presupuesto: int = 20
+    consultas_repeticiones_maximas: int = 3
+
+    #Perfilador de peticiones bajo demanda (/admin/perfilador): carpeta de los perfiles y cuantos se conservan
+    perfilador_activo: bool = False
+    perfilador_directorio: str = "perfiles"
+    perfilador_maximo_perfiles: int = 20
+
     #Definimos la configuracion del archivo .env
     model_config = SettingsConfigDict(env_file=RUTA_ARCHIVO_ENV, env_file_encoding='utf-8') #'utf-8' asegura que no existan errores por caracteres extraños
     
     #Se carga la lista de horarios segun los limites del .env
     @model_validator(mode='after')
     def generar_lista_horarios(self):
-        try:
-            hora_inicio = datetime.strptime(self.horario_inicio, "%H:%M")
-            hora_fin = datetime.strptime(self.horario_fin, "%H:%M")
-
-            intervalo = timedelta(minutes=self.intervalo)
-
-            lista_horarios = [0]
-            hora_actual = hora_inicio
-
-            while hora_actual <= hora_fin:
-                lista_horarios.append(hora_actual.strftime("%H:%M"))
-                hora_actual += intervalo
-            self.horarios_turnos = lista_horarios
-        except ValueError as error:
-            raise ValueError(f"Error en el formato de hora: {error}")
+        self.horarios_turnos = list(GrillaHorarios.desde_franja(self.horario_inicio, self.horario_fin, self.intervalo).textos)
+        dias_invalidos = [dia for dia in [*self.horarios_por_dia, *self.dias_sin_atencion] if not 0 <= dia <= 6]
+        if dias_invalidos:
+            raise ValueError(f"Días de la semana inválidos: {dias_invalidos} (0=lunes ... 6=domingo)")
         return self
-       
+
 settings = ConfiguracionInicial()
 
+#Grilla unica de horarios que usan la validacion de turnos, la disponibilidad y la generacion de datos
+grilla_horarios = GrillaHorarios.desde_franja(settings.horario_inicio, settings.horario_fin, settings.intervalo)
+
 
    
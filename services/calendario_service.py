@@ -0,0 +1,115 @@
+"""
+Módulo de la agenda de atención: qué horarios de turno tiene cada fecha.
+
+La agenda combina:
+- Plantillas por día de la semana, armadas una sola vez al iniciar a partir del .env: la franja general
+  (HORARIO_INICIO, HORARIO_FIN, INTERVALO), las franjas propias de algunos días (HORARIOS_POR_DIA, por ejemplo
+  sábados medio día) y los días sin atención (DIAS_SIN_ATENCION).
+- Cierres por fecha guardados en la tabla cierres (feriados), que se administran en /admin/cierres.
+
+El resultado de cada fecha (su grilla de horarios o el motivo por el que no se atiende) se guarda en memoria,
+así la validación de turnos y la disponibilidad de un mes completo no vuelven a evaluar las reglas por fecha.
+Los cierres se leen de la base en una sola consulta y se vuelven a leer cuando se modifican desde este proceso
+o cada CALENDARIO_CACHE_SEGUNDOS (para ver los cambios hechos por otros workers).
+"""
+import threading
+import time
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models.models as models
+import services.metricas_service as metricas
+from schemas.schemasTurno import settings, grilla_horarios, GrillaHorarios
+
+
+DIAS_SEMANA = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+MAXIMO_FECHAS = 5000  #fechas resueltas que se conservan en memoria antes de vaciar el cache
+
+
+class DiaAgenda(NamedTuple):
+    grilla: Optional[GrillaHorarios]  #None si la fecha no tiene atencion
+    motivo: Optional[str] = None  #por que no se atiende
+
+
+def _plantillas() -> tuple:
+    #Grilla de cada dia de la semana (None en los dias sin atencion)
+    plantillas = []
+    for dia in range(7):
+        if dia in settings.dias_sin_atencion:
+            plantillas.append(None)
+        elif dia in settings.horarios_por_dia:
+            franja = settings.horarios_por_dia[dia]
+            plantillas.append(GrillaHorarios.desde_franja(franja.inicio, franja.fin, franja.intervalo or settings.intervalo))
+        else:
+            plantillas.append(grilla_horarios)
+    return tuple(plantillas)
+
+
+PLANTILLAS = _plantillas()
+
+_cierres = None  #fecha -> motivo, None hasta leerlos de la base
+_cierres_leidos = 0.0
+_por_fecha = {}  #fecha -> DiaAgenda
+_aciertos = 0
+_fallos = 0
+_bloqueo = threading.Lock()
+
+metricas.registrar_cache("calendario", lambda: (_aciertos, _fallos))
+
+
+def invalidar():
+    """Descarta los cierres y las fechas resueltas (se llama al modificar los cierres)"""
+    global _cierres
+    with _bloqueo:
+        _cierres = None
+        _por_fecha.clear()
+
+
+def _cargar_cierres(db: Session) -> dict:
+    global _cierres, _cierres_leidos
+    cierres = _cierres
+    if cierres is not None and time.monotonic() - _cierres_leidos < settings.calendario_cache_segundos:
+        return cierres
+    cierres = dict(db.execute(select(models.Cierre.fecha, models.Cierre.motivo)).all())
+    with _bloqueo:
+        if cierres != _cierres:
+            _por_fecha.clear()
+        _cierres, _cierres_leidos = cierres, time.monotonic()
+    return cierres
+
+
+def _resolver(fecha: date, cierres: dict) -> DiaAgenda:
+    if fecha in cierres:
+        return DiaAgenda(None, f"El {fecha.strftime('%d/%m/%Y')} no se atiende: {cierres[fecha]}")
+    plantilla = PLANTILLAS[fecha.weekday()]
+    if plantilla is None:
+        return DiaAgenda(None, f"No se atiende los días {DIAS_SEMANA[fecha.weekday()]}")
+    return DiaAgenda(plantilla)
+
+
+def dias(db: Session, desde: date, hasta: date) -> list:
+    """Lista de (fecha, DiaAgenda) de cada fecha entre desde y hasta (inclusive)"""
+    global _aciertos, _fallos
+    cierres = _cargar_cierres(db)
+    resultado = []
+    with _bloqueo:
+        if len(_por_fecha) > MAXIMO_FECHAS:
+            _por_fecha.clear()
+        for numero in range((hasta - desde).days + 1):
+            fecha = desde + timedelta(days=numero)
+            dia_agenda = _por_fecha.get(fecha)
+            if dia_agenda is None:
+                _fallos += 1
+                dia_agenda = _por_fecha[fecha] = _resolver(fecha, cierres)
+            else:
+                _aciertos += 1
+            resultado.append((fecha, dia_agenda))
+    return resultado
+
+
+def dia(db: Session, fecha: date) -> DiaAgenda:
+    """Grilla de horarios de la fecha, o el motivo por el que no se atiende"""
+    return dias(db, fecha, fecha)[0][1]
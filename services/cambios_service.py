@@ -0,0 +1,50 @@
+"""
+Módulo para enviar el log de cambios como Server-Sent Events (SSE).
+
+El stream lee los cambios posteriores al último número de secuencia enviado cada CAMBIOS_INTERVALO_SEGUNDOS
+y envía cada uno como un evento con su número de secuencia como id. Si el cliente se reconecta con el
+encabezado Last-Event-ID, continúa desde ese número sin perder cambios.
+"""
+import asyncio
+import json
+
+from starlette.concurrency import run_in_threadpool
+
+import crud.crudCambios as crudCambios
+from database.database import SessionLocal
+from schemas.schemasTurno import settings
+
+
+#Cada cuantas lecturas sin cambios se envía un comentario para mantener viva la conexión
+LECTURAS_POR_LATIDO = 15
+
+
+def formatear_evento(cambio: dict) -> str:
+    datos = json.dumps(cambio, ensure_ascii=False, default=str)
+    return f"id: {cambio['seq']}\nevent: cambio\ndata: {datos}\n\n"
+
+
+def _leer_cambios(desde: int):
+    #Cada lectura usa su propia sesión: la del request ya se cerró cuando corre el stream
+    with SessionLocal() as db:
+        return crudCambios.get_cambios(db, desde)
+
+
+async def stream_cambios(request, desde: int):
+    lecturas_sin_cambios = 0
+    while not await request.is_disconnected():
+        lote = await run_in_threadpool(_leer_cambios, desde)
+        for cambio in lote["cambios"]:
+            yield formatear_evento(cambio)
+        desde = lote["ultimo_seq"]
+
+        if lote["hay_mas"]:
+            continue  #quedan cambios pendientes, se siguen leyendo sin esperar
+        if lote["cambios"]:
+            lecturas_sin_cambios = 0
+        else:
+            lecturas_sin_cambios += 1
+            if lecturas_sin_cambios >= LECTURAS_POR_LATIDO:
+                lecturas_sin_cambios = 0
+                yield ": latido\n\n"
+        await asyncio.sleep(settings.cambios_intervalo_segundos)
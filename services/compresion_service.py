@@ -0,0 +1,173 @@
+"""
+Módulo para comprimir las descargas de reportes.
+
+La compresión se elige a partir del parámetro compress= o del encabezado Accept-Encoding del cliente
+(zstd si está disponible, si no gzip) y se aplica sobre la marcha: el contenido se recorre por fragmentos
+y cada fragmento comprimido se envía apenas se produce, sin armar el archivo comprimido completo en memoria.
+
+Incluye además un middleware que comprime con gzip solo las respuestas JSON grandes (por ejemplo
+/reportes/turnos-cancelados), activable con COMPRESION_JSON_MINIMO_BYTES.
+"""
+import zlib
+from io import StringIO
+from pathlib import Path
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:  #zstd es opcional, sin el paquete solo se ofrece gzip
+    zstandard = None
+
+
+TAMANIO_FRAGMENTO = 64 * 1024
+
+#Codificaciones soportadas, en orden de preferencia cuando el cliente acepta varias con la misma prioridad
+CODIFICACIONES = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def elegir_codificacion(accept_encoding: str = None, compress: str = None):
+    """
+    Devuelve la codificación a usar ("zstd", "gzip") o None para enviar sin comprimir.
+    El parámetro compress tiene prioridad sobre el encabezado Accept-Encoding.
+    Lanza ValueError si se pide una compresión no soportada.
+    """
+    if compress is not None:
+        compress = compress.lower()
+        if compress in ("none", "identity"):
+            return None
+        if compress not in CODIFICACIONES:
+            raise ValueError(f"Compresión no soportada: {compress}. Opciones: {', '.join(CODIFICACIONES + ('none',))}")
+        return compress
+
+    if not accept_encoding:
+        return None
+
+    #Se leen las codificaciones aceptadas con su prioridad (q), por ejemplo "gzip;q=0.8, zstd"
+    prioridades = {}
+    for opcion in accept_encoding.split(","):
+        nombre, _, parametros = opcion.strip().partition(";")
+        calidad = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        prioridades[nombre.strip().lower()] = calidad
+
+    candidatas = [
+        (prioridades.get(codificacion, prioridades.get("*", 0.0)), -orden, codificacion)
+        for orden, codificacion in enumerate(CODIFICACIONES)
+    ]
+    calidad, _, codificacion = max(candidatas)
+    return codificacion if calidad > 0 else None
+
+
+def fragmentos(contenido):
+    """
+    Recorre el contenido de un reporte por fragmentos de bytes.
+    Acepta el buffer de texto de los CSV (StringIO), texto, bytes, la ruta de un archivo en disco
+    o un generador que ya produce fragmentos de bytes.
+    """
+    if isinstance(contenido, StringIO):
+        while True:
+            texto = contenido.read(TAMANIO_FRAGMENTO)
+            if not texto:
+                break
+            yield texto.encode("utf-8")
+    elif isinstance(contenido, str):
+        yield from fragmentos(StringIO(contenido))
+    elif isinstance(contenido, Path):
+        with open(contenido, "rb") as archivo:
+            while True:
+                datos = archivo.read(TAMANIO_FRAGMENTO)
+                if not datos:
+                    break
+                yield datos
+    elif isinstance(contenido, (bytes, bytearray)):
+        for inicio in range(0, len(contenido), TAMANIO_FRAGMENTO):
+            yield contenido[inicio:inicio + TAMANIO_FRAGMENTO]
+    else:
+        yield from contenido
+
+
+def comprimir(partes, codificacion: str = None):
+    """Comprime los fragmentos a medida que se recorren (o los deja pasar si codificacion es None)"""
+    if codificacion is None:
+        yield from partes
+        return
+
+    if codificacion == "zstd":
+        compresor = zstandard.ZstdCompressor(level=3).compressobj()
+    else:
+        compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  #wbits=31 genera el formato gzip
+
+    for parte in partes:
+        comprimido = compresor.compress(parte)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+class GZipJSONMiddleware:
+    """
+    Comprime con gzip solo las respuestas JSON de al menos minimum_size bytes.
+    Se decide con los encabezados de cada respuesta: las que no son JSON o ya tienen Content-Encoding
+    (las descargas manejan su propia compresión) pasan sin cambios.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, compresslevel: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("Accept-Encoding", ""):
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None  #mensaje http.response.start retenido hasta saber si se comprime
+        comprimir_respuesta = False
+        compresor = None
+
+        async def enviar(mensaje):
+            nonlocal inicio, comprimir_respuesta, compresor
+            if mensaje["type"] == "http.response.start":
+                encabezados = Headers(raw=mensaje["headers"])
+                if encabezados.get("content-type", "").startswith("application/json") and "content-encoding" not in encabezados:
+                    inicio = mensaje
+                    return
+                await send(mensaje)
+                return
+            if mensaje["type"] != "http.response.body" or inicio is None:
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            mas_cuerpo = mensaje.get("more_body", False)
+            if compresor is None:
+                #Primer fragmento: una respuesta completa y chica se envía tal cual
+                if not mas_cuerpo and len(cuerpo) < self.minimum_size:
+                    await send(inicio)
+                    await send(mensaje)
+                    inicio = None
+                    return
+                compresor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 31)
+                encabezados = MutableHeaders(raw=list(inicio["headers"]))
+                encabezados["Content-Encoding"] = "gzip"
+                encabezados.add_vary_header("Accept-Encoding")
+                del encabezados["Content-Length"]
+                if not mas_cuerpo:
+                    cuerpo = compresor.compress(cuerpo) + compresor.flush()
+                    encabezados["Content-Length"] = str(len(cuerpo))
+                    await send({**inicio, "headers": encabezados.raw})
+                    await send({"type": "http.response.body", "body": cuerpo})
+                    return
+                await send({**inicio, "headers": encabezados.raw})
+
+            datos = compresor.compress(cuerpo)
+            if not mas_cuerpo:
+                datos += compresor.flush()
+            await send({"type": "http.response.body", "body": datos, "more_body": mas_cuerpo})
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,105 @@
+"""
+Detector de consultas N+1 para desarrollo y tests (activable con CONSULTAS_MODO).
+
+Cuenta las sentencias SQL de cada petición y avisa cuando la ruta:
+- ejecuta más consultas que su presupuesto: CONSULTAS_PRESUPUESTO o el declarado con @presupuesto_consultas
+  junto a la ruta en main/main.py.
+- repite la misma sentencia (el mismo SQL con distintos parámetros) más de CONSULTAS_REPETICIONES_MAXIMAS
+  veces, que es el patrón de una consulta por cada fila de otra consulta (N+1).
+
+Con CONSULTAS_MODO=advertir se registra un aviso en el log "consultas". Con CONSULTAS_MODO=fallar se lanza
+ConsultasExcedidas al terminar la petición: el TestClient la propaga y el test falla. Vacío (por defecto)
+no se registra el middleware ni el evento de SQLAlchemy, así que no tiene costo.
+"""
+import logging
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from schemas.schemasTurno import settings
+
+
+logger = logging.getLogger("consultas")
+
+MODO_ADVERTIR = "advertir"
+MODO_FALLAR = "fallar"
+MODOS = (MODO_ADVERTIR, MODO_FALLAR)
+
+_sentencias_actuales = ContextVar("sentencias_actuales", default=None)
+
+
+class ConsultasExcedidas(Exception):
+    pass
+
+
+def presupuesto_consultas(maximo: int, repeticiones: int = None):
+    """
+    Declara el máximo de consultas SQL de un endpoint y, opcionalmente, cuántas veces puede repetir una
+    misma sentencia. Con maximo=None la ruta no se revisa (por ejemplo los streams, que repiten la misma
+    consulta mientras la conexión sigue abierta). Se coloca debajo del decorador de la ruta:
+
+        @app.get("/turnos")
+        @presupuesto_consultas(2)
+        def read_turnos(...):
+    """
+    def decorador(endpoint):
+        endpoint.presupuesto_consultas = (maximo, repeticiones)
+        return endpoint
+    return decorador
+
+
+def _contar_sentencia(conexion, cursor, sentencia, parametros, contexto, executemany):
+    sentencias = _sentencias_actuales.get()
+    if sentencias is not None:
+        sentencias[sentencia] += 1
+
+
+def revisar(endpoint, sentencias: Counter) -> list:
+    """Devuelve los problemas de la petición (vacío si respetó su presupuesto)"""
+    maximo, repeticiones = getattr(endpoint, "presupuesto_consultas", (settings.consultas_presupuesto, None))
+    if maximo is None:
+        return []
+    repeticiones = repeticiones or settings.consultas_repeticiones_maximas
+    problemas = []
+    total = sum(sentencias.values())
+    if total > maximo:
+        problemas.append(f"{total} consultas (presupuesto: {maximo})")
+    for sentencia, cantidad in sentencias.most_common():
+        if cantidad <= repeticiones:
+            break
+        problemas.append(f"sentencia repetida {cantidad} veces (máximo: {repeticiones}): {' '.join(sentencia.split())}")
+    return problemas
+
+
+class ConsultasMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sentencias = Counter()
+        token = _sentencias_actuales.set(sentencias)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _sentencias_actuales.reset(token)
+
+        endpoint = scope.get("endpoint")
+        problemas = revisar(endpoint, sentencias)
+        if problemas:
+            mensaje = f"{scope['method']} {scope['path']} ({getattr(endpoint, '__name__', 'sin ruta')}): " + "; ".join(problemas)
+            if settings.consultas_modo == MODO_FALLAR:
+                raise ConsultasExcedidas(mensaje)
+            logger.warning(mensaje)
+
+
+def instrumentar(app, motor):
+    """Registra el middleware y el evento de SQLAlchemy (solo se llama si CONSULTAS_MODO no está vacío)"""
+    if settings.consultas_modo not in MODOS:
+        raise ValueError(f"CONSULTAS_MODO inválido: {settings.consultas_modo}. Valores posibles: {', '.join(MODOS)} o vacío")
+    app.add_middleware(ConsultasMiddleware)
+    event.listen(motor, "before_cursor_execute", _contar_sentencia)
@@ -0,0 +1,75 @@
+"""
+Módulo para enviar la disponibilidad de horarios de una fecha como Server-Sent Events (SSE).
+
+Al conectarse se envía la lista completa de horarios disponibles (evento "estado"). Luego, cada vez que
+una reserva, cancelación o reprogramación toca esa fecha, se recalcula la disponibilidad y se envían solo
+las diferencias (evento "cambio" con los horarios que se liberaron y los que se ocuparon).
+
+Si la disponibilidad deja de poder consultarse (el recurso se desactivó o se eliminó, o la fecha ya pasó)
+se envía un evento "fin" con el motivo y se cierra el stream; ante un error inesperado, un evento "error".
+"""
+import asyncio
+import json
+import logging
+from datetime import date
+
+from starlette.concurrency import run_in_threadpool
+
+import crud.crudTurno as crudTurno
+import services.eventos_service as eventos
+from database.database import SessionLocal
+
+
+#Segundos sin cambios tras los que se envía un comentario para mantener viva la conexión
+SEGUNDOS_LATIDO = 15
+
+logger = logging.getLogger("disponibilidad")
+
+
+def _evento(nombre: str, datos: dict) -> str:
+    return f"event: {nombre}\ndata: {json.dumps(datos)}\n\n"
+
+
+def _leer_disponibles(fecha, recurso_id):
+    #Cada lectura usa su propia sesión: la del request ya se cerró cuando corre el stream
+    with SessionLocal() as db:
+        return crudTurno.get_turnos_disponibles(fecha, db, recurso_id)
+
+
+async def stream_disponibilidad(request, fecha, recurso_id):
+    tema = eventos.tema_disponibilidad(fecha)
+    #La suscripción se hace antes de la primera lectura para no perder cambios entre ambas
+    cola = eventos.suscribir(tema)
+    datos = {"fecha": fecha.isoformat(), "recurso_id": recurso_id}
+    try:
+        disponibles = await run_in_threadpool(_leer_disponibles, fecha, recurso_id)
+        yield _evento("estado", {**datos, "horarios_disponibles": disponibles})
+
+        while not await request.is_disconnected():
+            try:
+                await asyncio.wait_for(cola.get(), timeout=SEGUNDOS_LATIDO)
+            except asyncio.TimeoutError:
+                yield ": latido\n\n"
+                continue
+            #Varios avisos juntos se resuelven con una sola lectura
+            while not cola.empty():
+                cola.get_nowait()
+
+            nuevos = await run_in_threadpool(_leer_disponibles, fecha, recurso_id)
+            liberados = [hora for hora in nuevos if hora not in disponibles]
+            ocupados = [hora for hora in disponibles if hora not in nuevos]
+            disponibles = nuevos
+            if liberados or ocupados:
+                yield _evento("cambio", {**datos, "liberados": liberados, "ocupados": ocupados})
+    except (crudTurno.DatabaseResourceNotFound, ValueError) as error:
+        #El recurso se eliminó o se desactivó: no va a haber más cambios para informar
+        yield _evento("fin", {**datos, "motivo": str(error)})
+    except Exception as error:
+        if fecha < date.today():
+            #get_turnos_disponibles rechaza las fechas pasadas con Exception: la fecha terminó con el stream abierto
+            yield _evento("fin", {**datos, "motivo": str(error)})
+        else:
+            logger.exception("No se pudo leer la disponibilidad del %s (recurso %s)", fecha, recurso_id)
+            yield _evento("error", {**datos, "motivo": "No se pudo leer la disponibilidad"})
+    finally:
+        eventos.desuscribir(tema, cola)
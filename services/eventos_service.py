@@ -0,0 +1,59 @@
+"""
+Publicación y suscripción de eventos dentro del proceso.
+
+Las funciones de escritura de crudTurno publican en un tema (por ejemplo la disponibilidad de una fecha)
+después de confirmar la transacción, y los streams SSE se suscriben a los temas que les interesan.
+publicar() se puede llamar desde cualquier hilo: el mensaje se entrega en el event loop de cada suscriptor.
+"""
+import asyncio
+import threading
+
+
+#Mensajes pendientes por suscriptor: si un cliente no lee, los eventos extra se descartan
+#(los suscriptores usan el evento como aviso para volver a consultar, no necesitan cada mensaje)
+MAXIMO_PENDIENTES = 100
+
+_suscriptores = {}  #tema -> {cola: event loop del suscriptor}
+_bloqueo = threading.Lock()
+
+
+def tema_disponibilidad(fecha) -> str:
+    return f"disponibilidad:{fecha.isoformat()}"
+
+
+def suscribir(tema: str) -> asyncio.Queue:
+    """Crea la cola del suscriptor, se debe llamar desde el event loop que la va a leer"""
+    cola = asyncio.Queue(maxsize=MAXIMO_PENDIENTES)
+    with _bloqueo:
+        _suscriptores.setdefault(tema, {})[cola] = asyncio.get_running_loop()
+    return cola
+
+
+def desuscribir(tema: str, cola: asyncio.Queue):
+    with _bloqueo:
+        colas = _suscriptores.get(tema, {})
+        colas.pop(cola, None)
+        if not colas:
+            _suscriptores.pop(tema, None)
+
+
+def _entregar(cola: asyncio.Queue, mensaje):
+    try:
+        cola.put_nowait(mensaje)
+    except asyncio.QueueFull:
+        pass
+
+
+def publicar(tema: str, mensaje=None):
+    with _bloqueo:
+        destinos = list(_suscriptores.get(tema, {}).items())
+    for cola, loop in destinos:
+        try:
+            loop.call_soon_threadsafe(_entregar, cola, mensaje)
+        except RuntimeError:
+            pass  #el event loop del suscriptor ya se cerró
+
+
+def cantidad_suscriptores(tema: str) -> int:
+    with _bloqueo:
+        return len(_suscriptores.get(tema, {}))
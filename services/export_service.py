@@ -0,0 +1,190 @@
+"""
+Módulo para exportar reportes en formatos columnares (Parquet y Arrow) o CSV.
+
+Recibe la consulta de un reporte (ver las funciones consulta_export_* de crud), la ejecuta por lotes de
+EXPORT_FILAS_POR_LOTE filas y escribe cada lote en el archivo como un record batch, sin armar listas de
+diccionarios ni DataFrames intermedios. Las columnas mantienen su tipo: fechas, horas, enteros y booleanos
+se exportan tipados en lugar de textos formateados.
+
+También genera la exportación completa de personas, recursos, turnos y cierres de agenda (NDJSON o CSV) que usa /admin/export.
+"""
+import csv
+import json
+from datetime import datetime
+from io import StringIO
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Date, Integer, String, Time, func, select
+from sqlalchemy.orm import Session
+
+import models.models as models
+from database.database import engine
+from schemas.schemasTurno import settings
+
+
+#Formato -> (extension del archivo, tipo de contenido)
+FORMATOS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+    "csv": (".csv", "text/csv"),
+}
+
+#Tipo de columna de SQLAlchemy -> tipo de Arrow
+TIPOS_ARROW = (
+    (models.CodigoEstadoTurno, pa.string()),  #el estado se exporta con su texto, no con el codigo guardado
+    (models.MinutosDelDia, pa.time32("s")),  #la hora se exporta como hora, no en minutos
+    (Boolean, pa.bool_()),
+    (Integer, pa.int64()),
+    (Date, pa.date32()),
+    (Time, pa.time32("s")),
+    (String, pa.string()),
+)
+
+
+def _tipo_arrow(tipo_columna):
+    for tipo_sql, tipo_arrow in TIPOS_ARROW:
+        if isinstance(tipo_columna, tipo_sql):
+            return tipo_arrow
+    raise ValueError(f"Tipo de columna no soportado para exportar: {tipo_columna}")
+
+
+def esquema_consulta(consulta) -> pa.Schema:
+    """Arma el esquema de Arrow a partir de las columnas de la consulta"""
+    return pa.schema([
+        pa.field(columna.name, _tipo_arrow(columna.type))
+        for columna in consulta.selected_columns
+    ])
+
+
+def _escritor(formato: str, destino, esquema: pa.Schema):
+    if formato == "parquet":
+        return pq.ParquetWriter(destino, esquema, compression="zstd")
+    if formato == "arrow":
+        return pa.ipc.new_file(destino, esquema)
+    #CSV con el mismo separador que el resto de los reportes
+    return pa_csv.CSVWriter(destino, esquema, write_options=pa_csv.WriteOptions(delimiter=";"))
+
+
+def exportar(db: Session, consulta, formato: str) -> bytes:
+    """
+    Ejecuta la consulta por lotes y devuelve el contenido del archivo en el formato pedido.
+    Si la consulta no trae filas, el archivo igual se genera con sus columnas (sin filas).
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}. Formatos posibles: {', '.join(FORMATOS)}")
+
+    esquema = esquema_consulta(consulta)
+    destino = pa.BufferOutputStream()
+    resultado = db.execute(consulta.execution_options(yield_per=settings.export_filas_por_lote))
+    with _escritor(formato, destino, esquema) as escritor:
+        for filas in resultado.partitions():
+            #Se pasa de filas a columnas y cada columna se convierte con su tipo
+            columnas = list(zip(*filas))
+            lote = pa.RecordBatch.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+                schema=esquema
+            )
+            escritor.write_batch(lote)
+    return destino.getvalue().to_pybytes()
+
+
+def nombre_archivo(nombre: str, formato: str) -> str:
+    return f"{nombre}{FORMATOS[formato][0]}"
+
+
+def tipo_contenido(formato: str) -> str:
+    return FORMATOS[formato][1]
+
+
+# ============ EXPORTACION COMPLETA DE LA BASE (ADMINISTRACION) ============
+
+FORMATOS_HISTORIAL = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+#Tablas que se exportan con sus columnas, en orden de carga (los recursos antes que los turnos que los usan)
+CONSULTAS_HISTORIAL = {
+    "personas": lambda: select(
+        models.Persona.id, models.Persona.nombre, models.Persona.email, models.Persona.dni,
+        models.Persona.telefono, models.Persona.fecha_nacimiento, models.Persona.habilitado
+    ).order_by(models.Persona.id),
+    "recursos": lambda: select(
+        models.Recurso.id, models.Recurso.nombre, models.Recurso.tipo, models.Recurso.capacidad, models.Recurso.activo
+    ).order_by(models.Recurso.id),
+    "turnos": lambda: select(
+        models.Turno.id, models.Turno.fecha, models.Turno.hora, models.Turno.estado, models.Turno.persona_id,
+        models.Turno.recurso_id, models.Turno.lugar
+    ).order_by(models.Turno.id),
+    "cierres": lambda: select(
+        models.Cierre.fecha, models.Cierre.motivo, models.Cierre.creado
+    ).order_by(models.Cierre.fecha),
+}
+
+
+def validar_historial(formato: str, tablas: list):
+    if formato not in FORMATOS_HISTORIAL:
+        raise ValueError(f"Formato inválido: {formato}. Formatos posibles: {', '.join(FORMATOS_HISTORIAL)}")
+    invalidas = [tabla for tabla in tablas if tabla not in CONSULTAS_HISTORIAL]
+    if invalidas or not tablas:
+        raise ValueError(f"Tablas inválidas: {', '.join(invalidas) or '(ninguna)'}. Tablas posibles: {', '.join(CONSULTAS_HISTORIAL)}")
+    if formato == "csv" and len(tablas) > 1:
+        raise ValueError("El formato csv exporta una sola tabla por archivo, use ndjson para exportar varias")
+
+
+def _valor_json(valor):
+    #Fechas y horas en formato ISO
+    return valor.isoformat()
+
+
+def exportar_historial(formato: str, tablas: list):
+    """
+    Genera el contenido completo de las tablas pedidas, por lotes de EXPORT_FILAS_POR_LOTE filas.
+
+    Todas las lecturas se hacen dentro de una única transacción de lectura sobre una conexión propia,
+    así el archivo refleja la base en un mismo instante aunque sigan llegando escrituras.
+    En ndjson cada línea es un registro con el campo "tabla"; la primera línea trae la cantidad de registros
+    de cada tabla en esa foto, para verificar la carga, y el último número de secuencia del log de cambios.
+    """
+    conexion = engine.connect()
+    try:
+        #pysqlite no abre una transacción para las consultas SELECT: se abre explícitamente para que
+        #todas las lecturas usen la misma foto de la base (en modo WAL no bloquea a las escrituras)
+        conexion.exec_driver_sql("BEGIN")
+
+        if formato == "ndjson":
+            cantidades = {
+                tabla: conexion.execute(select(func.count()).select_from(CONSULTAS_HISTORIAL[tabla]().subquery())).scalar()
+                for tabla in tablas
+            }
+            #ultimo_cambio indica desde que numero de secuencia seguir con /cambios luego de cargar la exportacion
+            ultimo_cambio = conexion.execute(select(func.coalesce(func.max(models.Cambio.seq), 0))).scalar()
+            yield (json.dumps({
+                "tabla": "_exportacion",
+                "generado": datetime.now().isoformat(),
+                "cantidades": cantidades,
+                "ultimo_cambio": ultimo_cambio
+            }) + "\n").encode("utf-8")
+
+        for tabla in tablas:
+            resultado = conexion.execute(CONSULTAS_HISTORIAL[tabla]().execution_options(yield_per=settings.export_filas_por_lote))
+            columnas = list(resultado.keys())
+            if formato == "csv":
+                buffer = StringIO()
+                escritor = csv.writer(buffer, delimiter=";")
+                escritor.writerow(columnas)
+            for filas in resultado.partitions():
+                if formato == "csv":
+                    escritor.writerows(filas)
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+                else:
+                    yield "".join(
+                        json.dumps({"tabla": tabla, **dict(zip(columnas, fila))}, ensure_ascii=False, default=_valor_json) + "\n"
+                        for fila in filas
+                    ).encode("utf-8")
+            if formato == "csv" and buffer.tell():
+                yield buffer.getvalue().encode("utf-8")
+    finally:
+        conexion.rollback()
+        conexion.close()
@@ -0,0 +1,441 @@
+"""
+Módulo de métricas por petición (activable con METRICAS_ACTIVAS).
+
+Por cada petición HTTP mide el tiempo total, la cantidad de consultas SQL, el tiempo total en SQL, las filas
+leídas de la base y el tiempo de las fases marcadas con fase() (por ejemplo el armado de los PDF). Los tiempos
+se envían en el encabezado Server-Timing de la respuesta y se acumulan en histogramas por ruta, que se
+consultan en /admin/metricas.
+
+Las peticiones que superan METRICAS_LENTA_MS se registran en el log "metricas" junto con las sentencias SQL
+que ejecutaron.
+
+Además acumula la duración y el tamaño de los reportes descargados (CSV, PDF y exportaciones) y de los
+generados en segundo plano, contadores con nombre (contar()) y los aciertos de los caches registrados con
+registrar_cache(). Todo se publica en formato Prometheus en /metrics (ver prometheus()).
+
+Si METRICAS_ACTIVAS está desactivado no se registra el middleware ni los eventos de SQLAlchemy, y fase()
+devuelve la función sin cambios: no tiene costo.
+
+La medición de la petición en curso se guarda en una ContextVar, que también ven los endpoints sincrónicos y
+los generadores de las descargas (corren en el pool de hilos con una copia del contexto). Las consultas de
+los reportes en segundo plano y de las tareas programadas no se cuentan en ninguna petición.
+"""
+import bisect
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from schemas.schemasTurno import settings
+
+
+logger = logging.getLogger("metricas")
+
+#Limites de los histogramas (el ultimo balde acumula el resto)
+LIMITES_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 500)
+LIMITES_FILAS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+LIMITES_BYTES = (1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+#Tipo de contenido de una respuesta -> formato de reporte (las respuestas de estos tipos se miden como reportes)
+FORMATOS_REPORTE = {
+    "text/csv": "csv",
+    "application/pdf": "pdf",
+    "application/vnd.apache.parquet": "parquet",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/x-ndjson": "ndjson",
+}
+
+#Descripcion de cada contador para /metrics
+DESCRIPCION_CONTADORES = {
+    "turnos_conflictos": "Reservas o modificaciones de turnos rechazadas porque el horario ya estaba ocupado",
+}
+
+MAXIMO_SENTENCIAS = 100  #sentencias que se guardan por peticion para el log de peticiones lentas
+RUTA_DESCONOCIDA = "(sin ruta)"
+
+
+class Medicion:
+    """Datos de una petición en curso"""
+    __slots__ = ("inicio", "consultas", "segundos_sql", "filas", "fases", "sentencias")
+
+    def __init__(self, guardar_sentencias: bool):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.segundos_sql = 0.0
+        self.filas = 0
+        self.fases = {}  #nombre -> segundos
+        self.sentencias = [] if guardar_sentencias else None
+
+
+_medicion_actual = ContextVar("medicion_actual", default=None)
+
+
+class Histograma:
+    def __init__(self, limites: tuple):
+        self.limites = limites
+        self.baldes = [0] * (len(limites) + 1)
+        self.cantidad = 0
+        self.suma = 0.0
+
+    def observar(self, valor: float):
+        self.baldes[bisect.bisect_left(self.limites, valor)] += 1
+        self.cantidad += 1
+        self.suma += valor
+
+    def resumen(self) -> dict:
+        etiquetas = [f"<={limite}" for limite in self.limites] + [f">{self.limites[-1]}"]
+        return {
+            "suma": round(self.suma, 3),
+            "promedio": round(self.suma / self.cantidad, 3) if self.cantidad else None,
+            "baldes": dict(zip(etiquetas, self.baldes)),
+        }
+
+
+class EstadisticasRuta:
+    def __init__(self):
+        self.peticiones = 0
+        self.codigos = Counter()
+        self.total_ms = Histograma(LIMITES_MS)
+        self.sql_ms = Histograma(LIMITES_MS)
+        self.consultas = Histograma(LIMITES_CONSULTAS)
+        self.filas = Histograma(LIMITES_FILAS)
+        self.fases_ms = {}  #nombre de la fase -> Histograma
+
+
+class EstadisticasReporte:
+    def __init__(self):
+        self.duracion_ms = Histograma(LIMITES_MS)
+        self.tamanio_bytes = Histograma(LIMITES_BYTES)
+
+
+_estadisticas = {}  #(metodo, ruta) -> EstadisticasRuta
+_reportes = {}  #(reporte, formato, origen) -> EstadisticasReporte
+_contadores = Counter()  #(nombre, etiquetas) -> cantidad
+_caches = {}  #nombre -> funcion que devuelve (aciertos, fallos)
+_bloqueo = threading.Lock()
+
+
+# ============ FASES Y FILAS ============
+
+def fase(nombre: str):
+    """
+    Decorador que suma la duración de la función a la fase indicada de la petición en curso
+    (se muestra en Server-Timing y en los histogramas). Con las métricas desactivadas no modifica la función.
+    """
+    def decorador(funcion):
+        if not settings.metricas_activas:
+            return funcion
+
+        @wraps(funcion)
+        def medida(*args, **kwargs):
+            medicion = _medicion_actual.get()
+            if medicion is None:
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                medicion.fases[nombre] = medicion.fases.get(nombre, 0.0) + time.perf_counter() - inicio
+        return medida
+    return decorador
+
+
+def contar(nombre: str, cantidad: int = 1, **etiquetas):
+    """Suma al contador indicado (se publica en /metrics como <nombre>_total)"""
+    if not settings.metricas_activas:
+        return
+    with _bloqueo:
+        _contadores[(nombre, tuple(sorted(etiquetas.items())))] += cantidad
+
+
+def observar_reporte(reporte: str, formato: str, origen: str, segundos: float, tamanio: int):
+    """Registra la duración y el tamaño de un reporte generado (origen: peticion o trabajo)"""
+    if not settings.metricas_activas:
+        return
+    with _bloqueo:
+        estadisticas = _reportes.get((reporte, formato, origen))
+        if estadisticas is None:
+            estadisticas = _reportes[(reporte, formato, origen)] = EstadisticasReporte()
+        estadisticas.duracion_ms.observar(segundos * 1000)
+        estadisticas.tamanio_bytes.observar(tamanio)
+
+
+def registrar_cache(nombre: str, aciertos_y_fallos):
+    """Registra un cache para publicar su proporción de aciertos; aciertos_y_fallos() devuelve (aciertos, fallos)"""
+    _caches[nombre] = aciertos_y_fallos
+
+
+def _sumar_filas(cantidad: int):
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.filas += cantidad
+
+
+class _CursorMedido(sqlite3.Cursor):
+    #Cuenta las filas que SQLAlchemy lee del cursor
+    def fetchone(self):
+        fila = super().fetchone()
+        if fila is not None:
+            _sumar_filas(1)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = super().fetchmany(*args, **kwargs)
+        _sumar_filas(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = super().fetchall()
+        _sumar_filas(len(filas))
+        return filas
+
+
+class _ConexionMedida(sqlite3.Connection):
+    def cursor(self, factory=_CursorMedido):
+        return super().cursor(factory)
+
+
+# ============ EVENTOS DE SQLALCHEMY ============
+
+#El inicio de cada sentencia se guarda en su contexto de ejecución: si la sentencia falla, after_cursor_execute
+#no se llama y el valor se descarta con el contexto, sin quedar pendiente en la conexión.
+#Las pocas sentencias internas que SQLAlchemy ejecuta sin contexto no se miden.
+
+def _antes_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+    if contexto is not None:
+        contexto._inicio_consulta = time.perf_counter()
+
+
+def _despues_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+    inicio = getattr(contexto, "_inicio_consulta", None)
+    medicion = _medicion_actual.get()
+    if inicio is None or medicion is None:
+        return
+    segundos = time.perf_counter() - inicio
+    medicion.consultas += 1
+    medicion.segundos_sql += segundos
+    if medicion.sentencias is not None and len(medicion.sentencias) < MAXIMO_SENTENCIAS:
+        medicion.sentencias.append((segundos, sentencia))
+
+
+def _usar_cursor_medido(dialecto, registro_conexion, cargs, cparams):
+    cparams["factory"] = _ConexionMedida
+
+
+# ============ MIDDLEWARE ============
+
+def _server_timing(medicion: Medicion, segundos_total: float) -> str:
+    #Lo que no es SQL ni una fase medida queda como "app" (validacion, serializacion, etc.)
+    segundos_app = segundos_total - medicion.segundos_sql - sum(medicion.fases.values())
+    partes = [
+        f"total;dur={segundos_total * 1000:.1f}",
+        f'sql;dur={medicion.segundos_sql * 1000:.1f};desc="{medicion.consultas} consultas, {medicion.filas} filas"',
+    ]
+    partes += [f"{nombre};dur={segundos * 1000:.1f}" for nombre, segundos in medicion.fases.items()]
+    partes.append(f"app;dur={max(segundos_app, 0.0) * 1000:.1f}")
+    return ", ".join(partes)
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición HTTP. El encabezado Server-Timing refleja lo ocurrido hasta que empieza la respuesta;
+    en las descargas por streaming el resto del envío se suma igual en los histogramas y en el log.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._rutas = None  #endpoint -> ruta, se arma con la primera peticion (las rutas ya estan registradas)
+
+    def _ruta(self, scope) -> str:
+        if self._rutas is None:
+            self._rutas = {
+                getattr(ruta, "endpoint", None): ruta.path for ruta in scope["app"].routes
+            }
+        return self._rutas.get(scope.get("endpoint"), RUTA_DESCONOCIDA)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = Medicion(guardar_sentencias=settings.metricas_lenta_ms > 0)
+        token = _medicion_actual.set(medicion)
+        codigo = 500
+        formato_reporte, tamanio = None, 0
+
+        async def enviar(mensaje):
+            nonlocal codigo, formato_reporte, tamanio
+            if mensaje["type"] == "http.response.start":
+                codigo = mensaje["status"]
+                encabezados = MutableHeaders(scope=mensaje)
+                encabezados.append("Server-Timing", _server_timing(medicion, time.perf_counter() - medicion.inicio))
+                formato_reporte = FORMATOS_REPORTE.get(encabezados.get("content-type", "").split(";")[0])
+            elif formato_reporte is not None:
+                tamanio += len(mensaje.get("body", b""))  #tamaño enviado (comprimido si corresponde)
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicion_actual.reset(token)
+            segundos_total = time.perf_counter() - medicion.inicio
+            ruta = self._ruta(scope)
+            registrar(scope["method"], ruta, codigo, medicion, segundos_total)
+            if formato_reporte is not None and codigo == 200:
+                observar_reporte(ruta, formato_reporte, "peticion", segundos_total, tamanio)
+
+
+def registrar(metodo: str, ruta: str, codigo: int, medicion: Medicion, segundos_total: float):
+    """Suma la petición terminada a los histogramas de su ruta y la registra en el log si fue lenta"""
+    milisegundos = segundos_total * 1000
+    with _bloqueo:
+        estadisticas = _estadisticas.get((metodo, ruta))
+        if estadisticas is None:
+            estadisticas = _estadisticas[(metodo, ruta)] = EstadisticasRuta()
+        estadisticas.peticiones += 1
+        estadisticas.codigos[codigo] += 1
+        estadisticas.total_ms.observar(milisegundos)
+        estadisticas.sql_ms.observar(medicion.segundos_sql * 1000)
+        estadisticas.consultas.observar(medicion.consultas)
+        estadisticas.filas.observar(medicion.filas)
+        for nombre, segundos in medicion.fases.items():
+            estadisticas.fases_ms.setdefault(nombre, Histograma(LIMITES_MS)).observar(segundos * 1000)
+
+    if 0 < settings.metricas_lenta_ms <= milisegundos:
+        sentencias = "\n".join(f"  {segundos * 1000:8.1f} ms  {sentencia}" for segundos, sentencia in medicion.sentencias)
+        logger.warning(
+            "Petición lenta %s %s (%s): %.1f ms, %d consultas en %.1f ms, %d filas\n%s",
+            metodo, ruta, codigo, milisegundos, medicion.consultas, medicion.segundos_sql * 1000, medicion.filas, sentencias
+        )
+
+
+def resumen() -> list:
+    """Histogramas acumulados por ruta desde que inició la aplicación"""
+    with _bloqueo:
+        return [
+            {
+                "metodo": metodo,
+                "ruta": ruta,
+                "peticiones": estadisticas.peticiones,
+                "codigos": {str(codigo): cantidad for codigo, cantidad in sorted(estadisticas.codigos.items())},
+                "total_ms": estadisticas.total_ms.resumen(),
+                "sql_ms": estadisticas.sql_ms.resumen(),
+                "consultas": estadisticas.consultas.resumen(),
+                "filas": estadisticas.filas.resumen(),
+                "fases_ms": {nombre: histograma.resumen() for nombre, histograma in estadisticas.fases_ms.items()},
+            }
+            for (metodo, ruta), estadisticas in sorted(_estadisticas.items(), key=lambda item: (item[0][1], item[0][0]))
+        ]
+
+
+# ============ FORMATO PROMETHEUS ============
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(**etiquetas) -> str:
+    if not etiquetas:
+        return ""
+    return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in etiquetas.items()) + "}"
+
+
+def _lineas_histograma(nombre: str, histograma: Histograma, escala: float = 1, **etiquetas) -> list:
+    #Prometheus usa baldes acumulados (le = "menor o igual") y segundos en lugar de milisegundos (escala)
+    lineas, acumulado = [], 0
+    for limite, cantidad in zip(histograma.limites, histograma.baldes):
+        acumulado += cantidad
+        lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=f'{limite * escala:g}')} {acumulado}")
+    lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le='+Inf')} {histograma.cantidad}")
+    lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {histograma.suma * escala:g}")
+    lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {histograma.cantidad}")
+    return lineas
+
+
+def _estado_pool(motor) -> dict:
+    pool = motor.pool
+    estado = {}
+    for nombre, metodo in (("tamanio", "size"), ("conexiones_en_uso", "checkedout"), ("conexiones_libres", "checkedin"), ("desborde", "overflow")):
+        if hasattr(pool, metodo):
+            estado[nombre] = getattr(pool, metodo)()
+    return estado
+
+
+def prometheus(motor) -> str:
+    """Todas las métricas acumuladas en el formato de texto de Prometheus"""
+    lineas = []
+
+    def metrica(nombre: str, tipo: str, ayuda: str):
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+
+    with _bloqueo:
+        rutas = sorted(_estadisticas.items(), key=lambda item: (item[0][1], item[0][0]))
+        metrica("http_peticiones_total", "counter", "Peticiones HTTP por ruta y código de respuesta")
+        for (metodo, ruta), estadisticas in rutas:
+            for codigo, cantidad in sorted(estadisticas.codigos.items()):
+                lineas.append(f"http_peticiones_total{_etiquetas(metodo=metodo, ruta=ruta, codigo=codigo)} {cantidad}")
+
+        for nombre, atributo, escala, ayuda in (
+            ("http_duracion_segundos", "total_ms", 0.001, "Duración de las peticiones HTTP"),
+            ("http_sql_segundos", "sql_ms", 0.001, "Tiempo en SQL por petición"),
+            ("http_consultas_sql", "consultas", 1, "Consultas SQL por petición"),
+            ("http_filas_leidas", "filas", 1, "Filas leídas de la base por petición"),
+        ):
+            metrica(nombre, "histogram", ayuda)
+            for (metodo, ruta), estadisticas in rutas:
+                lineas += _lineas_histograma(nombre, getattr(estadisticas, atributo), escala, metodo=metodo, ruta=ruta)
+
+        metrica("http_fase_segundos", "histogram", "Duración de las fases medidas de cada petición (por ejemplo pdf)")
+        for (metodo, ruta), estadisticas in rutas:
+            for fase_nombre, histograma in sorted(estadisticas.fases_ms.items()):
+                lineas += _lineas_histograma("http_fase_segundos", histograma, 0.001, metodo=metodo, ruta=ruta, fase=fase_nombre)
+
+        reportes = sorted(_reportes.items())
+        metrica("reporte_duracion_segundos", "histogram", "Duración de la generación de reportes")
+        for (reporte, formato, origen), estadisticas in reportes:
+            lineas += _lineas_histograma("reporte_duracion_segundos", estadisticas.duracion_ms, 0.001, reporte=reporte, formato=formato, origen=origen)
+        metrica("reporte_tamanio_bytes", "histogram", "Tamaño de los reportes generados")
+        for (reporte, formato, origen), estadisticas in reportes:
+            lineas += _lineas_histograma("reporte_tamanio_bytes", estadisticas.tamanio_bytes, 1, reporte=reporte, formato=formato, origen=origen)
+
+        nombres_contadores = sorted({nombre for nombre, _ in _contadores})
+        for nombre_contador in nombres_contadores:
+            metrica(f"{nombre_contador}_total", "counter", DESCRIPCION_CONTADORES.get(nombre_contador, nombre_contador))
+            for (nombre, etiquetas), cantidad in sorted(_contadores.items()):
+                if nombre == nombre_contador:
+                    lineas.append(f"{nombre}_total{_etiquetas(**dict(etiquetas))} {cantidad}")
+
+    metrica("sqlalchemy_pool_conexiones", "gauge", "Estado del pool de conexiones de SQLAlchemy")
+    for estado, valor in _estado_pool(motor).items():
+        lineas.append(f"sqlalchemy_pool_conexiones{_etiquetas(estado=estado)} {valor}")
+
+    if _caches:
+        valores = {nombre: funcion() for nombre, funcion in sorted(_caches.items())}
+        metrica("cache_aciertos_total", "counter", "Aciertos de cada cache")
+        lineas += [f"cache_aciertos_total{_etiquetas(cache=nombre)} {aciertos}" for nombre, (aciertos, _) in valores.items()]
+        metrica("cache_fallos_total", "counter", "Fallos de cada cache")
+        lineas += [f"cache_fallos_total{_etiquetas(cache=nombre)} {fallos}" for nombre, (_, fallos) in valores.items()]
+        metrica("cache_proporcion_aciertos", "gauge", "Proporción de aciertos de cada cache (0 a 1)")
+        lineas += [
+            f"cache_proporcion_aciertos{_etiquetas(cache=nombre)} {aciertos / (aciertos + fallos) if aciertos + fallos else 0:g}"
+            for nombre, (aciertos, fallos) in valores.items()
+        ]
+
+    return "\n".join(lineas) + "\n"
+
+
+def instrumentar(app, motor):
+    """Registra el middleware y los eventos de SQLAlchemy (solo se llama con METRICAS_ACTIVAS)"""
+    app.add_middleware(MetricasMiddleware)
+    event.listen(motor, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(motor, "after_cursor_execute", _despues_de_ejecutar)
+    event.listen(motor, "do_connect", _usar_cursor_medido)
+    motor.dispose()  #las conexiones nuevas usan el cursor que cuenta filas
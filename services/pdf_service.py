@@ -1,16 +1,202 @@
 """
 Módulo para generar reportes en formato PDF usando la librería borb 2.1.5.
 Contiene funciones para crear PDFs de los diferentes tipos de reportes del sistema.
+
+Las tablas se dividen en bloques de hasta PDF_FILAS_POR_TABLA filas (con encabezados repetidos) para que
+ninguna supere el alto de una página: el layout agrega páginas a medida que el contenido las necesita.
+Cada documento tiene un máximo de PDF_MAX_FILAS filas, configurables en el archivo .env.
+
+Colores, tamaños y estilos de tabla se construyen una sola vez al importar el módulo; todas las tablas
+se arman con DocumentoReporte.agregar_tabla a partir de filas y un EstiloTabla.
 """
 from borb.pdf import TableCell
 from borb.pdf import Document, Page, SingleColumnLayout, Paragraph, PDF, FixedColumnWidthTable as Table
 from borb.pdf.canvas.color.color import HexColor
+from borb.pdf.canvas.geometry.rectangle import Rectangle
+from borb.pdf.canvas.font.simple_font.font_type_1 import StandardType1Font
 from borb.pdf.canvas.layout.layout_element import Alignment
+from copy import deepcopy
 from decimal import Decimal
 from io import BytesIO
 from datetime import date
+from itertools import islice
+from schemas.schemasTurno import settings
+from services.metricas_service import fase
+
+
+#=============== ESTILOS PRECONSTRUIDOS ===================
+#Se crean una unica vez al importar el modulo y se comparten entre todas las celdas de todos los reportes
+
+#Colores
+BLANCO = HexColor("#FFFFFF")
+NEGRO = HexColor("#000000")
+ROJO = HexColor("#FF0000")
+GRIS = HexColor("#7F8C8D")
+AZUL_OSCURO = HexColor("#2C3E50")
+AZUL_GRISACEO = HexColor("#34495E")
+AZUL_INTENSO = HexColor("#0713B8")
+AZUL = HexColor("#3498DB")
+VERDE = HexColor("#27AE60")
+VERDE_CLARO = HexColor("#71BE91")
+CELESTE = HexColor("#D9F7F7")
+ROJO_CLARO = HexColor("#E74C3C")
+ROJO_ESTADO = HexColor("#E01515")
+
+#Tamaños de letra y separaciones
+TAMANIO_TITULO = Decimal(20)
+TAMANIO_SUBTITULO = Decimal(16)
+TAMANIO_DESTACADO = Decimal(14)
+TAMANIO_TEXTO = Decimal(12)
+TAMANIO_NOTA = Decimal(10)
+PADDING_IZQUIERDO = Decimal(10)
+PADDING_VERTICAL = Decimal(5)
+SEPARACION_CHICA = Decimal(10)
+SEPARACION_GRANDE = Decimal(30)
+MARGEN_PAGINA = Decimal("0.1")  #proporción del ancho y del alto de la página
+
+#borb lee el archivo de metricas de la fuente (AFM) cada vez que un Paragraph recibe el nombre de la fuente,
+#por eso la fuente se carga una vez y cada documento trabaja con su propia copia (se agrega a los recursos de sus paginas)
+_FUENTE_BASE = StandardType1Font("Helvetica")
+
+
+class EstiloTabla:
+    """
+    Estilo de una tabla de reporte: colores del encabezado y de las celdas de datos.
+    Con padding=True las celdas llevan el fondo y la separacion en la celda completa (TableCell).
+    """
+    __slots__ = ("fondo_encabezado", "fondo_celda", "padding")
+
+    def __init__(self, fondo_encabezado: HexColor, fondo_celda: HexColor = None, padding: bool = False):
+        self.fondo_encabezado = fondo_encabezado
+        self.fondo_celda = fondo_celda
+        self.padding = padding
+
+#Estilos de tabla de los reportes
+ESTILO_TURNOS_POR_FECHA = EstiloTabla(AZUL)
+ESTILO_CANCELADOS_MES = EstiloTabla(ROJO_CLARO)
+ESTILO_TURNOS_POR_PERSONA = EstiloTabla(VERDE)
+ESTILO_CON_FONDO = EstiloTabla(VERDE_CLARO, CELESTE, padding=True)
 
 
+class DocumentoReporte:
+    """
+    Documento PDF que se arma de forma incremental.
+    Las tablas se agregan por bloques de filas, cada bloque se dibuja en la página actual y el layout
+    pasa a una nueva página cuando no hay lugar, así nunca se arma una tabla completa en memoria.
+    Un bloque que no entra en una página vacía se divide antes de agregarlo.
+    """
+
+    def __init__(self, filas_por_tabla: int = None, max_filas: int = None):
+        self.documento = Document()
+        pagina = Page()
+        self.documento.add_page(pagina)
+        #Los mismos márgenes que usa borb por defecto (10% de la página), explícitos para conocer el área de
+        #una página vacía y medir las tablas antes de agregarlas
+        ancho, alto = pagina.get_page_info().get_width(), pagina.get_page_info().get_height()
+        margen_horizontal, margen_vertical = ancho * MARGEN_PAGINA, alto * MARGEN_PAGINA
+        self.disenio = SingleColumnLayout(pagina, horizontal_margin=margen_horizontal, vertical_margin=margen_vertical)
+        self.area_pagina = Rectangle(margen_horizontal, margen_vertical, ancho - 2 * margen_horizontal, alto - 2 * margen_vertical)
+        self.fuente = deepcopy(_FUENTE_BASE)
+        self.filas_por_tabla = filas_por_tabla or settings.pdf_filas_por_tabla
+        self.filas_restantes = max_filas or settings.pdf_max_filas
+        self.filas_omitidas = 0
+
+    def agregar(self, elemento):
+        self.disenio.add(elemento)
+
+    def texto(self, contenido: str, tamanio: Decimal = TAMANIO_TEXTO, color: HexColor = NEGRO, **kwargs):
+        """Agrega un parrafo con la fuente del documento"""
+        self.disenio.add(Paragraph(contenido, font=self.fuente, font_size=tamanio, font_color=color, **kwargs))
+
+    def agregar_tabla(self, encabezados: list, filas, estilo: EstiloTabla):
+        """
+        Agrega una tabla dividida en bloques de filas.
+
+        Args:
+            encabezados: Lista de textos de las columnas (se repiten en cada bloque)
+            filas: Iterable de filas, cada fila es una lista de valores (se muestran con str)
+            estilo: Estilo preconstruido de la tabla
+        """
+        filas = iter(filas)
+        tamanio_bloque = self.filas_por_tabla
+        while True:
+            bloque = list(islice(filas, min(tamanio_bloque, max(self.filas_restantes, 0))))
+            if not bloque:
+                break
+            #Si el bloque tuvo que dividirse, los siguientes usan el tamaño que entro para no repetir el armado
+            tamanio_bloque = min(tamanio_bloque, self._dibujar_bloque(encabezados, bloque, estilo))
+            self.filas_restantes -= len(bloque)
+
+        #Si se alcanzo el limite de filas se cuentan las omitidas para avisarlo al final
+        self.filas_omitidas += sum(1 for _ in filas)
+
+    def _celda(self, texto: str, estilo: EstiloTabla, encabezado: bool):
+        fondo = estilo.fondo_encabezado if encabezado else estilo.fondo_celda
+        color = BLANCO if encabezado else NEGRO
+        if estilo.padding:
+            return TableCell(
+                Paragraph(texto, font=self.fuente, font_color=color),
+                background_color=fondo,
+                padding_left=PADDING_IZQUIERDO,
+                padding_top=PADDING_VERTICAL,
+                padding_bottom=PADDING_VERTICAL
+            )
+        return Paragraph(texto, font=self.fuente, font_color=color, background_color=fondo)
+
+    def _tabla(self, encabezados: list, bloque: list, estilo: EstiloTabla) -> Table:
+        tabla = Table(number_of_rows=len(bloque) + 1, number_of_columns=len(encabezados))
+        for encabezado in encabezados:
+            tabla.add(self._celda(encabezado, estilo, True))
+        for fila in bloque:
+            for valor in fila:
+                tabla.add(self._celda(str(valor), estilo, False))
+        return tabla
+
+    def _espacio_en_pagina_vacia(self, tabla: Table) -> Rectangle:
+        #Lugar que tiene la tabla al comienzo de una página: si no entra en la actual, el layout pasa a una nueva
+        return Rectangle(
+            self.area_pagina.get_x() + tabla.get_margin_left(),
+            self.area_pagina.get_y() + tabla.get_margin_bottom(),
+            self.area_pagina.get_width() - tabla.get_margin_left() - tabla.get_margin_right(),
+            self.area_pagina.get_height() - tabla.get_margin_top() - tabla.get_margin_bottom()
+        )
+
+    def _dibujar_bloque(self, encabezados: list, bloque: list, estilo: EstiloTabla) -> int:
+        """
+        Dibuja el bloque en una o más tablas que entran en una página y devuelve la mayor cantidad de filas
+        que entró en una sola tabla. La tabla se mide antes de agregarla al layout.
+        """
+        tabla = self._tabla(encabezados, bloque, estilo)
+        espacio = self._espacio_en_pagina_vacia(tabla)
+        alto = tabla.get_layout_box(espacio).get_height()
+        if alto <= espacio.get_height():
+            self.disenio.add(tabla)
+            return len(bloque)
+        if len(bloque) == 1:
+            raise ValueError("Una fila de la tabla no entra en una página del PDF")
+
+        #Las filas con textos largos ocupan más alto: el bloque se divide según el alto promedio de sus filas
+        #y cada parte se vuelve a medir
+        filas_por_tabla = max(1, min(len(bloque) - 1, int(len(bloque) * espacio.get_height() / alto)))
+        return max(
+            self._dibujar_bloque(encabezados, bloque[inicio:inicio + filas_por_tabla], estilo)
+            for inicio in range(0, len(bloque), filas_por_tabla)
+        )
+
+    def a_bytes(self) -> bytes:
+        if self.filas_omitidas:
+            self.texto(
+                f"Se alcanzó el límite de {settings.pdf_max_filas} filas por documento: "
+                f"se omitieron {self.filas_omitidas} filas. Utilice el reporte CSV para obtener el detalle completo.",
+                TAMANIO_NOTA,
+                ROJO_CLARO
+            )
+        buffer = BytesIO()
+        PDF.dumps(buffer, self.documento)
+        return buffer.getvalue()
+
+
+@fase("pdf")
 def generar_pdf_turnos_por_fecha(fecha: str, cantidad: int, turnos: list) -> bytes:
     """
     Genera un PDF con el reporte de turnos por fecha.
@@ -24,61 +210,51 @@ def generar_pdf_turnos_por_fecha(fecha: str, cantidad: int, turnos: list) -> byt
     Returns:
         bytes: Contenido del PDF generado
     """
-    doc = Document()
-    page = Page()
-    doc.add_page(page)
-    layout = SingleColumnLayout(page)
+    reporte = DocumentoReporte()
 
     # Título
-    layout.add(Paragraph(
+    reporte.texto(
         "Reporte de Turnos por Fecha",
-        font_size=Decimal(20),
-        font_color=HexColor("#2C3E50")
-    ))
+        tamanio=TAMANIO_TITULO,
+        color=AZUL_OSCURO
+    )
 
-    layout.add(Paragraph(f"Fecha: {fecha}", font_size=Decimal(14)))
-    layout.add(Paragraph(f"Total de turnos: {cantidad}", font_size=Decimal(12)))
-    layout.add(Paragraph(" "))  # Espacio
+    reporte.texto(f"Fecha: {fecha}", tamanio=TAMANIO_DESTACADO)
+    reporte.texto(f"Total de turnos: {cantidad}", tamanio=TAMANIO_TEXTO)
+    reporte.texto(" ")  # Espacio
 
     # Generar tabla con los datos
     if turnos:
         for persona_data in turnos:
+            if reporte.filas_restantes <= 0:
+                reporte.filas_omitidas += len(persona_data["turnos"])
+                continue
             persona = persona_data["persona"]
             turnos_persona = persona_data["turnos"]
 
             # Información de la persona
-            layout.add(Paragraph(
+            reporte.texto(
                 f"Persona: {persona['nombre']}",
-                font_size=Decimal(14),
-                font_color=HexColor("#34495E")
-            ))
-            layout.add(Paragraph(f"DNI: {persona['dni']}", font_size=Decimal(10)))
+                tamanio=TAMANIO_DESTACADO,
+                color=AZUL_GRISACEO
+            )
+            reporte.texto(f"DNI: {persona['dni']}", tamanio=TAMANIO_NOTA)
 
             # Tabla de turnos
-            tabla = Table(number_of_rows=len(turnos_persona) + 1, number_of_columns=3)
-
-            # Encabezados
-            tabla.add(Paragraph("ID", font_color=HexColor("#FFFFFF"), background_color=HexColor("#3498DB")))
-            tabla.add(Paragraph("Hora", font_color=HexColor("#FFFFFF"), background_color=HexColor("#3498DB")))
-            tabla.add(Paragraph("Estado", font_color=HexColor("#FFFFFF"), background_color=HexColor("#3498DB")))
-
-            # Datos
-            for turno in turnos_persona:
-                tabla.add(Paragraph(str(turno["id"])))
-                tabla.add(Paragraph(str(turno["hora"])))
-                tabla.add(Paragraph(turno["estado"]))
-
-            layout.add(tabla)
-            layout.add(Paragraph(" "))  # Espacio entre personas
+            reporte.agregar_tabla(
+                ["ID", "Hora", "Estado"],
+                ([turno["id"], turno["hora"], turno["estado"]] for turno in turnos_persona),
+                ESTILO_TURNOS_POR_FECHA
+            )
+            reporte.texto(" ")  # Espacio entre personas
     else:
-        layout.add(Paragraph("No se encontraron turnos para esta fecha.", font_size=Decimal(12)))
+        reporte.texto("No se encontraron turnos para esta fecha.", tamanio=TAMANIO_TEXTO)
 
     # Generar bytes del PDF
-    buffer = BytesIO()
-    PDF.dumps(buffer, doc)
-    return buffer.getvalue()
+    return reporte.a_bytes()
 
 
+@fase("pdf")
 def generar_pdf_turnos_cancelados_mes(reporte_data: dict) -> bytes:
     """
     Genera un PDF con el reporte de turnos cancelados del mes especificado.
@@ -90,60 +266,48 @@ def generar_pdf_turnos_cancelados_mes(reporte_data: dict) -> bytes:
     Returns:
         bytes: Contenido del PDF generado
     """
-    doc = Document()
-    page = Page()
-    doc.add_page(page)
-    layout = SingleColumnLayout(page)
+    reporte = DocumentoReporte()
 
     # Título
     mes = reporte_data.get('mes', 'N/A')
     anio = reporte_data.get('anio', 'N/A')
-    layout.add(Paragraph(
+    reporte.texto(
         f"Reporte de Turnos Cancelados - {mes} {anio}",
-        font_size=Decimal(20),
-        font_color=HexColor("#E74C3C")
-    ))
+        tamanio=TAMANIO_TITULO,
+        color=ROJO_CLARO
+    )
 
-    layout.add(Paragraph(" "))
+    reporte.texto(" ")
     total = reporte_data.get('total_cancelados', 0)
-    layout.add(Paragraph(f"Total de turnos cancelados: {total}", font_size=Decimal(14)))
-    layout.add(Paragraph(" "))
+    reporte.texto(f"Total de turnos cancelados: {total}", tamanio=TAMANIO_DESTACADO)
+    reporte.texto(" ")
 
     # Tabla con personas y turnos cancelados
     detalle = reporte_data.get('detalle_por_persona', [])
 
     if detalle and total > 0:
-        # Tabla con 4 columnas
-        tabla = Table(number_of_rows=len(detalle) + 1, number_of_columns=4)
-
-        # Encabezados
-        tabla.add(Paragraph("DNI", font_color=HexColor("#FFFFFF"), background_color=HexColor("#E74C3C")))
-        tabla.add(Paragraph("Nombre", font_color=HexColor("#FFFFFF"), background_color=HexColor("#E74C3C")))
-        tabla.add(Paragraph("Teléfono", font_color=HexColor("#FFFFFF"), background_color=HexColor("#E74C3C")))
-        tabla.add(Paragraph("Cant. Cancelados", font_color=HexColor("#FFFFFF"), background_color=HexColor("#E74C3C")))
-
-        # Datos
-        for item in detalle:
-            persona_info = item.get('persona', {})
-            tabla.add(Paragraph(persona_info.get('dni', 'N/A')))
-            tabla.add(Paragraph(persona_info.get('nombre', 'N/A')))
-            tabla.add(Paragraph(persona_info.get('telefono', 'N/A')))
-            tabla.add(Paragraph(str(persona_info.get('cantidad_de_cancelados', 0))))
-
-        layout.add(tabla)
+        filas = (
+            [
+                item.get('persona', {}).get('dni', 'N/A'),
+                item.get('persona', {}).get('nombre', 'N/A'),
+                item.get('persona', {}).get('telefono', 'N/A'),
+                item.get('persona', {}).get('cantidad_de_cancelados', 0)
+            ]
+            for item in detalle
+        )
+        reporte.agregar_tabla(["DNI", "Nombre", "Teléfono", "Cant. Cancelados"], filas, ESTILO_CANCELADOS_MES)
     else:
-        layout.add(Paragraph(
+        reporte.texto(
             f"No se encontraron turnos cancelados para {mes} de {anio}.",
-            font_size=Decimal(12),
-            font_color=HexColor("#7F8C8D")
-        ))
+            tamanio=TAMANIO_TEXTO,
+            color=GRIS
+        )
 
     # Generar bytes del PDF
-    buffer = BytesIO()
-    PDF.dumps(buffer, doc)
-    return buffer.getvalue()
+    return reporte.a_bytes()
 
 
+@fase("pdf")
 def generar_pdf_turnos_por_persona(persona_data: dict) -> bytes:
     """
     Genera un PDF con el reporte de turnos de una persona específica.
@@ -156,56 +320,41 @@ def generar_pdf_turnos_por_persona(persona_data: dict) -> bytes:
     Returns:
         bytes: Contenido del PDF generado
     """
-    doc = Document()
-    page = Page()
-    doc.add_page(page)
-    layout = SingleColumnLayout(page)
+    reporte = DocumentoReporte()
 
     # Título
-    layout.add(Paragraph(
+    reporte.texto(
         "Reporte de Turnos por Persona",
-        font_size=Decimal(20),
-        font_color=HexColor("#27AE60")
-    ))
+        tamanio=TAMANIO_TITULO,
+        color=VERDE
+    )
 
-    layout.add(Paragraph(" "))
+    reporte.texto(" ")
 
     # Información de la persona (PersonaOut es un objeto Pydantic, no un diccionario)
     persona = persona_data["persona"]
-    layout.add(Paragraph(f"Nombre: {persona.nombre}", font_size=Decimal(16)))
-    layout.add(Paragraph(f"DNI: {persona.dni}", font_size=Decimal(12)))
-    layout.add(Paragraph(f"Edad: {persona.edad} años", font_size=Decimal(12)))
-    layout.add(Paragraph(f"Total de turnos: {persona_data['total_turnos']}", font_size=Decimal(12)))
-    layout.add(Paragraph(" "))
+    reporte.texto(f"Nombre: {persona.nombre}", tamanio=TAMANIO_SUBTITULO)
+    reporte.texto(f"DNI: {persona.dni}", tamanio=TAMANIO_TEXTO)
+    reporte.texto(f"Edad: {persona.edad} años", tamanio=TAMANIO_TEXTO)
+    reporte.texto(f"Total de turnos: {persona_data['total_turnos']}", tamanio=TAMANIO_TEXTO)
+    reporte.texto(" ")
 
     # Tabla de turnos
     turnos = persona_data["turnos"]
 
     if turnos:
-        tabla = Table(number_of_rows=len(turnos) + 1, number_of_columns=4)
-
-        # Encabezados
-        tabla.add(Paragraph("ID", font_color=HexColor("#FFFFFF"), background_color=HexColor("#27AE60")))
-        tabla.add(Paragraph("Fecha", font_color=HexColor("#FFFFFF"), background_color=HexColor("#27AE60")))
-        tabla.add(Paragraph("Hora", font_color=HexColor("#FFFFFF"), background_color=HexColor("#27AE60")))
-        tabla.add(Paragraph("Estado", font_color=HexColor("#FFFFFF"), background_color=HexColor("#27AE60")))
-
-        # Datos
-        for turno in turnos:
-            tabla.add(Paragraph(str(turno["id"])))
-            tabla.add(Paragraph(str(turno["fecha"])))
-            tabla.add(Paragraph(str(turno["hora"])))
-            tabla.add(Paragraph(turno["estado"]))
-
-        layout.add(tabla)
+        reporte.agregar_tabla(
+            ["ID", "Fecha", "Hora", "Estado"],
+            ([turno["id"], turno["fecha"], turno["hora"], turno["estado"]] for turno in turnos),
+            ESTILO_TURNOS_POR_PERSONA
+        )
     else:
-        layout.add(Paragraph("Esta persona no tiene turnos registrados.", font_size=Decimal(12)))
+        reporte.texto("Esta persona no tiene turnos registrados.", tamanio=TAMANIO_TEXTO)
 
     # Generar bytes del PDF
-    buffer = BytesIO()
-    PDF.dumps(buffer, doc)
-    return buffer.getvalue()
+    return reporte.a_bytes()
 
+@fase("pdf")
 def generar_pdf_personas_con_min_cancelados(datos_persona: dict, min: int=5)-> bytes:
     """
     Genera un PDF con el reporte de turnos de una persona que tiene un min o mas turnos cancelados
@@ -215,56 +364,40 @@ def generar_pdf_personas_con_min_cancelados(datos_persona: dict, min: int=5)-> b
     Retorna:
         bytes: Contenido del PDF generado
     """
- 
-    documento = Document()
-    pagina = Page()
-    documento.add_page(pagina)
-    disenio = SingleColumnLayout(pagina)
+
+    reporte = DocumentoReporte()
 
     #Titulo del PDF
-    disenio.add(Paragraph(
+    reporte.texto(
         f"reporte de personas con un mínimo de {min} turnos cancelados".capitalize(),
-        font_size=Decimal(20),
-        font_color=HexColor("#27AE60")
-    ))
+        tamanio=TAMANIO_TITULO,
+        color=VERDE
+    )
     for personas_reportadas in datos_persona:
-
+        #Si ya se alcanzo el limite de filas no se agregan mas personas al documento
+        if reporte.filas_restantes <= 0:
+            reporte.filas_omitidas += len(personas_reportadas["turnos_cancelados_detalle"])
+            continue
 
         #Informacion de la persona
         persona = personas_reportadas["persona"]
-        disenio.add(Paragraph(f"Nombre: {persona.nombre}", font_size=Decimal(16)))
-        disenio.add(Paragraph(f"DNI: {persona.dni}", font_size=Decimal(12)))
-        disenio.add(Paragraph(f"Edad: {persona.edad} años", font_size=Decimal(12)))
-        disenio.add(Paragraph(f"Total de turnos cancelados: {personas_reportadas['turnos_cancelados_contador']}", font_size=Decimal(12), padding_bottom=Decimal(30), font_color=HexColor("#FF0000")))
+        reporte.texto(f"Nombre: {persona.nombre}", tamanio=TAMANIO_SUBTITULO)
+        reporte.texto(f"DNI: {persona.dni}", tamanio=TAMANIO_TEXTO)
+        reporte.texto(f"Edad: {persona.edad} años", tamanio=TAMANIO_TEXTO)
+        reporte.texto(f"Total de turnos cancelados: {personas_reportadas['turnos_cancelados_contador']}", tamanio=TAMANIO_TEXTO, padding_bottom=SEPARACION_GRANDE, color=ROJO)
 
         #Tabla de turnos
         turnos = personas_reportadas["turnos_cancelados_detalle"]
-        tabla = Table(number_of_rows=len(turnos)+1, number_of_columns=4)
-
-        #Encabezados
-        encabezados=["ID", "Fecha", "Hora", "Estado"]
-        for encabezado in encabezados:
-            celda_encabezado = TableCell(Paragraph(encabezado, font_color=HexColor("#FFFFFF")), background_color=HexColor("#71BE91"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-            tabla.add(celda_encabezado)
-        
-        #Datos del turno
-        for turno in turnos:
-            celda_id = TableCell(Paragraph(str(turno["id"])), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-            celda_fecha = TableCell(Paragraph(str(turno["fecha"])), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-            celda_hora = TableCell(Paragraph(str(turno["hora"])), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-            celda_estado = TableCell(Paragraph(str(turno["hora"])), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-            tabla.add(celda_id)
-            tabla.add(celda_fecha)
-            tabla.add(celda_hora)
-            tabla.add(celda_estado)
-
-        disenio.add(tabla)
+        reporte.agregar_tabla(
+            ["ID", "Fecha", "Hora", "Estado"],
+            ([turno["id"], turno["fecha"], turno["hora"], turno["estado"]] for turno in turnos),
+            ESTILO_CON_FONDO
+        )
 
     #Generar bytes del PDF
-    buffer = BytesIO()
-    PDF.dumps(buffer, documento)
-    return buffer.getvalue()
+    return reporte.a_bytes()
 
+@fase("pdf")
 def generar_pdf_turnos_confirmados_desde_hasta(datos_reporte: dict, fecha_desde: date, fecha_hasta: date, pag: int, por_pag: int):
     """
     Genera un PDF con el reporte de turnos confirmados entre dos fechas
@@ -274,49 +407,31 @@ def generar_pdf_turnos_confirmados_desde_hasta(datos_reporte: dict, fecha_desde:
     Retorna:
         bytes: Contenido del PDF generado
     """
-    documento = Document()
-    pagina = Page()
-    documento.add_page(pagina)
-    disenio = SingleColumnLayout(pagina)
+    reporte = DocumentoReporte()
 
     #Titulo del PDF
-    disenio.add(Paragraph(
+    reporte.texto(
         f"reporte de turnos confirmados entre {fecha_desde} y {fecha_hasta}".capitalize(),
-        font_size=Decimal(20),
-        font_color=HexColor("#0713B8")
-    ))
+        tamanio=TAMANIO_TITULO,
+        color=AZUL_INTENSO
+    )
     #Data de los registros encontrados
     cant_turnos = datos_reporte["total_registros"]
-    disenio.add(Paragraph(f"Total de turnos confirmados: {cant_turnos}", font_size=Decimal(12), padding_bottom=Decimal(10), font_color=HexColor("#FF0000")))
-    disenio.add(Paragraph(f"Se muestran {por_pag} de registros de la página {pag}",font_size=Decimal(10), padding_bottom=Decimal(30), font_color=HexColor("#000000")))
-
+    reporte.texto(f"Total de turnos confirmados: {cant_turnos}", tamanio=TAMANIO_TEXTO, padding_bottom=SEPARACION_CHICA, color=ROJO)
+    reporte.texto(f"Se muestran {por_pag} de registros de la página {pag}",tamanio=TAMANIO_NOTA, padding_bottom=SEPARACION_GRANDE, color=NEGRO)
 
     #Tabla de turnos
     turnos = datos_reporte["turnos"]
-    tabla = Table(number_of_rows=len(turnos)+1, number_of_columns=3)
-
-
-    #Encabezados
-    encabezados=["ID", "Fecha", "Hora"]
-    for encabezado in encabezados:
-            celda_encabezado = TableCell(Paragraph(encabezado, font_color=HexColor("#FFFFFF")), background_color=HexColor("#71BE91"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-            tabla.add(celda_encabezado)
-
-    for turno in turnos:
-        celda_id = TableCell(Paragraph(str(turno["id"])), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-        celda_fecha = TableCell(Paragraph(str(turno["fecha"])), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-        celda_hora = TableCell(Paragraph(str(turno["hora"])), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-        tabla.add(celda_id)
-        tabla.add(celda_fecha)
-        tabla.add(celda_hora)
-
-    disenio.add(tabla)
+    reporte.agregar_tabla(
+        ["ID", "Fecha", "Hora"],
+        ([turno["id"], turno["fecha"], turno["hora"]] for turno in turnos),
+        ESTILO_CON_FONDO
+    )
 
     #Generar bytes del PDF
-    buffer = BytesIO()
-    PDF.dumps(buffer, documento)
-    return buffer.getvalue()
+    return reporte.a_bytes()
 
+@fase("pdf")
 def generar_pdf_personas_estado(datos_reporte: dict, estado: bool):
     """
     Genera un PDF con el reporte de personas con estado habilitado (true) o deshabilitado (false)
@@ -326,45 +441,26 @@ def generar_pdf_personas_estado(datos_reporte: dict, estado: bool):
     Retorna:
         bytes: Contenido del PDF generado
     """
-    documento = Document()
-    pagina = Page()
-    documento.add_page(pagina)
-    disenio = SingleColumnLayout(pagina)
+    reporte = DocumentoReporte()
 
     #Titulo del PDF
-    disenio.add(Paragraph(
+    reporte.texto(
         f"reporte de personas con estado {'habilitado' if estado else 'deshabilitado'}".capitalize(),
-        font_size=Decimal(20),
-        font_color=HexColor("#0713B8")
-    ))
+        tamanio=TAMANIO_TITULO,
+        color=AZUL_INTENSO
+    )
     cant_registros = len(datos_reporte)
-    disenio.add(Paragraph(
-        f"cantidad de personas con estado {'habilitado' if estado else 'deshabilitado'}: {cant_registros}".capitalize(), 
-        font_size=Decimal(14), 
-        font_color=HexColor("#27AE60") if estado else HexColor("#E01515")
-    ))
-    #Tabla de personas
-    tabla = Table(number_of_rows=cant_registros+1, number_of_columns=4)
-
-    #Encabezados
-    encabezados=["Nombre", "DNI", "Telefono", "Edad"]
-    for encabezado in encabezados:
-        celda_encabezado = TableCell(Paragraph(encabezado, font_color=HexColor("#FFFFFF")), background_color=HexColor("#71BE91"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-        tabla.add(celda_encabezado)
-    #Datos por persona
-    for persona in datos_reporte:
-        celda_nombre = TableCell(Paragraph(str(persona.nombre)), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-        celda_dni = TableCell(Paragraph(str(persona.dni)), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-        celda_telefono = TableCell(Paragraph(str(persona.telefono)), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-        celda_edad = TableCell(Paragraph(str(persona.edad)), background_color=HexColor("#D9F7F7"), padding_left=Decimal(10), padding_top=Decimal(5), padding_bottom=Decimal(5))
-        tabla.add(celda_nombre)
-        tabla.add(celda_dni)
-        tabla.add(celda_telefono)
-        tabla.add(celda_edad)
-
-    disenio.add(tabla)
+    reporte.texto(
+        f"cantidad de personas con estado {'habilitado' if estado else 'deshabilitado'}: {cant_registros}".capitalize(),
+        tamanio=TAMANIO_DESTACADO,
+        color=VERDE if estado else ROJO_ESTADO
+    )
+    #Tabla de personas, dividida en bloques para que cada uno entre en una página
+    reporte.agregar_tabla(
+        ["Nombre", "DNI", "Telefono", "Edad"],
+        ([persona.nombre, persona.dni, persona.telefono, persona.edad] for persona in datos_reporte),
+        ESTILO_CON_FONDO
+    )
 
     #Generar bytes del PDF
-    buffer = BytesIO()
-    PDF.dumps(buffer, documento)
-    return buffer.getvalue()
\ No newline at end of file
+    return reporte.a_bytes()
@@ -0,0 +1,223 @@
+"""
+Módulo de perfilado de peticiones con cProfile (activable con PERFILADOR_ACTIVO).
+
+Un administrador activa el muestreo en tiempo de ejecución (PUT /admin/perfilador) indicando la proporción
+de peticiones a perfilar, un prefijo de ruta opcional (por ejemplo /reportes/pdf) y cuántos perfiles
+capturar. Cada perfil se guarda en PERFILADOR_DIRECTORIO y se descarga en formato pstats (para
+"python -m pstats", snakeviz, etc.) o como texto ordenado por tiempo acumulado. Se conservan los últimos
+PERFILADOR_MAXIMO_PERFILES.
+
+cProfile solo mide el hilo en el que se activa, así que cada petición muestreada se perfila en dos partes
+que después se unen: el hilo del event loop (ruteo, validación y serialización de la respuesta) y el hilo
+del pool donde corre el endpoint (crud y armado de PDF). En el hilo del event loop se mide tiempo de CPU
+del hilo, así la espera del event loop mientras trabaja el endpoint no aparece en el perfil. Se perfila una
+sola petición a la vez; mientras tanto el hilo del event loop también puede registrar trabajo de otras
+peticiones concurrentes. El envío de las descargas por streaming (compresión) ocurre después y no se incluye.
+
+Desde Python 3.12 cProfile usa sys.monitoring: solo puede haber un perfilador activo en todo el proceso
+(activar un segundo lanza ValueError) y ese perfilador registra todos los hilos. Por eso en 3.12+ se usa un
+único perfilador por petición, con tiempo de reloj, y los endpoints no se envuelven. El perfil incluye el
+trabajo de otras peticiones concurrentes de cualquier hilo y la espera del event loop mientras corre el endpoint.
+
+Si PERFILADOR_ACTIVO está desactivado no se registra el middleware ni se modifican los endpoints.
+"""
+import cProfile
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from io import StringIO
+from pathlib import Path
+
+from fastapi.routing import APIRoute
+
+from schemas.schemasTurno import settings
+
+
+FORMATOS = {"pstats": "application/octet-stream", "texto": "text/plain; charset=utf-8"}
+LINEAS_TEXTO = 80  #funciones que se muestran en el formato texto
+PERFILADOR_UNICO = sys.version_info >= (3, 12)  #cProfile sobre sys.monitoring: un perfilador para todos los hilos
+
+
+class PerfilNoEncontrado(Exception):
+    pass
+
+
+_perfil_actual = ContextVar("perfil_actual", default=None)
+
+_configuracion = None  #proporcion, ruta y perfiles restantes mientras el muestreo esta activo
+_perfiles = deque()  #datos de los perfiles guardados, del mas viejo al mas nuevo
+_bloqueo = threading.Lock()
+_perfilando = threading.Lock()  #una sola peticion perfilada a la vez
+
+
+def _directorio() -> Path:
+    directorio = Path(settings.perfilador_directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+# ============ CONFIGURACION DEL MUESTREO ============
+
+def configurar(proporcion: float, ruta: str = None, cantidad: int = 1) -> dict:
+    """Activa el muestreo: perfila esa proporción de peticiones (de la ruta indicada) hasta capturar cantidad perfiles"""
+    global _configuracion
+    with _bloqueo:
+        _configuracion = {"proporcion": proporcion, "ruta": ruta, "restantes": cantidad}
+    return estado()
+
+
+def desactivar() -> dict:
+    global _configuracion
+    with _bloqueo:
+        _configuracion = None
+    return estado()
+
+
+def estado() -> dict:
+    with _bloqueo:
+        return {
+            "muestreo": dict(_configuracion) if _configuracion is not None else None,
+            "perfiles": list(reversed(_perfiles)),
+        }
+
+
+def _reservar(path: str) -> bool:
+    #Decide si la peticion se perfila y descuenta un perfil de los restantes
+    global _configuracion
+    with _bloqueo:
+        if _configuracion is None:
+            return False
+        if _configuracion["ruta"] and not path.startswith(_configuracion["ruta"]):
+            return False
+        if random.random() >= _configuracion["proporcion"]:
+            return False
+        _configuracion["restantes"] -= 1
+        if _configuracion["restantes"] <= 0:
+            _configuracion = None
+        return True
+
+
+# ============ CAPTURA ============
+
+def _perfilar_endpoint(funcion):
+    #Perfila la llamada al endpoint en el hilo donde corre (el pool de hilos en los endpoints sincronicos)
+    @wraps(funcion)
+    def perfilada(*args, **kwargs):
+        perfiles = _perfil_actual.get()
+        if perfiles is None:
+            return funcion(*args, **kwargs)
+        perfilador = cProfile.Profile()
+        perfilador.enable()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            perfilador.disable()
+            perfiles.append(perfilador)
+    return perfilada
+
+
+def _guardar(scope, codigo: int, segundos: float, perfiles: list):
+    estadisticas = pstats.Stats(perfiles[0])
+    for perfil in perfiles[1:]:
+        estadisticas.add(perfil)
+    perfil_id = uuid.uuid4().hex
+    ruta_archivo = _directorio() / f"{perfil_id}.prof"
+    estadisticas.dump_stats(ruta_archivo)
+
+    endpoint = scope.get("endpoint")
+    datos = {
+        "id": perfil_id,
+        "metodo": scope["method"],
+        "url": scope["path"] + (f"?{scope['query_string'].decode()}" if scope.get("query_string") else ""),
+        "endpoint": getattr(endpoint, "__name__", None),
+        "codigo": codigo,
+        "duracion_ms": round(segundos * 1000, 1),
+        "creado": datetime.now(),
+    }
+    with _bloqueo:
+        _perfiles.append(datos)
+        while len(_perfiles) > settings.perfilador_maximo_perfiles:
+            viejo = _perfiles.popleft()
+            (_directorio() / f"{viejo['id']}.prof").unlink(missing_ok=True)
+
+
+class PerfiladorMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _configuracion is None or not _reservar(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        if not _perfilando.acquire(blocking=False):
+            #Ya hay una peticion perfilandose: esta no se cuenta
+            with _bloqueo:
+                if _configuracion is not None:
+                    _configuracion["restantes"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        perfiles = []
+        token = _perfil_actual.set(perfiles)
+        codigo = 500
+
+        async def enviar(mensaje):
+            nonlocal codigo
+            if mensaje["type"] == "http.response.start":
+                codigo = mensaje["status"]
+            await send(mensaje)
+
+        if PERFILADOR_UNICO:
+            perfilador = cProfile.Profile()
+        else:
+            perfilador = cProfile.Profile(time.thread_time)  #tiempo de CPU: la espera en select no suma
+        inicio = time.perf_counter()
+        perfilador.enable()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            perfilador.disable()
+            segundos = time.perf_counter() - inicio
+            _perfil_actual.reset(token)
+            _perfilando.release()
+            _guardar(scope, codigo, segundos, [perfilador] + perfiles)
+
+
+def instrumentar(app):
+    """Registra el middleware y envuelve los endpoints (solo se llama con PERFILADOR_ACTIVO, después de declarar las rutas)"""
+    app.add_middleware(PerfiladorMiddleware)
+    if PERFILADOR_UNICO:
+        #El perfilador del middleware ya registra el hilo del pool; un segundo perfilador lanzaría ValueError
+        return
+    for ruta in app.routes:
+        if isinstance(ruta, APIRoute):
+            #FastAPI llama a dependant.call en cada peticion, el endpoint registrado no cambia
+            ruta.dependant.call = _perfilar_endpoint(ruta.dependant.call)
+
+
+# ============ DESCARGA ============
+
+def obtener_perfil(perfil_id: str, formato: str):
+    """
+    Devuelve (contenido, nombre de archivo, tipo de contenido) del perfil en el formato pedido.
+    Lanza ValueError si el formato no existe y PerfilNoEncontrado si el perfil no existe o ya se descartó.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}. Formatos posibles: {', '.join(FORMATOS)}")
+    with _bloqueo:
+        if not any(datos["id"] == perfil_id for datos in _perfiles):
+            raise PerfilNoEncontrado(f"No existe el perfil {perfil_id} o ya fue descartado")
+    ruta_archivo = _directorio() / f"{perfil_id}.prof"
+
+    if formato == "pstats":
+        return ruta_archivo.read_bytes(), f"perfil_{perfil_id}.prof", FORMATOS[formato]
+    texto = StringIO()
+    pstats.Stats(str(ruta_archivo), stream=texto).sort_stats("cumulative").print_stats(LINEAS_TEXTO)
+    return texto.getvalue(), f"perfil_{perfil_id}.txt", FORMATOS[formato]
@@ -0,0 +1,72 @@
+"""
+Módulo de tareas programadas que corren dentro del proceso de la API
+(expiración de turnos pasados y reevaluación de personas habilitadas).
+
+Cada tarea es una función que recibe una sesión y devuelve la cantidad de filas que modificó. Se ejecuta
+al iniciar la aplicación y luego cada cierto intervalo, en un hilo aparte para no bloquear el event loop.
+Cada ejecución (inicio, fin, filas afectadas y error si lo hubo) se registra en la tabla ejecuciones.
+Las tareas se inician y se detienen con el ciclo de vida (lifespan) de la aplicación.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from starlette.concurrency import run_in_threadpool
+
+import crud.crudTareas as crudTareas
+import crud.crudTurno as crudTurno
+from database.database import SessionLocal
+from schemas.schemasTurno import settings
+
+
+logger = logging.getLogger("tareas")
+
+TAREA_EXPIRAR_TURNOS = "expirar_turnos"
+TAREA_REEVALUAR_HABILITADOS = "reevaluar_habilitados"
+
+
+def _tareas() -> dict:
+    #Nombre -> (funcion, minutos entre ejecuciones); un intervalo de 0 desactiva la tarea
+    return {
+        TAREA_EXPIRAR_TURNOS: (crudTurno.expirar_turnos_pasados, settings.expiracion_intervalo_minutos),
+        TAREA_REEVALUAR_HABILITADOS: (crudTurno.reevaluar_habilitados, settings.habilitacion_intervalo_minutos),
+    }
+
+
+def ejecutar_tarea(nombre: str, funcion):
+    """Ejecuta la tarea con su propia sesión y registra el resultado"""
+    inicio = datetime.now()
+    filas_afectadas, error = 0, None
+    with SessionLocal() as db:
+        try:
+            filas_afectadas = funcion(db)
+        except Exception as e:
+            db.rollback()
+            error = str(e)
+            logger.exception("La tarea %s falló", nombre)
+        return crudTareas.registrar_ejecucion(db, nombre, inicio, datetime.now(), filas_afectadas, error)
+
+
+async def _programar(nombre: str, funcion, intervalo_minutos: float):
+    while True:
+        try:
+            await run_in_threadpool(ejecutar_tarea, nombre, funcion)
+        except Exception:
+            #No se pudo registrar la ejecucion: queda en el log y se reintenta en el proximo intervalo
+            logger.exception("No se pudo ejecutar o registrar la tarea %s", nombre)
+        await asyncio.sleep(intervalo_minutos * 60)
+
+
+def iniciar() -> list:
+    """Lanza las tareas habilitadas en el event loop actual, devuelve la lista para detenerlas"""
+    return [
+        asyncio.create_task(_programar(nombre, funcion, intervalo), name=f"tarea-{nombre}")
+        for nombre, (funcion, intervalo) in _tareas().items()
+        if intervalo > 0
+    ]
+
+
+async def detener(tareas: list):
+    for tarea in tareas:
+        tarea.cancel()
+    await asyncio.gather(*tareas, return_exceptions=True)
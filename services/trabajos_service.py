@@ -0,0 +1,332 @@
+"""
+Módulo para generar reportes en segundo plano (trabajos).
+
+Los reportes grandes (CSV y PDF) se encolan en un pool de hilos local y el resultado se guarda en disco,
+en la carpeta REPORTES_DIRECTORIO junto con los datos del trabajo. El cliente consulta el estado del trabajo y descarga el archivo cuando
+está listo. Los trabajos y sus archivos se eliminan pasados REPORTES_TTL_MINUTOS desde que terminan.
+
+Cada trabajo abre su propia sesión de base de datos: la sesión del request ya está cerrada cuando el
+trabajo se ejecuta.
+"""
+import inspect
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Annotated, Optional
+
+from pydantic import ConfigDict, Field, ValidationError, create_model
+
+import crud.crud as crud
+import crud.crudTurno as crudTurno
+import services.metricas_service as metricas
+import services.pdf_service as pdf_generator
+from database.database import SessionLocal
+from schemas.schemasTurno import settings
+
+
+#Estados posibles de un trabajo
+TRABAJO_PENDIENTE = "pendiente"
+TRABAJO_PROCESANDO = "procesando"
+TRABAJO_COMPLETADO = "completado"
+TRABAJO_SIN_DATOS = "sin_datos"
+TRABAJO_ERROR = "error"
+
+TIPOS_ARCHIVO = {".csv": "text/csv", ".pdf": "application/pdf"}
+
+
+class TrabajoNoEncontrado(Exception):
+    pass
+
+
+def _csv(buffer):
+    #Los generadores de CSV devuelven un buffer de texto en memoria (o None si no hay datos)
+    return buffer.getvalue().encode("utf-8") if buffer is not None else None
+
+
+#Restricciones de los parámetros, las mismas que los Query de los endpoints de /reportes
+Dni = Annotated[str, Field(pattern=r"^\d{8}$")]
+Minimo = Annotated[int, Field(ge=1)]
+Pagina = Annotated[int, Field(ge=1)]
+PorPagina = Annotated[int, Field(ge=1, le=100)]
+
+
+# ============ GENERADORES DE CADA REPORTE ============
+#Cada generador recibe la sesión y los parámetros del reporte, y devuelve (contenido, nombre de archivo).
+#El contenido es None cuando no hay datos para el reporte. Las anotaciones de los parámetros definen
+#cómo se validan al crear el trabajo (ver _modelo_parametros).
+
+def _csv_turnos_por_fecha(db, fecha: date):
+    return _csv(crudTurno.generar_csv_turnos_por_fecha(db, fecha)), f"turnos_{fecha}.csv"
+
+def _csv_cancelados_por_mes(db):
+    return _csv(crudTurno.generar_csv_turnos_cancelados_mes(db)), "cancelados_mes_actual.csv"
+
+def _csv_turnos_por_persona(db, dni: Dni):
+    return _csv(crudTurno.generar_csv_turnos_por_persona(db, dni)), f"historial_turnos_{dni}.csv"
+
+def _csv_turnos_cancelados(db, min: int = 5):
+    return _csv(crudTurno.generar_csv_turnos_cancelados(db, min)), "turnos_cancelados.csv"
+
+def _csv_turnos_confirmados(db, fecha_desde: date, fecha_hasta: date, pag: Pagina = 1, por_pag: PorPagina = 5):
+    buffer = crudTurno.generar_csv_turnos_confirmados(db, fecha_desde, fecha_hasta, pag, por_pag)
+    return _csv(buffer), "turnos_confirmados.csv"
+
+def _csv_estado_personas(db, estado: bool):
+    return _csv(crud.generar_csv_estado_personas(db, estado)), "estado_personas.csv"
+
+def _csv_cancelados_por_mes_reformado(db):
+    return _csv(crudTurno.generar_csv_turnos_cancelados_reformado(db)), "reporte_cancelados_mes.csv"
+
+def _pdf_turnos_por_fecha(db, fecha: date):
+    turnos = crudTurno.get_turnos_por_fecha(db, fecha)
+    if not turnos:
+        return None, None
+    cantidad = sum(len(persona["turnos"]) for persona in turnos)
+    return pdf_generator.generar_pdf_turnos_por_fecha(fecha.isoformat(), cantidad, turnos), f"turnos_fecha_{fecha}.pdf"
+
+def _pdf_turnos_cancelados_por_mes(db, mes: Optional[int] = None, anio: Optional[int] = None):
+    reporte_data = crudTurno.get_turnos_cancelados_por_mes(db, mes, anio, incluir_detalle=False)
+    nombre = f"turnos_cancelados_{reporte_data['anio']}_{reporte_data['mes_numero']:02d}.pdf"
+    return pdf_generator.generar_pdf_turnos_cancelados_mes(reporte_data), nombre
+
+def _pdf_turnos_por_persona(db, dni: Dni):
+    resultado = crudTurno.get_turnos_por_dni(db, dni)
+    if resultado is None or resultado["total_turnos"] == 0:
+        return None, None
+    return pdf_generator.generar_pdf_turnos_por_persona(resultado), f"turnos_persona_{dni}.pdf"
+
+def _pdf_turnos_cancelados(db, min: Minimo = 5):
+    datos_reporte = crudTurno.get_personas_turnos_cancelados(db, min_cancelados=min)
+    if not datos_reporte:
+        return None, None
+    return pdf_generator.generar_pdf_personas_con_min_cancelados(datos_reporte, min), f"personas_con_{min}_turnos_cancelados.pdf"
+
+def _pdf_turnos_confirmados(db, fecha_desde: date, fecha_hasta: date, pag: Pagina = 1, por_pag: PorPagina = 100):
+    datos_reporte = crudTurno.get_turnos_confirmados_desde_hasta(fecha_desde, fecha_hasta, db, pag, por_pag)
+    if datos_reporte["total_registros"] == 0:
+        return None, None
+    pdf_reporte = pdf_generator.generar_pdf_turnos_confirmados_desde_hasta(datos_reporte, fecha_desde, fecha_hasta, pag, por_pag)
+    return pdf_reporte, "turnos_confirmado_entre_fechas.pdf"
+
+def _pdf_estado_personas(db, estado: bool):
+    datos_reporte = crud.get_personas_habilitadas_o_deshabilitadas(estado, db)
+    if not datos_reporte:
+        return None, None
+    return pdf_generator.generar_pdf_personas_estado(datos_reporte, estado), f"personas_con_estado_{estado}.pdf"
+
+
+#Tipos de reporte que se pueden encolar, con el mismo nombre que su endpoint en /reportes
+REPORTES = {
+    "csv/turnos-por-fecha": _csv_turnos_por_fecha,
+    "csv/cancelados-por-mes": _csv_cancelados_por_mes,
+    "csv/turnos-por-persona": _csv_turnos_por_persona,
+    "csv/turnos-cancelados": _csv_turnos_cancelados,
+    "csv/turnos-confirmados": _csv_turnos_confirmados,
+    "csv/estado-personas": _csv_estado_personas,
+    "csv/turnos-cancelados-por-mes-reformado": _csv_cancelados_por_mes_reformado,
+    "pdf/turnos-por-fecha": _pdf_turnos_por_fecha,
+    "pdf/turnos-cancelados-por-mes": _pdf_turnos_cancelados_por_mes,
+    "pdf/turnos-por-persona": _pdf_turnos_por_persona,
+    "pdf/turnos-cancelados": _pdf_turnos_cancelados,
+    "pdf/turnos-confirmados": _pdf_turnos_confirmados,
+    "pdf/estado-personas": _pdf_estado_personas,
+}
+
+
+def _modelo_parametros(tipo: str, generador):
+    #Modelo pydantic con los parámetros del generador (sin la sesión): convierte "false" en False,
+    #"2025-09-01" en date, etc. como los Query de los endpoints, y rechaza parámetros desconocidos
+    campos = {
+        nombre: (parametro.annotation, ... if parametro.default is inspect.Parameter.empty else parametro.default)
+        for nombre, parametro in list(inspect.signature(generador).parameters.items())[1:]
+    }
+    return create_model(f"Parametros_{tipo.replace('/', '_').replace('-', '_')}", __config__=ConfigDict(extra="forbid"), **campos)
+
+
+MODELOS_PARAMETROS = {tipo: _modelo_parametros(tipo, generador) for tipo, generador in REPORTES.items()}
+
+
+def _errores_validacion(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(parte) for parte in detalle['loc']) or 'parametros'}: {detalle['msg']}"
+        for detalle in error.errors()
+    )
+
+
+# ============ REGISTRO Y EJECUCION DE TRABAJOS ============
+#Los datos de cada trabajo se guardan en REPORTES_DIRECTORIO en un archivo <id>.json junto al archivo generado.
+#Así cualquier proceso de la API que comparta la carpeta (varios workers de uvicorn) puede informar el estado
+#y entregar el archivo, y los trabajos terminados sobreviven a un reinicio. Cada trabajo lo ejecuta el proceso
+#que recibió el pedido: si ese proceso se reinicia antes de terminarlo, el trabajo queda en su último estado
+#hasta vencer.
+
+CAMPOS_FECHA = ("creado", "finalizado", "vence")
+
+_bloqueo = threading.Lock()
+_pool = None
+
+
+def _directorio() -> Path:
+    directorio = Path(settings.reportes_directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def _obtener_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _bloqueo:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.reportes_workers, thread_name_prefix="reportes")
+        return _pool
+
+
+def _ruta_datos(trabajo_id: str) -> Path:
+    return _directorio() / f"{trabajo_id}.json"
+
+
+def _guardar(trabajo: dict):
+    #Se escribe en un temporal y se reemplaza el archivo: quien lo lee nunca ve un JSON a medio escribir
+    ruta = _ruta_datos(trabajo["id"])
+    temporal = ruta.with_name(f"{ruta.name}.tmp")
+    datos = {clave: valor.isoformat() if clave in CAMPOS_FECHA and valor is not None else valor for clave, valor in trabajo.items()}
+    temporal.write_text(json.dumps(datos, ensure_ascii=False), encoding="utf-8")
+    os.replace(temporal, ruta)
+
+
+def _leer(trabajo_id: str) -> dict:
+    #El id llega en la URL: solo se aceptan ids generados por crear_trabajo, nunca una ruta
+    if not re.fullmatch(r"[0-9a-f]{32}", trabajo_id):
+        raise TrabajoNoEncontrado(f"No existe el trabajo {trabajo_id} o ya venció")
+    try:
+        datos = json.loads(_ruta_datos(trabajo_id).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        raise TrabajoNoEncontrado(f"No existe el trabajo {trabajo_id} o ya venció")
+    for campo in CAMPOS_FECHA:
+        if datos[campo] is not None:
+            datos[campo] = datetime.fromisoformat(datos[campo])
+    return datos
+
+
+def _vista(trabajo: dict) -> dict:
+    #Copia del trabajo sin datos internos (ruta del archivo)
+    return {clave: valor for clave, valor in trabajo.items() if clave != "ruta"}
+
+
+def limpiar_vencidos():
+    """
+    Elimina los archivos de REPORTES_DIRECTORIO modificados hace más de REPORTES_TTL_MINUTOS: los datos
+    de los trabajos terminados (que no cambian después de finalizar) con sus archivos generados, y los
+    archivos que hayan quedado de trabajos interrumpidos.
+    """
+    limite = datetime.now() - timedelta(minutes=settings.reportes_ttl_minutos)
+    for archivo in _directorio().iterdir():
+        try:
+            if datetime.fromtimestamp(archivo.stat().st_mtime) < limite:
+                archivo.unlink(missing_ok=True)
+        except FileNotFoundError:
+            #Otro proceso lo eliminó entre el listado y la consulta
+            pass
+
+
+def crear_trabajo(tipo: str, parametros: dict) -> dict:
+    """
+    Valida el tipo de reporte y sus parámetros, y encola el trabajo.
+    Lanza ValueError si el tipo no existe o los parámetros no corresponden al reporte.
+    """
+    generador = REPORTES.get(tipo)
+    if generador is None:
+        raise ValueError(f"Tipo de reporte inválido: {tipo}. Tipos posibles: {', '.join(REPORTES)}")
+    try:
+        validados = MODELOS_PARAMETROS[tipo].model_validate(parametros)
+    except ValidationError as error:
+        raise ValueError(f"Parámetros inválidos para el reporte {tipo}: {_errores_validacion(error)}")
+    #El generador recibe los valores convertidos; el trabajo muestra los mismos valores en JSON
+    parametros = validados.model_dump(mode="json")
+
+    limpiar_vencidos()
+
+    trabajo_id = uuid.uuid4().hex
+    trabajo = {
+        "id": trabajo_id,
+        "tipo": tipo,
+        "parametros": parametros,
+        "estado": TRABAJO_PENDIENTE,
+        "progreso": 0,
+        "mensaje": None,
+        "nombre_archivo": None,
+        "tamanio_bytes": None,
+        "creado": datetime.now(),
+        "finalizado": None,
+        "vence": None,
+        "ruta": None,
+    }
+    _guardar(trabajo)
+    _obtener_pool().submit(_ejecutar, dict(trabajo), generador, validados.model_dump())
+    return _vista(trabajo)
+
+
+def _actualizar(trabajo: dict, **datos):
+    trabajo.update(datos)
+    _guardar(trabajo)
+
+
+def _ejecutar(trabajo: dict, generador, parametros: dict):
+    trabajo_id, tipo = trabajo["id"], trabajo["tipo"]
+    _actualizar(trabajo, estado=TRABAJO_PROCESANDO, progreso=10)
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        contenido, nombre_archivo = generador(db, **parametros)
+        if contenido is None:
+            datos = {"estado": TRABAJO_SIN_DATOS, "mensaje": "No se encontraron datos para el reporte"}
+        else:
+            #Mismo nombre de reporte que su endpoint, el formato es la primera parte del tipo (csv o pdf)
+            metricas.observar_reporte(f"/reportes/{tipo}", tipo.split("/")[0], "trabajo", time.perf_counter() - inicio, len(contenido))
+            _actualizar(trabajo, progreso=90)
+            ruta = _directorio() / f"{trabajo_id}{Path(nombre_archivo).suffix}"
+            ruta.write_bytes(contenido)
+            datos = {
+                "estado": TRABAJO_COMPLETADO,
+                "nombre_archivo": nombre_archivo,
+                "tamanio_bytes": len(contenido),
+                "ruta": str(ruta),
+            }
+    except Exception as error:
+        datos = {"estado": TRABAJO_ERROR, "mensaje": str(error)}
+    finally:
+        db.close()
+
+    finalizado = datetime.now()
+    _actualizar(
+        trabajo,
+        progreso=100,
+        finalizado=finalizado,
+        vence=finalizado + timedelta(minutes=settings.reportes_ttl_minutos),
+        **datos
+    )
+
+
+def obtener_trabajo(trabajo_id: str) -> dict:
+    limpiar_vencidos()
+    return _vista(_leer(trabajo_id))
+
+
+def obtener_archivo(trabajo_id: str):
+    """
+    Devuelve (ruta, nombre de archivo, tipo de contenido) del resultado del trabajo.
+    Lanza ValueError si el trabajo todavía no terminó o no generó un archivo.
+    """
+    limpiar_vencidos()
+    trabajo = _leer(trabajo_id)
+    if trabajo["estado"] != TRABAJO_COMPLETADO:
+        raise ValueError(f"El trabajo {trabajo_id} no tiene un archivo para descargar (estado: {trabajo['estado']})")
+    if not Path(trabajo["ruta"]).exists():
+        raise TrabajoNoEncontrado(f"No existe el trabajo {trabajo_id} o ya venció")
+    nombre_archivo = trabajo["nombre_archivo"]
+    return trabajo["ruta"], nombre_archivo, TIPOS_ARCHIVO[Path(nombre_archivo).suffix]
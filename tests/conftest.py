@@ -0,0 +1,78 @@
+"""
+Configuración común de los tests.
+
+Las variables de entorno se fijan antes de importar la aplicación: la configuración (schemasTurno.settings)
+y el engine de la base se crean al importar. Los tests usan una base SQLite propia en una carpeta temporal,
+así que personas.db no se modifica, y corren con CONSULTAS_MODO=fallar para que una ruta que supera su
+presupuesto de consultas haga fallar el test.
+"""
+import itertools
+import os
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+DIRECTORIO_TESTS = tempfile.mkdtemp(prefix="turnos_tests_")
+ADMIN_TOKEN = "token-de-tests"
+
+_dnis = itertools.count(90000000)  #DNI de cada persona creada por los tests (la base es nueva en cada corrida)
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{DIRECTORIO_TESTS}/tests.db",
+    CONSULTAS_MODO="fallar",
+    ADMIN_TOKEN=ADMIN_TOKEN,
+    METRICAS_ACTIVAS="true",
+    REPORTES_DIRECTORIO=os.path.join(DIRECTORIO_TESTS, "reportes"),
+    #Sin tareas programadas: los tests no dependen de cuándo corren
+    EXPIRACION_INTERVALO_MINUTOS="0",
+    HABILITACION_INTERVALO_MINUTOS="0",
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main.main import app  # noqa: E402
+from services.calendario_service import PLANTILLAS  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    #El lifespan aplica las migraciones y carga los datos de prueba
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+@pytest.fixture(scope="session")
+def admin():
+    return {"X-Admin-Token": ADMIN_TOKEN}
+
+
+@pytest.fixture
+def fecha_con_atencion():
+    """Devuelve una función que da la n-ésima fecha futura (desde mañana) con atención según la agenda"""
+    def obtener(numero: int = 0) -> date:
+        fecha = date.today() + timedelta(days=1)
+        while True:
+            if PLANTILLAS[fecha.weekday()] is not None:
+                if numero == 0:
+                    return fecha
+                numero -= 1
+            fecha += timedelta(days=1)
+    return obtener
+
+
+@pytest.fixture
+def crear_persona(cliente):
+    """Devuelve una función que crea una persona habilitada con un DNI propio y devuelve sus datos"""
+    def crear() -> dict:
+        numero = next(_dnis)
+        respuesta = cliente.post("/personas", json={
+            "nombre": "Persona De Tests",
+            "email": f"tests{numero}@correo.com",
+            "dni": str(numero),
+            "telefono": "1123456789",
+            "fecha_nacimiento": "1990-05-15",
+        })
+        assert respuesta.status_code == 200, respuesta.text
+        return respuesta.json()
+    return crear
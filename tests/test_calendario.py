@@ -0,0 +1,85 @@
+"""
+Agenda de atención: grilla de horarios precalculada (schemasTurno.GrillaHorarios), plantillas por día de la
+semana y cierres por fecha (services/calendario_service.py), y su uso al reservar.
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+import services.calendario_service as calendario
+from schemas.schemasTurno import FranjaHoraria, GrillaHorarios, grilla_horarios, settings
+
+
+def test_grilla_desde_franja():
+    grilla = GrillaHorarios.desde_franja("09:00", "10:15", 30)
+    assert grilla.minutos == (540, 570, 600)  #el fin se incluye solo si cae en un horario
+    assert grilla.textos == ("09:00", "09:30", "10:00")
+    assert grilla.indice(time(9, 30)) == 1
+    assert grilla.indice(time(9, 15)) is None
+    assert grilla.contiene(time(10, 0)) and not grilla.contiene(time(10, 30))
+
+
+@pytest.mark.parametrize("inicio, fin, intervalo", [("9", "10:00", 30), ("09:00", "10:00", 0), ("10:00", "09:00", 30)])
+def test_franja_invalida(inicio, fin, intervalo):
+    with pytest.raises(ValueError):
+        GrillaHorarios.desde_franja(inicio, fin, intervalo)
+
+
+def test_reserva_fuera_de_la_grilla(cliente, fecha_con_atencion, crear_persona):
+    persona = crear_persona()
+    fecha = fecha_con_atencion(9).isoformat()
+    for hora, mensaje in (("09:15", "coincidir con un horario"), ("07:00", "debe ser entre")):
+        respuesta = cliente.post("/turnos", json={"fecha": fecha, "hora": hora, "persona_id": persona["id"]})
+        assert respuesta.status_code == 400
+        assert mensaje in respuesta.json()["detail"]
+
+
+def test_plantillas_por_dia_de_la_semana(monkeypatch):
+    monkeypatch.setattr(settings, "horarios_por_dia", {5: FranjaHoraria(inicio="09:00", fin="12:30")})
+    monkeypatch.setattr(settings, "dias_sin_atencion", [0, 6])
+    plantillas = calendario._plantillas()
+
+    assert plantillas[0] is None and plantillas[6] is None
+    assert plantillas[1] is grilla_horarios  #los demás días usan la franja general
+    assert (plantillas[5].textos[0], plantillas[5].textos[-1]) == ("09:00", "12:30")
+    assert plantillas[5].minutos[1] - plantillas[5].minutos[0] == settings.intervalo
+
+
+def test_motivo_de_los_dias_sin_atencion():
+    domingo = date(2030, 1, 6)
+    assert domingo.weekday() == 6 and calendario.PLANTILLAS[6] is None
+    assert calendario._resolver(domingo, {}).motivo == "No se atiende los días domingo"
+    #Un cierre tiene prioridad sobre la plantilla del día
+    lunes = domingo + timedelta(days=1)
+    dia = calendario._resolver(lunes, {lunes: "Feriado"})
+    assert dia.grilla is None and dia.motivo.endswith("no se atiende: Feriado")
+
+
+def test_cierre_de_una_fecha(cliente, admin, fecha_con_atencion, crear_persona):
+    fecha = fecha_con_atencion(10)
+    persona = crear_persona()
+
+    def reservar(hora: str):
+        return cliente.post("/turnos", json={"fecha": fecha.isoformat(), "hora": hora, "persona_id": persona["id"]})
+
+    assert reservar("09:00").status_code == 201
+    respuesta = cliente.post("/admin/cierres", headers=admin, json={"fecha": fecha.isoformat(), "motivo": "Feriado de prueba"})
+    assert respuesta.status_code == 201, respuesta.text
+    assert respuesta.json()["turnos_activos"] == 1  #el turno ya reservado no se modifica
+    assert cliente.post("/admin/cierres", headers=admin, json={"fecha": fecha.isoformat(), "motivo": "Otro"}).status_code == 409
+
+    #Con la fecha cerrada no se reserva ni se ofrece disponibilidad
+    rechazada = reservar("09:30")
+    assert rechazada.status_code == 400 and "Feriado de prueba" in rechazada.json()["detail"]
+    assert cliente.get("/turnos/turnos-disponibles", params={"fecha": fecha.isoformat()}).status_code == 404
+    rango = cliente.get("/turnos/disponibilidad", params={"fecha_desde": fecha.isoformat(), "fecha_hasta": fecha.isoformat()}).json()
+    assert rango == []
+    cierres = cliente.get("/admin/cierres", headers=admin, params={"fecha_desde": fecha.isoformat(), "fecha_hasta": fecha.isoformat()}).json()
+    assert [cierre["motivo"] for cierre in cierres] == ["Feriado de prueba"]
+    exportados = cliente.get("/admin/export", headers=admin, params={"formato": "csv", "tablas": "cierres"}).text
+    assert f"{fecha.isoformat()};Feriado de prueba;" in exportados
+
+    #Al reabrirla se vuelve a reservar
+    assert cliente.delete(f"/admin/cierres/{fecha.isoformat()}", headers=admin).status_code == 200
+    assert reservar("09:30").status_code == 201
+    assert cliente.delete(f"/admin/cierres/{fecha.isoformat()}", headers=admin).status_code == 404
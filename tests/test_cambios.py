@@ -0,0 +1,53 @@
+"""
+Log de cambios (/cambios): cada alta, modificación o baja de turnos y personas queda registrada en orden
+y se lee por lotes siguiendo ultimo_seq mientras hay_mas sea verdadero.
+"""
+import json
+
+import crud.crudCambios as crudCambios
+import services.cambios_service as cambios_service
+from database.database import SessionLocal
+
+
+def _ultimo_seq() -> int:
+    with SessionLocal() as db:
+        return crudCambios.get_ultimo_seq(db)
+
+
+def test_paginacion_con_hay_mas(cliente, fecha_con_atencion, crear_persona):
+    desde = _ultimo_seq()
+    persona = crear_persona()
+    respuesta = cliente.post("/turnos", json={"fecha": fecha_con_atencion(8).isoformat(), "hora": "11:30", "persona_id": persona["id"]})
+    turno_id = respuesta.json()["id"]
+    assert cliente.put(f"/turnos/{turno_id}/cancelar").status_code == 200
+    assert cliente.delete(f"/turnos/{turno_id}").status_code == 200
+
+    paginas = []
+    while True:
+        lote = cliente.get("/cambios", params={"desde": desde, "limite": 2}).json()
+        paginas.append(lote)
+        desde = lote["ultimo_seq"]
+        if not lote["hay_mas"]:
+            break
+
+    assert [len(lote["cambios"]) for lote in paginas] == [2, 2]
+    recibidos = [cambio for lote in paginas for cambio in lote["cambios"]]
+    assert [cambio["seq"] for cambio in recibidos] == sorted(cambio["seq"] for cambio in recibidos)
+    assert [(cambio["entidad"], cambio["operacion"]) for cambio in recibidos] == [
+        ("persona", "alta"), ("turno", "alta"), ("turno", "modificacion"), ("turno", "baja"),
+    ]
+    assert recibidos[2]["datos"]["estado"] == "Cancelado"
+    assert recibidos[3]["datos"] is None and recibidos[3]["entidad_id"] == turno_id
+
+    #Sin cambios nuevos: lote vacío y el mismo ultimo_seq para la siguiente consulta
+    assert cliente.get("/cambios", params={"desde": desde}).json() == {"cambios": [], "ultimo_seq": desde, "hay_mas": False}
+
+
+def test_evento_del_stream_con_su_numero_de_secuencia(cliente, crear_persona):
+    desde = _ultimo_seq()
+    persona = crear_persona()
+    cambio, = cliente.get("/cambios", params={"desde": desde}).json()["cambios"]
+
+    lineas = cambios_service.formatear_evento(cambio).strip().splitlines()
+    assert lineas[:2] == [f"id: {cambio['seq']}", "event: cambio"]
+    assert json.loads(lineas[2].removeprefix("data: "))["datos"]["dni"] == persona["dni"]
@@ -0,0 +1,73 @@
+"""
+Resumen de cancelaciones por mes (crudTurno.registrar_transicion_cancelacion): el reporte sin detalle lee el
+resumen que se actualiza en cada cambio de estado, y debe coincidir con el que recorre los turnos cancelados.
+"""
+import crud.crudTurno as crudTurno
+import models.models as models
+from database.database import SessionLocal
+
+
+def _fechas_en_meses_distintos(fecha_con_atencion):
+    """Dos fechas con atención en meses distintos"""
+    primera = fecha_con_atencion(0)
+    numero = 1
+    while (segunda := fecha_con_atencion(numero)).month == primera.month:
+        numero += 1
+    return primera, segunda
+
+
+def _cancelados_por_persona(fecha, incluir_detalle: bool) -> tuple:
+    with SessionLocal() as db:
+        reporte = crudTurno.get_turnos_cancelados_por_mes(db, fecha.month, fecha.year, incluir_detalle=incluir_detalle)
+    por_persona = {
+        item["persona"]["id"]: item["persona"]["cantidad_de_cancelados"] for item in reporte["detalle_por_persona"]
+    }
+    return reporte["total_cancelados"], por_persona
+
+
+def _reservar(cliente, persona: dict, fecha, hora: str) -> int:
+    respuesta = cliente.post("/turnos", json={"fecha": fecha.isoformat(), "hora": hora, "persona_id": persona["id"]})
+    assert respuesta.status_code == 201, respuesta.text
+    return respuesta.json()["id"]
+
+
+def test_resumen_igual_al_recorrido_de_turnos(cliente, fecha_con_atencion, crear_persona):
+    fecha, otro_mes = _fechas_en_meses_distintos(fecha_con_atencion)
+    persona, otra_persona, persona_eliminada = crear_persona(), crear_persona(), crear_persona()
+
+    #Alta y cancelación
+    assert cliente.put(f"/turnos/{_reservar(cliente, persona, fecha, '13:00')}/cancelar").status_code == 200
+    assert cliente.put(f"/turnos/{_reservar(cliente, otra_persona, fecha, '13:30')}/cancelar").status_code == 200
+    #Reprogramado a otro mes y cancelado en la misma modificación: cuenta en el mes nuevo
+    turno = _reservar(cliente, persona, fecha, "14:00")
+    respuesta = cliente.put(f"/turnos/{turno}", json={"fecha": otro_mes.isoformat(), "hora": "14:00", "estado": "Cancelado"})
+    assert respuesta.status_code == 200, respuesta.text
+    #Turno cancelado que se elimina: deja de contar
+    eliminado = _reservar(cliente, otra_persona, otro_mes, "14:30")
+    assert cliente.put(f"/turnos/{eliminado}/cancelar").status_code == 200
+    assert cliente.delete(f"/turnos/{eliminado}").status_code == 200
+    #Persona que se elimina después de cancelar su turno (y de eliminarlo, como exige la baja de personas)
+    cancelado = _reservar(cliente, persona_eliminada, otro_mes, "15:00")
+    assert cliente.put(f"/turnos/{cancelado}/cancelar").status_code == 200
+    assert cliente.delete(f"/turnos/{cancelado}").status_code == 200
+    assert cliente.delete(f"/personas/{persona_eliminada['id']}").status_code == 200
+
+    for mes in (fecha, otro_mes):
+        assert _cancelados_por_persona(mes, incluir_detalle=False) == _cancelados_por_persona(mes, incluir_detalle=True)
+
+    _, del_mes = _cancelados_por_persona(fecha, incluir_detalle=False)
+    _, del_otro_mes = _cancelados_por_persona(otro_mes, incluir_detalle=False)
+    assert del_mes[persona["id"]] == 1 and del_mes[otra_persona["id"]] == 1
+    assert del_otro_mes.get(persona["id"]) == 1
+    assert otra_persona["id"] not in del_otro_mes
+    assert persona_eliminada["id"] not in del_otro_mes
+    with SessionLocal() as db:
+        assert db.query(models.ResumenCancelacion).filter(models.ResumenCancelacion.persona_id == persona_eliminada["id"]).count() == 0
+
+
+def test_reconstruir_resumen_da_el_mismo_reporte(cliente, fecha_con_atencion):
+    fecha, otro_mes = _fechas_en_meses_distintos(fecha_con_atencion)
+    antes = [_cancelados_por_persona(mes, incluir_detalle=False) for mes in (fecha, otro_mes)]
+    with SessionLocal() as db:
+        crudTurno.reconstruir_resumen_cancelaciones(db)
+    assert [_cancelados_por_persona(mes, incluir_detalle=False) for mes in (fecha, otro_mes)] == antes
@@ -0,0 +1,88 @@
+"""
+Compresión de las descargas y de las respuestas JSON grandes (services/compresion_service.py).
+"""
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.testclient import TestClient
+
+import services.compresion_service as compresion
+
+
+@pytest.mark.parametrize("accept_encoding, compress, esperada", [
+    (None, None, None),
+    ("gzip", None, "gzip"),
+    ("gzip, zstd", None, compresion.CODIFICACIONES[0]),  #misma prioridad: se prefiere zstd si está disponible
+    ("zstd;q=0.5, gzip", None, "gzip"),
+    ("*", None, compresion.CODIFICACIONES[0]),
+    ("gzip;q=0, br", None, None),
+    ("gzip", "none", None),  #compress tiene prioridad sobre el encabezado
+    (None, "GZIP", "gzip"),
+])
+def test_elegir_codificacion(accept_encoding, compress, esperada):
+    assert compresion.elegir_codificacion(accept_encoding, compress) == esperada
+
+
+def test_compresion_no_soportada():
+    with pytest.raises(ValueError, match="no soportada"):
+        compresion.elegir_codificacion("gzip", "br")
+
+
+def test_comprimir_por_fragmentos():
+    contenido = b"fecha;hora;estado\n" * 20000  #mas de un fragmento
+    comprimido = b"".join(compresion.comprimir(compresion.fragmentos(contenido), "gzip"))
+    assert gzip.decompress(comprimido) == contenido
+    assert b"".join(compresion.comprimir(compresion.fragmentos(contenido), None)) == contenido
+
+
+@pytest.fixture(scope="module")
+def cliente_json():
+    app = FastAPI()
+    app.add_middleware(compresion.GZipJSONMiddleware, minimum_size=1000)
+
+    @app.get("/grande")
+    def grande():
+        return [{"id": numero, "estado": "Cancelado"} for numero in range(200)]
+
+    @app.get("/chica")
+    def chica():
+        return {"id": 1}
+
+    @app.get("/texto")
+    def texto():
+        return PlainTextResponse("x" * 5000)
+
+    @app.get("/descarga")
+    def descarga():
+        #Las descargas ya vienen comprimidas con su propia codificación
+        return JSONResponse({"datos": "x" * 5000}, headers={"Content-Encoding": "identity"})
+
+    return TestClient(app)
+
+
+def test_middleware_solo_comprime_json_grandes(cliente_json):
+    encabezados = {"Accept-Encoding": "gzip"}
+    grande = cliente_json.get("/grande", headers=encabezados)
+    assert grande.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in grande.headers["vary"]
+    assert int(grande.headers["content-length"]) < len(grande.content)
+    assert len(grande.json()) == 200
+
+    assert "content-encoding" not in cliente_json.get("/chica", headers=encabezados).headers
+    assert "content-encoding" not in cliente_json.get("/texto", headers=encabezados).headers
+    assert cliente_json.get("/descarga", headers=encabezados).headers["content-encoding"] == "identity"
+    #Sin gzip en Accept-Encoding no se comprime
+    assert "content-encoding" not in cliente_json.get("/grande", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_descarga_de_reporte_comprimida(cliente):
+    url = "/reportes/csv/estado-personas"
+    sin_comprimir = cliente.get(url, params={"estado": "true", "compress": "none"})
+    comprimida = cliente.get(url, params={"estado": "true", "compress": "gzip"})
+    assert sin_comprimir.status_code == comprimida.status_code == 200
+    assert "content-encoding" not in sin_comprimir.headers
+    assert comprimida.headers["content-encoding"] == "gzip"
+    assert comprimida.content == sin_comprimir.content  #httpx la descomprime
+    assert cliente.get(url, params={"estado": "true", "compress": "br"}).status_code == 400
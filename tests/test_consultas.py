@@ -0,0 +1,158 @@
+"""
+Presupuesto de consultas de las rutas (services/consultas_service.py).
+
+Con CONSULTAS_MODO=fallar (ver conftest.py) el middleware lanza ConsultasExcedidas cuando una petición supera
+el presupuesto de su ruta o repite una sentencia (N+1), y el TestClient la propaga. El test recorre todas las
+rutas de la aplicación con datos reales; si se agrega una ruta sin sumarla acá, falla test_todas_las_rutas_cubiertas.
+"""
+import time
+from collections import Counter
+
+from fastapi.routing import APIRoute
+
+from main.main import app
+import services.consultas_service as consultas
+
+#Streams SSE: quedan abiertos y se declaran sin presupuesto (@presupuesto_consultas(None))
+RUTAS_SIN_REVISAR = {"/turnos/turnos-disponibles/stream", "/cambios/stream"}
+
+
+def _peticiones(cliente, admin, fecha_con_atencion, crear_persona):
+    """Lista de (método, ruta del endpoint, url, argumentos de la petición) en el orden en que se ejecutan"""
+    persona = crear_persona()
+    otra_persona = crear_persona()
+    fecha = fecha_con_atencion(0).isoformat()
+    fecha_siguiente = fecha_con_atencion(1).isoformat()
+    hasta = fecha_con_atencion(5).isoformat()
+    dni = persona["dni"]
+    turno = {}  #id del turno que se crea durante el recorrido
+
+    def turno_id():
+        return turno["id"]
+
+    def crear_turno(respuesta):
+        turno["id"] = respuesta.json()["id"]
+
+    peticiones = [
+        ("POST", "/personas", "/personas", {"json": {
+            "nombre": "Otra Persona", "email": "otra.persona@correo.com", "dni": "89999999",
+            "telefono": "1123456780", "fecha_nacimiento": "1985-01-01",
+        }}),
+        ("GET", "/personas", "/personas", {}),
+        ("GET", "/personas/search", "/personas/search?nombre=Persona&page=1", {}),
+        ("GET", "/personas/{persona_id}", f"/personas/{persona['id']}", {}),
+        ("PUT", "/personas/{persona_id}", f"/personas/{otra_persona['id']}", {"json": {
+            "nombre": "Otra Persona Modificada", "email": otra_persona["email"], "dni": otra_persona["dni"],
+            "telefono": otra_persona["telefono"], "fecha_nacimiento": otra_persona["fecha_nacimiento"],
+        }}),
+        ("POST", "/turnos", "/turnos", {"json": {"fecha": fecha, "hora": "10:00", "persona_id": persona["id"]}, "despues": crear_turno}),
+        ("GET", "/turnos", "/turnos", {}),
+        ("GET", "/turnos/{turno_id}", lambda: f"/turnos/{turno_id()}", {}),
+        ("PUT", "/turnos/{turno_id}", lambda: f"/turnos/{turno_id()}", {"json": {"fecha": fecha_siguiente, "hora": "11:00"}}),
+        ("PUT", "/turnos/{turno_id}/confirmar", lambda: f"/turnos/{turno_id()}/confirmar", {}),
+        ("GET", "/turnos/turnos-disponibles", f"/turnos/turnos-disponibles?fecha={fecha}", {}),
+        ("GET", "/turnos/disponibilidad", f"/turnos/disponibilidad?fecha_desde={fecha}&fecha_hasta={hasta}", {}),
+        ("GET", "/recursos", "/recursos", {}),
+        ("GET", "/recursos/disponibilidad", f"/recursos/disponibilidad?fecha_desde={fecha}&fecha_hasta={hasta}", {}),
+        ("GET", "/reportes/turnos-por-persona", f"/reportes/turnos-por-persona?dni={dni}", {}),
+        ("GET", "/reportes/turnos-cancelados", "/reportes/turnos-cancelados?min=5", {}),
+        ("GET", "/reportes/turnos-por-fecha", f"/reportes/turnos-por-fecha?fecha={fecha_siguiente}", {}),
+        ("GET", "/reportes/turnos-cancelados-por-mes", "/reportes/turnos-cancelados-por-mes", {}),
+        ("GET", "/reportes/turnos-confirmados", f"/reportes/turnos-confirmados?fecha_desde={fecha}&fecha_hasta={hasta}", {}),
+        ("GET", "/reportes/estado-personas/{estado}", "/reportes/estado-personas/true", {}),
+        ("GET", "/reportes/turnos-cancelados-por-mes-reformado", "/reportes/turnos-cancelados-por-mes-reformado", {}),
+        ("GET", "/reportes/csv/turnos-por-fecha", f"/reportes/csv/turnos-por-fecha?fecha={fecha_siguiente}", {}),
+        ("GET", "/reportes/csv/cancelados-por-mes", "/reportes/csv/cancelados-por-mes", {}),
+        ("GET", "/reportes/csv/turnos-por-persona", f"/reportes/csv/turnos-por-persona?dni={dni}", {}),
+        ("GET", "/reportes/csv/turnos-cancelados", "/reportes/csv/turnos-cancelados?min=1", {}),
+        ("GET", "/reportes/csv/turnos-confirmados", f"/reportes/csv/turnos-confirmados?fecha_desde={fecha}&fecha_hasta={hasta}", {}),
+        ("GET", "/reportes/csv/estado-personas", "/reportes/csv/estado-personas?estado=true", {}),
+        ("GET", "/reportes/csv/turnos-cancelados-por-mes-reformado", "/reportes/csv/turnos-cancelados-por-mes-reformado", {}),
+        ("GET", "/reportes/pdf/turnos-por-fecha", f"/reportes/pdf/turnos-por-fecha?fecha={fecha_siguiente}", {}),
+        ("GET", "/reportes/pdf/turnos-cancelados-por-mes", "/reportes/pdf/turnos-cancelados-por-mes", {}),
+        ("GET", "/reportes/pdf/turnos-por-persona", f"/reportes/pdf/turnos-por-persona?dni={dni}", {}),
+        ("GET", "/reportes/pdf/turnos-cancelados", "/reportes/pdf/turnos-cancelados?min=1", {}),
+        ("GET", "/reportes/pdf/turnos-confirmados", f"/reportes/pdf/turnos-confirmados?fecha_desde={fecha}&fecha_hasta={hasta}", {}),
+        ("GET", "/reportes/pdf/estado-personas", "/reportes/pdf/estado-personas?estado=true", {}),
+        ("GET", "/reportes/export/turnos-por-fecha", f"/reportes/export/turnos-por-fecha?fecha={fecha_siguiente}&formato=csv", {}),
+        ("GET", "/reportes/export/turnos-cancelados-por-mes", "/reportes/export/turnos-cancelados-por-mes?formato=csv", {}),
+        ("GET", "/reportes/export/turnos-por-persona", f"/reportes/export/turnos-por-persona?dni={dni}&formato=csv", {}),
+        ("GET", "/reportes/export/turnos-cancelados", "/reportes/export/turnos-cancelados?min=1&formato=csv", {}),
+        ("GET", "/reportes/export/turnos-confirmados", f"/reportes/export/turnos-confirmados?fecha_desde={fecha}&fecha_hasta={hasta}&formato=csv", {}),
+        ("GET", "/reportes/export/estado-personas", "/reportes/export/estado-personas?estado=true&formato=csv", {}),
+        ("GET", "/cambios", "/cambios?desde=0", {}),
+        ("POST", "/admin/recursos", "/admin/recursos", {"headers": admin, "json": {"nombre": "Consultorio de tests", "tipo": "consultorio", "capacidad": 2}}),
+        ("PUT", "/admin/recursos/{recurso_id}", "/admin/recursos/1", {"headers": admin, "json": {"capacidad": 1}}),
+        ("POST", "/admin/cierres", "/admin/cierres", {"headers": admin, "json": {"fecha": hasta, "motivo": "Feriado de tests"}}),
+        ("GET", "/admin/cierres", "/admin/cierres", {"headers": admin}),
+        ("DELETE", "/admin/cierres/{fecha}", f"/admin/cierres/{hasta}", {"headers": admin}),
+        ("GET", "/admin/tareas", "/admin/tareas", {"headers": admin}),
+        ("GET", "/admin/export", "/admin/export?formato=ndjson", {"headers": admin}),
+        ("GET", "/metrics", "/metrics", {}),
+        ("GET", "/admin/metricas", "/admin/metricas", {"headers": admin}),
+        #Sin PERFILADOR_ACTIVO estas rutas responden 404, pero igual pasan por el middleware
+        ("GET", "/admin/perfilador", "/admin/perfilador", {"headers": admin}),
+        ("PUT", "/admin/perfilador", "/admin/perfilador", {"headers": admin, "json": {"proporcion": 1, "cantidad": 1}}),
+        ("DELETE", "/admin/perfilador", "/admin/perfilador", {"headers": admin}),
+        ("GET", "/admin/perfilador/{perfil_id}", "/admin/perfilador/inexistente", {"headers": admin}),
+        ("PUT", "/turnos/{turno_id}/cancelar", lambda: f"/turnos/{turno_id()}/cancelar", {}),
+        ("DELETE", "/turnos/{turno_id}", lambda: f"/turnos/{turno_id()}", {}),
+        ("DELETE", "/personas/{persona_id}", f"/personas/{otra_persona['id']}", {}),
+    ]
+    return peticiones
+
+
+def _rutas_revisadas():
+    return {
+        (metodo, ruta.path)
+        for ruta in app.routes if isinstance(ruta, APIRoute) and ruta.path not in RUTAS_SIN_REVISAR
+        for metodo in ruta.methods
+    }
+
+
+def test_todas_las_rutas_cubiertas(cliente, admin, fecha_con_atencion):
+    persona = {"id": 1, "dni": "12345678", "email": "", "telefono": "", "fecha_nacimiento": ""}
+    cubiertas = {(metodo, ruta) for metodo, ruta, _, _ in _peticiones(cliente, admin, fecha_con_atencion, lambda: persona)}
+    cubiertas |= {("POST", "/reportes/jobs"), ("GET", "/reportes/jobs/{trabajo_id}"), ("GET", "/reportes/jobs/{trabajo_id}/download")}
+    assert _rutas_revisadas() - cubiertas == set()
+
+
+def test_rutas_dentro_del_presupuesto(cliente, admin, fecha_con_atencion, crear_persona):
+    #Una ruta fuera de presupuesto lanza ConsultasExcedidas dentro de la petición y el test falla
+    for metodo, ruta, url, argumentos in _peticiones(cliente, admin, fecha_con_atencion, crear_persona):
+        argumentos = dict(argumentos)
+        despues = argumentos.pop("despues", None)
+        respuesta = cliente.request(metodo, url() if callable(url) else url, **argumentos)
+        assert respuesta.status_code < 500, f"{metodo} {ruta}: {respuesta.status_code} {respuesta.text[:200]}"
+        if despues:
+            despues(respuesta)
+
+
+def test_trabajos_de_reportes_dentro_del_presupuesto(cliente):
+    respuesta = cliente.post("/reportes/jobs", json={"tipo": "csv/estado-personas", "parametros": {"estado": "true"}})
+    assert respuesta.status_code == 202, respuesta.text
+    trabajo_id = respuesta.json()["id"]
+    for _ in range(100):
+        estado = cliente.get(f"/reportes/jobs/{trabajo_id}").json()["estado"]
+        if estado not in ("pendiente", "procesando"):
+            break
+        time.sleep(0.05)
+    assert estado == "completado"
+    assert cliente.get(f"/reportes/jobs/{trabajo_id}/download").status_code == 200
+
+
+def test_parametros_invalidos_de_trabajos(cliente):
+    respuesta = cliente.post("/reportes/jobs", json={"tipo": "csv/estado-personas", "parametros": {"estado": "quizas"}})
+    assert respuesta.status_code == 400
+
+
+def test_revisar_detecta_exceso_y_repeticiones():
+    @consultas.presupuesto_consultas(2, repeticiones=3)
+    def endpoint():
+        pass
+
+    assert consultas.revisar(endpoint, Counter({"SELECT 1": 1, "SELECT 2": 1})) == []
+    problemas = consultas.revisar(endpoint, Counter({"SELECT * FROM turnos WHERE id = ?": 4}))
+    assert len(problemas) == 2
+    assert problemas[0].startswith("4 consultas")
+    assert "repetida 4 veces" in problemas[1]
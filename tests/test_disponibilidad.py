@@ -0,0 +1,73 @@
+"""
+Stream de disponibilidad (services/disponibilidad_service.py). El generador se recorre directamente:
+el TestClient espera a que termine la respuesta y el stream queda abierto mientras el cliente siga conectado.
+"""
+import asyncio
+import json
+from datetime import date, timedelta
+
+import services.disponibilidad_service as disponibilidad
+import services.eventos_service as eventos
+
+
+class Conexion:
+    """Request que sigue conectado durante las primeras `consultas` llamadas a is_disconnected"""
+    def __init__(self, consultas: int = 1):
+        self.consultas = consultas
+
+    async def is_disconnected(self) -> bool:
+        self.consultas -= 1
+        return self.consultas < 0
+
+
+def _leer(texto: str) -> tuple:
+    lineas = dict(linea.split(": ", 1) for linea in texto.strip().splitlines())
+    return lineas["event"], json.loads(lineas["data"])
+
+
+def _eventos(fecha, recurso_id: int = 1, request=None, durante_el_stream=None) -> list:
+    """Eventos del stream; durante_el_stream se ejecuta después del evento inicial"""
+    async def recorrer():
+        recibidos = []
+        async for texto in disponibilidad.stream_disponibilidad(request or Conexion(), fecha, recurso_id):
+            recibidos.append(_leer(texto))
+            if durante_el_stream and len(recibidos) == 1:
+                await asyncio.to_thread(durante_el_stream)
+                eventos.publicar(eventos.tema_disponibilidad(fecha))
+        return recibidos
+    return asyncio.run(recorrer())
+
+
+def test_estado_inicial_y_cambio(cliente, fecha_con_atencion, crear_persona):
+    fecha = fecha_con_atencion(7)
+    persona = crear_persona()
+
+    def reservar():
+        respuesta = cliente.post("/turnos", json={"fecha": fecha.isoformat(), "hora": "09:00", "persona_id": persona["id"]})
+        assert respuesta.status_code == 201, respuesta.text
+
+    (nombre, estado), (cambio, datos) = _eventos(fecha, durante_el_stream=reservar)
+    assert nombre == "estado" and "09:00" in estado["horarios_disponibles"]
+    assert cambio == "cambio"
+    assert datos["ocupados"] == ["09:00"] and datos["liberados"] == []
+
+
+def test_fin_cuando_el_recurso_se_desactiva(cliente, admin, fecha_con_atencion):
+    recurso = cliente.post("/admin/recursos", headers=admin, json={"nombre": "Consultorio stream", "tipo": "consultorio", "capacidad": 1}).json()
+
+    def desactivar():
+        assert cliente.put(f"/admin/recursos/{recurso['id']}", headers=admin, json={"activo": False}).status_code == 200
+
+    recibidos = _eventos(fecha_con_atencion(7), recurso["id"], durante_el_stream=desactivar)
+    assert [nombre for nombre, _ in recibidos] == ["estado", "fin"]
+    assert recibidos[-1][1]["motivo"]
+
+
+def test_fin_con_recurso_inexistente_o_fecha_pasada(cliente, fecha_con_atencion):
+    (nombre, datos), = _eventos(fecha_con_atencion(7), 999)
+    assert nombre == "fin" and datos["recurso_id"] == 999
+
+    (nombre, datos), = _eventos(date.today() - timedelta(days=1))
+    assert nombre == "fin" and "anterior" in datos["motivo"]
+    #Las suscripciones se liberan al terminar
+    assert eventos.cantidad_suscriptores(eventos.tema_disponibilidad(date.today() - timedelta(days=1))) == 0
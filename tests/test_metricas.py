@@ -0,0 +1,45 @@
+"""
+Métricas por petición (services/metricas_service.py): consultas y tiempo en SQL medidos con los eventos de
+SQLAlchemy y publicados en el encabezado Server-Timing.
+"""
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+import services.metricas_service as metricas
+
+
+@pytest.fixture
+def motor_medido():
+    motor = create_engine("sqlite://")
+    event.listen(motor, "before_cursor_execute", metricas._antes_de_ejecutar)
+    event.listen(motor, "after_cursor_execute", metricas._despues_de_ejecutar)
+    yield motor
+    motor.dispose()
+
+
+def test_sentencia_fallida_no_deja_mediciones_pendientes(motor_medido):
+    medicion = metricas.Medicion(guardar_sentencias=True)
+    token = metricas._medicion_actual.set(medicion)
+    try:
+        with motor_medido.connect() as conexion:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conexion.execute(text("SELECT * FROM tabla_inexistente"))
+            conexion.execute(text("SELECT 1"))
+            assert "inicio_consultas" not in conexion.info
+    finally:
+        metricas._medicion_actual.reset(token)
+
+    #Solo se mide la sentencia que terminó, con su propio tiempo
+    assert medicion.consultas == 1
+    assert [sentencia for _, sentencia in medicion.sentencias] == ["SELECT 1"]
+    assert 0 <= medicion.segundos_sql < 1
+
+
+def test_server_timing_de_la_peticion(cliente):
+    respuesta = cliente.get("/recursos")
+    assert respuesta.status_code == 200
+    partes = respuesta.headers["server-timing"].split(", ")
+    assert partes[0].startswith("total;dur=")
+    assert partes[1].startswith("sql;dur=") and "1 consultas" in partes[1]
@@ -0,0 +1,141 @@
+"""
+Migraciones del esquema (database/migraciones.py) sobre bases SQLite propias de cada test.
+"""
+import sqlite3
+from datetime import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import models.models as models
+from database import migraciones
+
+#Base creada con create_all antes de existir las migraciones: estado como texto y hora como TIME
+ESQUEMA_ANTERIOR = """
+CREATE TABLE personas (
+    id INTEGER NOT NULL, nombre VARCHAR NOT NULL, email VARCHAR NOT NULL, dni VARCHAR NOT NULL,
+    telefono VARCHAR NOT NULL, fecha_nacimiento DATE NOT NULL, habilitado BOOLEAN NOT NULL, PRIMARY KEY (id)
+);
+CREATE TABLE turnos (
+    id INTEGER NOT NULL, fecha DATE NOT NULL, hora TIME NOT NULL, estado VARCHAR NOT NULL,
+    persona_id INTEGER NOT NULL, PRIMARY KEY (id), FOREIGN KEY(persona_id) REFERENCES personas (id)
+);
+INSERT INTO personas VALUES (1, 'Ana', 'ana@correo.com', '11111111', '1123456789', '1990-01-01', 1);
+INSERT INTO personas VALUES (2, 'Luis', 'luis@correo.com', '22222222', '1123456780', '1985-06-10', 1);
+INSERT INTO turnos VALUES (1, '2025-09-20', '10:00:00.000000', 'Asistido', 1);
+INSERT INTO turnos VALUES (2, '2025-09-20', '10:00:00.000000', 'Cancelado', 2);
+INSERT INTO turnos VALUES (3, '2025-09-20', '10:00:00.000000', 'pendiente', 2);
+INSERT INTO turnos VALUES (4, '2025-09-22', '14:30:00.000000', 'Confirmado', 1);
+"""
+
+
+def _base_anterior(ruta):
+    with sqlite3.connect(ruta) as conexion:
+        conexion.executescript(ESQUEMA_ANTERIOR)
+    return create_engine(f"sqlite:///{ruta}")
+
+
+def _esquema(ruta) -> dict:
+    #Columnas (nombre, tipo, not null, default) e índices (nombre, único) de cada tabla
+    with sqlite3.connect(ruta) as conexion:
+        tablas = [fila[0] for fila in conexion.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name != 'schema_version'"
+        )]
+        return {
+            tabla: (
+                sorted(fila[1:5] for fila in conexion.execute(f"PRAGMA table_info({tabla})")),
+                sorted(fila[1:3] for fila in conexion.execute(f"PRAGMA index_list({tabla})")),
+            )
+            for tabla in tablas
+        }
+
+
+def test_base_nueva_en_la_ultima_version(tmp_path):
+    motor = create_engine(f"sqlite:///{tmp_path / 'nueva.db'}")
+    assert migraciones.migrar(motor) == [migraciones.VERSION_ACTUAL]
+    assert migraciones.migrar(motor) == []
+    with motor.connect() as conexion:
+        assert migraciones.version_actual(conexion) == migraciones.VERSION_ACTUAL
+
+
+def test_migra_una_base_anterior_a_las_migraciones(tmp_path):
+    ruta = tmp_path / "anterior.db"
+    assert migraciones.migrar(_base_anterior(ruta)) == list(range(1, migraciones.VERSION_ACTUAL + 1))
+
+    with sqlite3.connect(ruta) as conexion:
+        indices = {fila[1] for fila in conexion.execute("PRAGMA index_list(turnos)")}
+        assert conexion.execute("SELECT count(*) FROM turnos").fetchone() == (4,)
+    assert {"ix_turnos_persona_estado_fecha", "ix_turnos_fecha_hora"} <= indices
+
+
+def test_base_migrada_igual_a_base_nueva(tmp_path):
+    migraciones.migrar(_base_anterior(tmp_path / "anterior.db"))
+    migraciones.migrar(create_engine(f"sqlite:///{tmp_path / 'nueva.db'}"))
+    assert _esquema(tmp_path / "anterior.db") == _esquema(tmp_path / "nueva.db")
+
+
+def test_estados_como_codigos(tmp_path):
+    ruta = tmp_path / "anterior.db"
+    migraciones.migrar(_base_anterior(ruta))
+    with sqlite3.connect(ruta) as conexion:
+        estados = [fila[0] for fila in conexion.execute("SELECT estado FROM turnos ORDER BY id")]
+    #Los textos se convierten sin importar mayúsculas ('pendiente')
+    assert estados == [int(estado) for estado in (
+        models.EstadoTurno.ESTADO_ASISTIDO, models.EstadoTurno.ESTADO_CANCELADO,
+        models.EstadoTurno.ESTADO_PENDIENTE, models.EstadoTurno.ESTADO_CONFIRMADO,
+    )]
+
+
+
+def test_horas_como_minutos_del_dia(tmp_path):
+    ruta = tmp_path / "anterior.db"
+    motor = _base_anterior(ruta)
+    migraciones.migrar(motor)
+    with sqlite3.connect(ruta) as conexion:
+        assert [fila[0] for fila in conexion.execute("SELECT hora FROM turnos ORDER BY id")] == [600, 600, 600, 870]
+    #El modelo las sigue leyendo como hora
+    with Session(motor) as db:
+        assert db.get(models.Turno, 4).hora == time(14, 30)
+
+
+def test_turnos_anteriores_en_el_recurso_general(tmp_path):
+    ruta = tmp_path / "anterior.db"
+    migraciones.migrar(_base_anterior(ruta))
+    with sqlite3.connect(ruta) as conexion:
+        turnos = conexion.execute("SELECT id, recurso_id, lugar FROM turnos ORDER BY id").fetchall()
+        recursos = conexion.execute("SELECT id, capacidad FROM recursos").fetchall()
+    assert turnos == [
+        (1, models.RECURSO_GENERAL, 1),
+        (2, models.RECURSO_GENERAL, 1),  #los cancelados no ocupan lugar
+        (3, models.RECURSO_GENERAL, 2),  #turno activo repetido en el horario: segundo lugar
+        (4, models.RECURSO_GENERAL, 1),
+    ]
+    assert recursos == [(models.RECURSO_GENERAL, 1)]
+
+def test_textos_de_estado_con_comillas(tmp_path, monkeypatch):
+    ruta = tmp_path / "comillas.db"
+    motor = _base_anterior(ruta)
+    with sqlite3.connect(ruta) as conexion:
+        conexion.execute("UPDATE turnos SET estado = 'Asistió d''hoy' WHERE id = 1")
+    codigos = dict(models.CODIGOS_ESTADO)
+    del codigos["asistido"]
+    codigos["asistió d'hoy"] = models.EstadoTurno.ESTADO_ASISTIDO
+    monkeypatch.setattr(models, "CODIGOS_ESTADO", codigos)
+
+    migraciones.migrar(motor)
+
+    with sqlite3.connect(ruta) as conexion:
+        assert conexion.execute("SELECT estado FROM turnos WHERE id = 1").fetchone() == (int(models.EstadoTurno.ESTADO_ASISTIDO),)
+
+
+def test_estado_desconocido_deja_la_base_en_la_version_anterior(tmp_path):
+    ruta = tmp_path / "desconocido.db"
+    motor = _base_anterior(ruta)
+    with sqlite3.connect(ruta) as conexion:
+        conexion.execute("UPDATE turnos SET estado = 'Perdido' WHERE id = 4")
+
+    with pytest.raises(ValueError, match="Perdido"):
+        migraciones.migrar(motor)
+    with motor.connect() as conexion:
+        assert migraciones.version_actual(conexion) == 2
@@ -0,0 +1,125 @@
+"""
+Capacidad de los recursos: cada turno no cancelado ocupa un lugar de su horario y el índice único parcial
+ux_turnos_recurso_fecha_hora_lugar impide ocupar el mismo lugar dos veces, aunque dos reservas lleguen juntas.
+"""
+import json
+
+import pytest
+
+import crud.crudTurno as crudTurno
+
+CONFLICTOS_ALTA = 'turnos_conflictos_total{operacion="alta"}'
+
+
+def _reservar(cliente, persona: dict, fecha, hora: str, **datos):
+    return cliente.post("/turnos", json={"fecha": fecha.isoformat(), "hora": hora, "persona_id": persona["id"], **datos})
+
+
+def _conflictos(cliente) -> float:
+    for linea in cliente.get("/metrics").text.splitlines():
+        if linea.startswith(CONFLICTOS_ALTA):
+            return float(linea.split()[-1])
+    return 0.0
+
+
+def _horarios_disponibles(cliente, fecha, recurso_id: int = 1) -> dict:
+    """Horarios disponibles de la fecha según cada endpoint de disponibilidad"""
+    parametros = {"fecha_desde": fecha.isoformat(), "fecha_hasta": fecha.isoformat(), "recurso_id": recurso_id}
+    por_fecha = cliente.get("/turnos/turnos-disponibles", params={"fecha": fecha.isoformat(), "recurso_id": recurso_id})
+    rango = cliente.get("/turnos/disponibilidad", params=parametros).json()
+    recursos = cliente.get("/recursos/disponibilidad", params=parametros).json()
+    return {
+        "turnos-disponibles": set(por_fecha.json()["horarios_disponibles"]) if por_fecha.status_code == 200 else set(),
+        "disponibilidad": set(rango[0]["horarios_disponibles"]),
+        "recursos": {horario["hora"] for horario in recursos[0]["horarios"]},
+    }
+
+
+@pytest.fixture
+def consultorio(cliente, admin):
+    """Crea un recurso con capacidad 2"""
+    def crear(nombre: str, capacidad: int = 2) -> dict:
+        respuesta = cliente.post("/admin/recursos", headers=admin, json={"nombre": nombre, "tipo": "consultorio", "capacidad": capacidad})
+        assert respuesta.status_code == 201, respuesta.text
+        return respuesta.json()
+    return crear
+
+
+def test_horario_ocupado_en_el_recurso_general(cliente, fecha_con_atencion, crear_persona):
+    fecha = fecha_con_atencion(2)
+    respuesta = _reservar(cliente, crear_persona(), fecha, "10:00")
+    assert respuesta.status_code == 201, respuesta.text
+    assert respuesta.json()["recurso_id"] == 1
+
+    segunda = _reservar(cliente, crear_persona(), fecha, "10:00")
+    assert segunda.status_code == 400
+    assert "ya está reservado" in segunda.json()["detail"]
+
+
+def test_endpoints_de_disponibilidad_coinciden_con_la_reserva(cliente, fecha_con_atencion, crear_persona):
+    #Un turno Pendiente ya ocupa su lugar: ningún endpoint lo ofrece como disponible
+    fecha = fecha_con_atencion(3)
+    respuesta = _reservar(cliente, crear_persona(), fecha, "10:30")
+    assert respuesta.status_code == 201
+    assert respuesta.json()["estado"] == "Pendiente"
+
+    for endpoint, horarios in _horarios_disponibles(cliente, fecha).items():
+        assert "10:30" not in horarios, endpoint
+        assert "11:00" in horarios, endpoint
+
+    #Al cancelarlo se libera en todos
+    assert cliente.put(f"/turnos/{respuesta.json()['id']}/cancelar").status_code == 200
+    for endpoint, horarios in _horarios_disponibles(cliente, fecha).items():
+        assert "10:30" in horarios, endpoint
+
+
+def test_capacidad_del_recurso(cliente, fecha_con_atencion, crear_persona, consultorio):
+    recurso = consultorio("Consultorio capacidad 2")
+    fecha = fecha_con_atencion(4)
+    for _ in range(2):
+        respuesta = _reservar(cliente, crear_persona(), fecha, "09:00", recurso_id=recurso["id"])
+        assert respuesta.status_code == 201, respuesta.text
+
+    assert "09:00" not in _horarios_disponibles(cliente, fecha, recurso["id"])["recursos"]
+    tercera = _reservar(cliente, crear_persona(), fecha, "09:00", recurso_id=recurso["id"])
+    assert tercera.status_code == 400
+    #El recurso general tiene su propia agenda
+    assert _reservar(cliente, crear_persona(), fecha, "09:00").status_code == 201
+
+
+def test_reserva_simultanea_rechazada_por_el_indice(cliente, fecha_con_atencion, crear_persona, monkeypatch):
+    #Simula dos reservas que consultaron el lugar libre antes de que la otra se guarde:
+    #lugar_libre devuelve un lugar ya ocupado y el alta choca con el índice único
+    fecha = fecha_con_atencion(5)
+    assert _reservar(cliente, crear_persona(), fecha, "12:00").status_code == 201
+    conflictos = _conflictos(cliente)
+
+    monkeypatch.setattr(crudTurno, "lugar_libre", lambda *args, **kwargs: 1)
+    respuesta = _reservar(cliente, crear_persona(), fecha, "12:00")
+
+    assert respuesta.status_code == 400
+    assert "ya está reservado" in respuesta.json()["detail"]
+    assert _conflictos(cliente) == conflictos + 1
+
+
+def test_recurso_inexistente_o_inactivo(cliente, admin, fecha_con_atencion, crear_persona, consultorio):
+    fecha = fecha_con_atencion(6)
+    assert _reservar(cliente, crear_persona(), fecha, "09:30", recurso_id=999).status_code == 404
+
+    recurso = consultorio("Consultorio inactivo", capacidad=1)
+    assert cliente.put(f"/admin/recursos/{recurso['id']}", headers=admin, json={"activo": False}).status_code == 200
+    assert _reservar(cliente, crear_persona(), fecha, "09:30", recurso_id=recurso["id"]).status_code == 400
+    assert cliente.get("/turnos/turnos-disponibles", params={"fecha": fecha.isoformat(), "recurso_id": recurso["id"]}).status_code == 400
+
+
+def test_exportacion_con_recursos_y_lugares(cliente, admin, fecha_con_atencion, crear_persona, consultorio):
+    recurso = consultorio("Consultorio exportado")
+    fecha = fecha_con_atencion(6)
+    turno = _reservar(cliente, crear_persona(), fecha, "10:30", recurso_id=recurso["id"]).json()
+
+    respuesta = cliente.get("/admin/export", headers=admin, params={"tablas": "recursos,turnos"})
+    assert respuesta.status_code == 200
+    registros = [json.loads(linea) for linea in respuesta.text.splitlines()]
+    assert {"tabla": "recursos", **recurso} in registros
+    exportado = next(registro for registro in registros if registro["tabla"] == "turnos" and registro["id"] == turno["id"])
+    assert (exportado["recurso_id"], exportado["lugar"]) == (recurso["id"], 1)
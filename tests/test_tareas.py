@@ -0,0 +1,96 @@
+"""
+Tareas programadas (services/tareas_service.py). En los tests no se programan (intervalos en 0, ver conftest.py):
+se ejecutan directamente con ejecutar_tarea, que además registra cada ejecución.
+"""
+from datetime import date, time, timedelta
+
+import crud.crudCambios as crudCambios
+import crud.crudTurno as crudTurno
+import models.models as models
+import services.tareas_service as tareas
+from database.database import SessionLocal
+
+
+def _agregar_turnos(persona_id: int, *turnos) -> list:
+    """Agrega turnos (fecha, hora, estado) directamente en la base: la API no acepta fechas pasadas"""
+    with SessionLocal() as db:
+        filas = [models.Turno(fecha=fecha, hora=hora, estado=estado, persona_id=persona_id) for fecha, hora, estado in turnos]
+        db.add_all(filas)
+        db.commit()
+        return [fila.id for fila in filas]
+
+
+def _estados(ids: list) -> list:
+    with SessionLocal() as db:
+        estados = dict(db.query(models.Turno.id, models.Turno.estado).filter(models.Turno.id.in_(ids)))
+    return [estados[turno_id] for turno_id in ids]
+
+
+def test_expiracion_pasa_a_asistido_los_confirmados_pasados(cliente, admin, crear_persona):
+    #Primero se expiran los turnos pasados que ya hubiera en la base (datos de prueba)
+    tareas.ejecutar_tarea(tareas.TAREA_EXPIRAR_TURNOS, crudTurno.expirar_turnos_pasados)
+
+    persona = crear_persona()
+    pasado, futuro = date.today() - timedelta(days=3), date.today() + timedelta(days=3)
+    ids = _agregar_turnos(
+        persona["id"],
+        (pasado, time(7, 10), "Confirmado"),
+        (pasado, time(7, 20), "Confirmado"),
+        (pasado, time(7, 30), "Pendiente"),
+        (futuro, time(7, 40), "Confirmado"),
+    )
+
+    with SessionLocal() as db:
+        desde = crudCambios.get_ultimo_seq(db)
+    #Con lotes de a un turno se recorren todos los vencidos
+    ejecucion = tareas.ejecutar_tarea(tareas.TAREA_EXPIRAR_TURNOS, lambda db: crudTurno.expirar_turnos_pasados(db, lote=1))
+
+    assert (ejecucion.filas_afectadas, ejecucion.error) == (2, None)
+    assert _estados(ids) == ["Asistido", "Asistido", "Pendiente", "Confirmado"]
+    #Cada turno expirado queda en el log de cambios
+    cambios = cliente.get("/cambios", params={"desde": desde}).json()["cambios"]
+    assert [(cambio["entidad_id"], cambio["datos"]["estado"]) for cambio in cambios] == [(ids[0], "Asistido"), (ids[1], "Asistido")]
+    #La ejecución se registra en /admin/tareas
+    registradas = cliente.get("/admin/tareas", headers=admin, params={"tarea": tareas.TAREA_EXPIRAR_TURNOS, "limite": 1}).json()
+    assert registradas[0]["filas_afectadas"] == 2
+
+
+def test_tarea_que_falla_registra_el_error(cliente, caplog):
+    def fallar(db):
+        raise RuntimeError("sin conexión")
+
+    ejecucion = tareas.ejecutar_tarea(tareas.TAREA_EXPIRAR_TURNOS, fallar)
+    assert (ejecucion.filas_afectadas, ejecucion.error) == (0, "sin conexión")
+    assert "La tarea expirar_turnos falló" in caplog.text
+
+
+def _habilitado(persona_id: int) -> bool:
+    with SessionLocal() as db:
+        return db.get(models.Persona, persona_id).habilitado
+
+
+def test_reevaluar_habilitados_con_la_ventana_de_cancelaciones(cliente, crear_persona):
+    persona = crear_persona()
+    reciente = date.today() - timedelta(days=10)
+    ids = _agregar_turnos(persona["id"], *(
+        (reciente, time(6, minuto), "Cancelado") for minuto in range(crudTurno.MAXIMO_CANCELADOS)
+    ))
+    assert _habilitado(persona["id"])  #los turnos se agregaron sin pasar por la API
+
+    ejecucion = tareas.ejecutar_tarea(tareas.TAREA_REEVALUAR_HABILITADOS, crudTurno.reevaluar_habilitados)
+    assert ejecucion.error is None and ejecucion.filas_afectadas >= 1
+    assert not _habilitado(persona["id"])
+
+    #Cuando las cancelaciones salen de la ventana la persona vuelve a estar habilitada
+    with SessionLocal() as db:
+        desde = crudCambios.get_ultimo_seq(db)
+        antigua = date.today() - timedelta(days=crudTurno.DIAS_VENTANA_CANCELADOS + 1)
+        db.query(models.Turno).filter(models.Turno.id.in_(ids)).update({models.Turno.fecha: antigua}, synchronize_session=False)
+        db.commit()
+    tareas.ejecutar_tarea(tareas.TAREA_REEVALUAR_HABILITADOS, crudTurno.reevaluar_habilitados)
+    assert _habilitado(persona["id"])
+    cambios = cliente.get("/cambios", params={"desde": desde}).json()["cambios"]
+    assert [(cambio["entidad_id"], cambio["datos"]["habilitado"]) for cambio in cambios if cambio["entidad"] == "persona"] == [(persona["id"], True)]
+
+    #Sin cambios pendientes la tarea no modifica a nadie
+    assert tareas.ejecutar_tarea(tareas.TAREA_REEVALUAR_HABILITADOS, crudTurno.reevaluar_habilitados).filas_afectadas == 0
@@ -0,0 +1,44 @@
+"""
+Reportes en segundo plano (services/trabajos_service.py): los datos de cada trabajo se guardan en
+REPORTES_DIRECTORIO, así que cualquier proceso que comparta la carpeta puede consultarlos.
+"""
+import json
+import os
+import time
+
+import services.trabajos_service as trabajos
+
+
+def _esperar(cliente, trabajo_id: str) -> dict:
+    for _ in range(100):
+        trabajo = cliente.get(f"/reportes/jobs/{trabajo_id}").json()
+        if trabajo["estado"] not in (trabajos.TRABAJO_PENDIENTE, trabajos.TRABAJO_PROCESANDO):
+            return trabajo
+        time.sleep(0.05)
+    raise AssertionError(f"El trabajo {trabajo_id} no terminó")
+
+
+def test_datos_del_trabajo_en_la_carpeta_de_reportes(cliente):
+    respuesta = cliente.post("/reportes/jobs", json={"tipo": "csv/estado-personas", "parametros": {"estado": "true"}})
+    assert respuesta.status_code == 202, respuesta.text
+    trabajo = _esperar(cliente, respuesta.json()["id"])
+    assert trabajo["estado"] == trabajos.TRABAJO_COMPLETADO
+    assert trabajo["parametros"] == {"estado": True}
+
+    #Lo que otro proceso lee del disco es lo mismo que informa el endpoint
+    ruta = os.path.join(os.environ["REPORTES_DIRECTORIO"], f"{trabajo['id']}.json")
+    with open(ruta, encoding="utf-8") as archivo:
+        guardado = json.load(archivo)
+    assert guardado["estado"] == trabajos.TRABAJO_COMPLETADO
+    assert guardado["tamanio_bytes"] == trabajo["tamanio_bytes"]
+
+    descarga = cliente.get(f"/reportes/jobs/{trabajo['id']}/download", params={"compress": "none"})
+    assert descarga.status_code == 200
+    assert len(descarga.content) == trabajo["tamanio_bytes"]
+
+
+def test_trabajo_inexistente(cliente):
+    assert cliente.get("/reportes/jobs/0123456789abcdef0123456789abcdef").status_code == 404
+    #El id no puede usarse para leer otros archivos de la carpeta
+    assert cliente.get("/reportes/jobs/..%2Ftests").status_code == 404
+    assert cliente.get("/reportes/jobs/abc/download").status_code == 404